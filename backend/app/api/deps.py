@@ -0,0 +1,81 @@
+import ipaddress
+from typing import Annotated, Optional
+
+import redis
+import redis.asyncio as aioredis
+from fastapi import Depends, Request
+from rq import Queue
+
+from app.core.config import settings
+from app.queue.fair import api_key_client_id
+from app.queue.redis_conn import get_async_redis, get_redis
+from app.queue.rq_queue import get_queue
+
+
+def get_default_queue() -> Queue:
+    return get_queue("default")
+
+
+_api_keys: Optional[frozenset] = None
+_trusted_proxies: Optional[tuple] = None
+
+
+def _is_known_api_key(api_key: str) -> bool:
+    global _api_keys
+    if _api_keys is None:
+        keys = {k.strip() for k in settings.API_KEYS.split(",")}
+        keys |= {item.strip().partition("=")[0] for item in settings.FAIR_CLIENT_WEIGHTS.split(",")}
+        keys.discard("")
+        _api_keys = frozenset(keys)
+    return api_key in _api_keys
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    global _trusted_proxies
+    if _trusted_proxies is None:
+        _trusted_proxies = tuple(
+            ipaddress.ip_network(p.strip(), strict=False)
+            for p in settings.TRUSTED_PROXIES.split(",") if p.strip()
+        )
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(addr in net for net in _trusted_proxies)
+
+
+def client_ip(request: Request) -> str:
+    """
+    IP client. X-Forwarded-For hanya dipakai kalau peer-nya proxy tepercaya, dan yang
+    diambil hop paling kanan yang bukan proxy tepercaya (hop di kirinya bisa dipalsukan client).
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(peer):
+        return peer
+
+    hops = [
+        hop.strip()
+        for value in request.headers.getlist("x-forwarded-for")
+        for hop in value.split(",") if hop.strip()
+    ]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    # seluruh rantai proxy internal: hop paling kiri adalah asal request
+    return hops[0] if hops else peer
+
+
+def get_client_id(request: Request) -> str:
+    """
+    Identitas client untuk fair-share: API key (X-API-Key) yang terdaftar, selain itu IP.
+    """
+    api_key = request.headers.get("x-api-key")
+    if api_key and _is_known_api_key(api_key):
+        return api_key_client_id(api_key)
+    return "ip:" + client_ip(request)
+
+
+RedisDep = Annotated[redis.Redis, Depends(get_redis)]
+AsyncRedisDep = Annotated[aioredis.Redis, Depends(get_async_redis)]
+QueueDep = Annotated[Queue, Depends(get_default_queue)]
+ClientDep = Annotated[str, Depends(get_client_id)]
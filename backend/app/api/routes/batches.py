@@ -0,0 +1,175 @@
+import os
+import uuid
+import zipfile
+from typing import Iterator
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.api.deps import ClientDep
+from app.core.config import settings
+from app.queue.batch import create_batch, get_batch, get_batch_items
+from app.queue.rq_queue import get_queue
+from app.queue.job_state import get_job_file, get_states
+from app.schemas.job import CreateBatchRequest
+from app.utils.validators import is_allowed_youtube_url
+
+
+router = APIRouter()
+
+ZIP_CHUNK_SIZE = 256 * 1024
+
+
+@router.post("/batches")
+def create_batch_job(req: CreateBatchRequest, client: ClientDep):
+    """
+    Playlist atau list URL -> banyak job download, paralel maksimal `concurrency`
+    per batch. Ekspansi playlist jalan di worker (lazy), bukan di request ini.
+    """
+    sources = [str(u) for u in (req.urls or [])]
+    if req.url:
+        sources.insert(0, str(req.url))
+
+    if not sources:
+        raise HTTPException(status_code=400, detail="url or urls is required")
+    if len(sources) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many urls (max {settings.BATCH_MAX_ITEMS})")
+    if not all(is_allowed_youtube_url(u) for u in sources):
+        raise HTTPException(status_code=400, detail="Only YouTube URLs are allowed")
+
+    quality = (req.quality or "720p") if req.type == "mp4" else None
+    bitrate = (req.bitrate or 192) if req.type == "mp3" else None
+    concurrency = min(req.concurrency or settings.BATCH_MAX_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+
+    batch_id = uuid.uuid4().hex
+    create_batch(batch_id, client, req.type, quality, bitrate, concurrency)
+
+    get_queue(settings.QUEUE_BULK).enqueue(
+        "app.jobs.batch_job.expand_batch_job",
+        batch_id,
+        sources,
+        job_id=f"batch-{batch_id}",
+        result_ttl=settings.JOB_TTL_SECONDS,
+        failure_ttl=settings.JOB_TTL_SECONDS,
+    )
+
+    return {
+        "success": True,
+        "message": "Batch created",
+        "data": {"batchId": batch_id, "status": "expanding", "concurrency": concurrency},
+    }
+
+
+@router.get("/batches/{batch_id}")
+def batch_status(batch_id: str, offset: int = 0, limit: int = 100):
+    """
+    Status agregat batch + status item (dipaginasi, offset/limit).
+    """
+    meta = get_batch(batch_id)
+    if not meta:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    total = int(meta.get("total") or 0)
+    done = int(meta.get("done") or 0)
+    failed = int(meta.get("failed") or 0)
+
+    limit = max(1, min(limit, 500))
+    ids = get_batch_items(batch_id, offset, offset + limit - 1)
+    states = get_states(ids, ("status", "progress", "stage"))
+
+    items = []
+    for job_id, state in zip(ids, states):
+        if state is None:
+            # belum di-enqueue (menunggu slot)
+            items.append({"jobId": job_id, "status": "pending", "progress": 0, "stage": "pending"})
+            continue
+
+        status = state.get("status", "queued")
+        items.append({
+            "jobId": job_id,
+            "status": status,
+            "progress": int(state.get("progress") or 0),
+            "stage": state.get("stage", status),
+            "downloadUrl": f"/api/youtube/download/{job_id}" if status == "finished" else None,
+        })
+
+    return {
+        "success": True,
+        "message": "Batch status",
+        "data": {
+            "batchId": batch_id,
+            "status": meta.get("status"),
+            "total": total,
+            "done": done,
+            "failed": failed,
+            "progress": int((done + failed) * 100 / total) if total else 0,
+            "error": meta.get("error") or None,
+            "zipUrl": f"/api/youtube/batches/{batch_id}/zip",
+            "items": items,
+        },
+    }
+
+
+class _ZipBuffer:
+    """
+    File-like write-only untuk zipfile: byte ditampung lalu diambil generator.
+    zipfile otomatis pakai data descriptor karena stream tidak seekable.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+@router.get("/batches/{batch_id}/zip")
+def batch_zip(batch_id: str):
+    """
+    Zip (streaming, tanpa file sementara) semua output batch yang sudah selesai.
+    """
+    if not get_batch(batch_id):
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    files = []
+    for index, job_id in enumerate(get_batch_items(batch_id), start=1):
+        info = get_job_file(job_id)
+        if info and os.path.exists(info["path"]):
+            files.append((f"{index:03d} - {info['file_name']}", info["path"]))
+
+    if not files:
+        raise HTTPException(status_code=409, detail="No finished outputs yet")
+
+    def generate() -> Iterator[bytes]:
+        buf = _ZipBuffer()
+        # media sudah terkompresi -> STORED
+        with zipfile.ZipFile(buf, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for arcname, path in files:
+                with open(path, "rb") as src, zf.open(arcname, mode="w", force_zip64=True) as dst:
+                    while True:
+                        chunk = src.read(ZIP_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        yield buf.drain()
+                yield buf.drain()
+        yield buf.drain()
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="batch-{batch_id}.zip"'},
+    )
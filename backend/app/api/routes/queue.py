@@ -1,19 +1,20 @@
 from fastapi import APIRouter
-from app.queue.redis_conn import get_redis
-from app.queue.rq_queue import get_queue
+from app.api.deps import AsyncRedisDep
+from app.queue import fair
+from app.queue.rq_queue import get_queue, queue_names
 
 router = APIRouter()
 
 @router.get("/ping")
-def ping_redis():
-    r = get_redis()
-    return {"success": True, "redis_ping": r.ping()}
+async def ping_redis(r: AsyncRedisDep):
+    return {"success": True, "redis_ping": await r.ping()}
 
 @router.get("/info")
 def queue_info():
-    q = get_queue()
     return {
         "success": True,
-        "queue": q.name,
-        "count": q.count
+        "queues": [
+            {"queue": name, "count": get_queue(name).count, "fair": fair.get_stats(name)}
+            for name in queue_names()
+        ],
     }
@@ -1,18 +1,43 @@
+import asyncio
+import hashlib
+import json
 import os
+import time
 import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
 
-from fastapi.responses import FileResponse
-from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 
 from rq.job import Job
 
 from app.schemas.youtube import ParseRequest
-from app.services.youtube_service import parse_youtube
+from app.services.youtube_service import parse_youtube_async
+from app.services.parse_cache import parse_cache
+from app.services.extractor_pool import ExtractorPoolSaturated, extractor_pool
 from app.utils.validators import is_allowed_youtube_url
 
-from app.queue.rq_queue import get_queue
+from app.api.deps import ClientDep, RedisDep
 from app.queue.redis_conn import get_redis
-from app.schemas.job import CreateJobRequest
+from app.queue.dedup import alias_key, canonical_job_key, enqueue_single_flight, resolve_job_id
+from app.queue.events import broadcaster
+from app.queue import fair
+from app.queue.admission import AdmissionRejected, admit, estimate_output_bytes
+from app.queue.rq_queue import retry_policy
+from app.queue.job_meta import get_job_stream
+from app.queue.job_state import (
+    STATE_VERSION_KEY,
+    decode_state,
+    get_job_file,
+    get_state,
+    get_states,
+    set_job_file,
+    set_state,
+    state_key,
+)
+from app.schemas.job import BulkJobStatusRequest, CreateJobRequest, CreateRenditionsJobRequest
 from app.core.config import settings
 
 
@@ -20,21 +45,35 @@ router = APIRouter()
 
 
 @router.post("/parse")
-def parse(req: ParseRequest):
+async def parse(req: ParseRequest):
     url = str(req.url)
 
     if not is_allowed_youtube_url(url):
         raise HTTPException(status_code=400, detail="Only YouTube URLs are allowed")
 
     try:
-        data = parse_youtube(url)
+        data = await parse_youtube_async(url)
         return {"success": True, "message": "Video parsed", "data": data}
+    except ExtractorPoolSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Parser is busy, try again later",
+            headers={"Retry-After": str(settings.PARSE_RETRY_AFTER_SECONDS)},
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Parsing video timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to parse video: {str(e)}")
 
 
+@router.get("/parse/stats")
+def parse_stats():
+    data = {**parse_cache.get_stats(), "pool": extractor_pool.get_stats()}
+    return {"success": True, "message": "Parse cache stats", "data": data}
+
+
 @router.post("/jobs")
-def create_job(req: CreateJobRequest):
+def create_job(req: CreateJobRequest, client: ClientDep):
     url = str(req.url)
 
     if not is_allowed_youtube_url(url):
@@ -47,64 +86,445 @@ def create_job(req: CreateJobRequest):
     if req.type == "mp3" and not req.bitrate:
         req.bitrate = 192
 
-    q = get_queue("default")
+    admission = {}
+
+    def enqueue(job_id: str):
+        # admission hanya untuk job baru; request yang ikut job berjalan tidak ditolak
+        admission.update(admit(
+            settings.QUEUE_INTERACTIVE,
+            client,
+            estimate_output_bytes(url, req.type, req.quality, req.bitrate),
+            # job streaming tidak diturunkan: client sedang menunggu byte pertama
+            downgrade_to=settings.QUEUE_BULK if settings.ADMISSION_DOWNGRADE and not req.stream else None,
+        ))
+        # folder = job id, unik agar tidak tabrakan
+        return fair.submit(
+            admission["queue"],
+            client,
+            "app.jobs.youtube_job.download_job",
+            args=(url, job_id, req.type, req.quality, req.bitrate, settings.STORAGE_DIR),
+            # hanya dikirim kalau true: signature download_job tetap sama dengan tree worker/
+            kwargs={"stream": True} if req.stream else None,
+            job_id=job_id,
+            retry=retry_policy(),
+        )
+
+    # request yang sama (video + format + kualitas) ikut job yang sedang jalan
+    key = canonical_job_key(url, req.type, req.quality, req.bitrate)
+    if key and req.stream:
+        # job streaming hanya di-share dengan job streaming lain
+        key = f"{key}:stream"
+    try:
+        job_id, attached = enqueue_single_flight(key, enqueue)
+    except AdmissionRejected as e:
+        raise _rejected(e)
+
+    data = {"jobId": job_id, "status": "queued", "shared": attached, **admission}
+    if req.stream:
+        data["streamUrl"] = f"/api/youtube/stream/{job_id}"
+
+    return {
+        "success": True,
+        "message": "Job attached" if attached else "Job created",
+        "data": data,
+    }
+
 
-    # folder id unik agar tidak tabrakan
-    folder_id = uuid.uuid4().hex
+def _rejected(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
 
-    job = q.enqueue(
-        "app.jobs.youtube_job.download_job",
-        url,
-        folder_id,
-        req.type,
-        req.quality,
-        req.bitrate,
-        settings.STORAGE_DIR,
+
+@router.post("/jobs/renditions")
+def create_renditions_job(req: CreateRenditionsJobRequest, client: ClientDep):
+    """
+    Satu URL -> beberapa output sekaligus (download sekali, encode sekali).
+    Tiap rendition dapat jobId sendiri untuk /jobs/{id} dan /download/{id}.
+    """
+    url = str(req.url)
+
+    if not is_allowed_youtube_url(url):
+        raise HTTPException(status_code=400, detail="Only YouTube URLs are allowed")
+
+    renditions = []
+    seen = set()
+    for spec in req.renditions:
+        quality = (spec.quality or "720p") if spec.type == "mp4" else None
+        bitrate = (spec.bitrate or 192) if spec.type == "mp3" else None
+        if (spec.type, quality, bitrate) in seen:
+            continue
+        seen.add((spec.type, quality, bitrate))
+        renditions.append({"id": uuid.uuid4().hex, "type": spec.type, "quality": quality, "bitrate": bitrate})
+
+    try:
+        # banyak output = encode berat -> antrian transcode (tidak turun ke bulk)
+        admission = admit(
+            settings.QUEUE_TRANSCODE,
+            client,
+            sum(estimate_output_bytes(url, r["type"], r["quality"], r["bitrate"]) for r in renditions),
+        )
+    except AdmissionRejected as e:
+        raise _rejected(e)
+
+    job_id = uuid.uuid4().hex
+    for r in renditions:
+        set_state(r["id"], {"status": "queued", "progress": 0, "stage": "queued", "parent": job_id})
+
+    fair.submit(
+        admission["queue"],
+        client,
+        "app.jobs.rendition_job.renditions_job",
+        args=(url, job_id, renditions, settings.STORAGE_DIR),
+        job_id=job_id,
+        retry=retry_policy(),
     )
 
     return {
         "success": True,
         "message": "Job created",
-        "data": {"jobId": job.id, "status": "queued"},
+        "data": {
+            "jobId": job_id,
+            "status": "queued",
+            **admission,
+            "renditions": [
+                {"jobId": r["id"], "type": r["type"], "quality": r["quality"], "bitrate": r["bitrate"]}
+                for r in renditions
+            ],
+        },
     }
 
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
+TERMINAL_STATUSES = {"finished", "failed", "stopped", "canceled"}
+FINAL_STAGES = {"done", "failed", "error"}
+
+
+# field respons -> field hash state yang perlu dibaca
+_STATUS_FIELD_SOURCES = {
+    "status": ("status",),
+    "progress": ("progress",),
+    "stage": ("stage",),
+    "filename": ("filename",),
+    "downloadUrl": ("status",),
+    "error": ("error",),
+}
+
+
+@router.post("/jobs/status")
+def bulk_job_status(req: BulkJobStatusRequest):
+    """
+    Status banyak job sekaligus (satu round trip Redis, tanpa Job.fetch).
+
+    fields: proyeksi field respons (default semua).
+    since: hanya job yang berubah setelah versi ini. Simpan data.version dari
+    respons sebelumnya lalu kirim sebagai since di polling berikutnya.
+    """
+    wanted = list(dict.fromkeys(req.fields or _STATUS_FIELD_SOURCES))
+    hash_fields = tuple(dict.fromkeys(["version", *(f for w in wanted for f in _STATUS_FIELD_SOURCES[w])]))
+    job_ids = list(dict.fromkeys(req.job_ids))
+
+    version, states = _bulk_states(job_ids, hash_fields)
+
+    jobs, missing = [], []
+    for job_id in job_ids:
+        state = states.get(job_id)
+        if state is None:
+            missing.append(job_id)
+            continue
+
+        job_version = int(state["version"]) if state.get("version") else None
+        # state tanpa version (ditulis sebelum ada versi) selalu ikut
+        if req.since is not None and job_version is not None and job_version <= req.since:
+            continue
+
+        full = _state_status(job_id, state)
+        jobs.append({"jobId": job_id, "version": job_version, **{f: full[f] for f in wanted}})
+
+    return {
+        "success": True,
+        "message": "Jobs status",
+        "data": {"version": version, "jobs": jobs, "missing": missing},
+    }
+
+
+def _bulk_states(job_ids: list, fields: tuple) -> tuple:
+    """
+    Versi global + state & alias tiap job dalam satu pipeline. Handle alias
+    (request yang ikut job lain) tidak punya state sendiri: dibaca dari job
+    primary-nya dengan satu round trip tambahan.
+    """
+    with get_redis().pipeline(transaction=False) as pipe:
+        # versi dibaca sebelum state: tulisan yang terjadi di antaranya terkirim
+        # lagi di polling berikutnya, bukan terlewat
+        pipe.get(STATE_VERSION_KEY)
+        for job_id in job_ids:
+            pipe.hmget(state_key(job_id), fields)
+            pipe.get(alias_key(job_id))
+        rows = pipe.execute()
+
+    version = int(rows[0] or 0)
+    states, aliased = {}, {}
+    for i, job_id in enumerate(job_ids):
+        state = decode_state(fields, rows[1 + 2 * i])
+        primary = rows[2 + 2 * i]
+        if state is None and primary:
+            aliased[job_id] = primary.decode() if isinstance(primary, bytes) else primary
+        else:
+            states[job_id] = state
+
+    if aliased:
+        for job_id, state in zip(aliased, get_states(list(aliased.values()), fields)):
+            states[job_id] = state
+
+    return version, states
+
+
 @router.get("/jobs/{job_id}")
 def get_job(job_id: str):
-    redis_conn = get_redis()
+    return {"success": True, "message": "Job status", "data": _job_status(job_id)}
+
+
+def _job_status(job_id: str) -> dict:
+    primary_id = resolve_job_id(job_id)
+
+    # jalur cepat: state job di satu hash (HMGET), tanpa Job.fetch + unpickle
+    state = get_state(primary_id)
+    if state:
+        return _state_status(job_id, state)
+    return _rq_job_status(job_id, primary_id)
+
 
+def _rq_job_status(job_id: str, primary_id: str) -> dict:
+    """
+    Fallback untuk job yang belum punya state (mis. di-enqueue tanpa fair.submit).
+    """
     try:
-        job = Job.fetch(job_id, connection=redis_conn)
+        job = Job.fetch(primary_id, connection=get_redis())
     except Exception:
         raise HTTPException(status_code=404, detail="Job not found")
 
     status = job.get_status()  # queued/started/finished/failed
     result = job.result if job.is_finished else None
-    error = str(job.exc_info) if job.is_failed else None
 
-    # ambil progress & stage dari meta (INILAH FIX 0%)
-    meta_progress = job.meta.get("progress", 0)
-    meta_stage = job.meta.get("stage", status)
+    return {
+        "jobId": job_id,
+        "status": status,
+        "progress": 100 if job.is_finished else 0,
+        "stage": "done" if job.is_finished else status,
+        "filename": result.get("file_name") if isinstance(result, dict) else None,
+        "downloadUrl": f"/api/youtube/download/{job_id}" if job.is_finished else None,
+        "error": str(job.exc_info) if job.is_failed else None,
+    }
 
-    download_url = f"/api/youtube/download/{job_id}" if job.is_finished else None
 
-    response = {
+def _state_status(job_id: str, state: dict) -> dict:
+    finished = state.get("status") == "finished"
+    return {
         "jobId": job_id,
-        "status": status,
-        "progress": meta_progress,
-        "stage": meta_stage,
-        "filename": result.get("file_name") if result else None,
-        "downloadUrl": download_url,
-        "error": error,
+        "status": state.get("status", "queued"),
+        "progress": int(state.get("progress") or 0),
+        "stage": state.get("stage", "queued"),
+        "filename": state.get("filename") or None,
+        "downloadUrl": f"/api/youtube/download/{job_id}" if finished else None,
+        "error": state.get("error") or None,
+        "transcodePath": state.get("transcode_path") or None,
+        "transcodeReason": state.get("transcode_reason") or None,
+        "height": int(state["transcode_height"]) if state.get("transcode_height") else None,
     }
 
-    return {"success": True, "message": "Job status", "data": response}
+
+def _settled_job_status(job_id: str, attempts: int = 10, delay: float = 0.2) -> dict:
+    """
+    Event "done"/"failed" dipublish setelah state ditulis, jadi biasanya langsung
+    final. Job tanpa state (fallback RQ): tunggu sebentar sampai status RQ ikut final.
+    """
+    data = _job_status(job_id)
+    for _ in range(attempts):
+        if data["status"] in TERMINAL_STATUSES:
+            break
+        time.sleep(delay)
+        data = _job_status(job_id)
+    return data
+
+
+def _sse(data: dict) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events: snapshot status job, lalu update tiap kali worker
+    publish progress. Stream ditutup setelah job finished/failed.
+    """
+    primary_id = await run_in_threadpool(resolve_job_id, job_id)
+
+    # subscribe dulu sebelum snapshot supaya tidak ada event yang terlewat
+    queue = broadcaster.subscribe(primary_id)
+    try:
+        snapshot = await run_in_threadpool(_job_status, job_id)
+    except HTTPException:
+        broadcaster.unsubscribe(primary_id, queue)
+        raise
+
+    async def stream():
+        current = snapshot
+        try:
+            yield _sse(current)
+            while current["status"] not in TERMINAL_STATUSES:
+                if await request.is_disconnected():
+                    break
+
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # heartbeat: baca ulang status (juga menutup celah event yang hilang)
+                    current = await run_in_threadpool(_job_status, job_id)
+                else:
+                    if event.get("stage") in FINAL_STAGES:
+                        current = await run_in_threadpool(_settled_job_status, job_id)
+                    else:
+                        current = {
+                            **current,
+                            "status": "started",
+                            "progress": event.get("progress", current["progress"]),
+                            "stage": event.get("stage", current["stage"]),
+                        }
+
+                yield _sse(current)
+        except HTTPException:
+            # job sudah expire dari Redis
+            return
+        finally:
+            broadcaster.unsubscribe(primary_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/download/{job_id}")
-def download(job_id: str):
-    redis_conn = get_redis()
+def download(job_id: str, request: Request, redis_conn: RedisDep):
+    primary_id = resolve_job_id(job_id)
+
+    # jalur cepat: index job -> file (ditulis worker saat selesai)
+    info = get_job_file(primary_id)
+    if info:
+        path, filename = info["path"], info["file_name"]
+    else:
+        path, filename = _download_from_job(primary_id, redis_conn)
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="File missing")
+
+    etag, last_modified = _validators(stat)
+    cache_headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": "private, max-age=3600",
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=cache_headers)
+
+    # nginx/proxy yang support X-Accel-Redirect kirim file via sendfile (zero-copy)
+    if settings.DOWNLOAD_ACCEL_REDIRECT_PREFIX:
+        rel = os.path.relpath(os.path.abspath(path), os.path.abspath(settings.STORAGE_DIR))
+        return Response(headers={
+            **cache_headers,
+            "X-Accel-Redirect": settings.DOWNLOAD_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(rel.replace(os.sep, "/")),
+            "Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}",
+        })
+
+    # FileResponse sudah handle Range (206) / If-Range, dan pakai
+    # http.response.pathsend (sendfile) kalau server ASGI-nya support
+    return FileResponse(path, filename=filename, stat_result=stat, headers=cache_headers)
+
+
+async def _wait_for_stream(primary_id: str, request: Request):
+    """
+    Job yang masih antri belum punya file stream: tunggu worker membukanya,
+    maksimal STREAM_START_TIMEOUT_SECONDS. None kalau job bukan streaming,
+    sudah selesai/gagal, client putus, atau waktu habis.
+    """
+    deadline = time.monotonic() + settings.STREAM_START_TIMEOUT_SECONDS
+    while True:
+        info = await run_in_threadpool(get_job_stream, primary_id)
+        if info:
+            return info
+
+        state = await run_in_threadpool(get_state, primary_id, ("status",))
+        if not state or state.get("status") in TERMINAL_STATUSES:
+            return None
+        if time.monotonic() >= deadline or await request.is_disconnected():
+            return None
+        await asyncio.sleep(settings.STREAM_POLL_INTERVAL_SECONDS)
+
+
+class StreamAborted(Exception):
+    """Worker gagal di tengah stream: respons diputus, bukan ditutup seperti sukses."""
+
+
+@router.get("/stream/{job_id}")
+async def stream(job_id: str, request: Request):
+    """
+    Stream output job mode streaming selagi worker masih menulis (chunked).
+    Job yang masih antri ditunggu sampai worker mulai menulis (dibatasi).
+    Job yang sudah selesai langsung dilayani seperti /download.
+    Worker gagal di tengah jalan -> koneksi diputus tanpa chunk penutup,
+    client melihat transfer tidak lengkap (bukan 200 yang terpotong diam-diam).
+    """
+    primary_id = await run_in_threadpool(resolve_job_id, job_id)
+
+    info = await _wait_for_stream(primary_id, request)
+    if not info or info.get("state") == "complete":
+        return await run_in_threadpool(download, job_id, request, get_redis())
+
+    if info.get("state") == "failed":
+        raise HTTPException(status_code=500, detail="Streaming job failed")
 
+    try:
+        f = open(info["path"], "rb")
+    except OSError:
+        # sudah di-rename ke nama akhir -> job (hampir) selesai
+        return await run_in_threadpool(download, job_id, request, get_redis())
+
+    async def tail():
+        try:
+            while True:
+                chunk = await run_in_threadpool(f.read, STREAM_CHUNK_SIZE)
+                if chunk:
+                    yield chunk
+                    continue
+
+                if await request.is_disconnected():
+                    return
+
+                state = await run_in_threadpool(get_job_stream, primary_id)
+                if state and state.get("state") == "failed":
+                    raise StreamAborted(f"streaming job {primary_id} failed")
+                if not state or state.get("state") != "writing":
+                    # worker selesai: kirim sisa byte terakhir
+                    rest = await run_in_threadpool(f.read)
+                    if rest:
+                        yield rest
+                    return
+
+                await asyncio.sleep(settings.STREAM_POLL_INTERVAL_SECONDS)
+        finally:
+            f.close()
+
+    return StreamingResponse(tail(), media_type=info.get("media_type", "application/octet-stream"))
+
+
+def _download_from_job(job_id: str, redis_conn) -> tuple:
+    """
+    Fallback untuk job yang belum punya index file: baca result dari job RQ.
+    """
     try:
         job = Job.fetch(job_id, connection=redis_conn)
     except Exception:
@@ -121,8 +541,28 @@ def download(job_id: str):
 
     path = result["file_path"]
     filename = result.get("file_name", os.path.basename(path))
+    set_job_file(job_id, path, filename, settings.JOB_TTL_SECONDS)
+    return path, filename
 
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail="File missing")
 
-    return FileResponse(path, filename=filename)
+def _validators(stat: os.stat_result) -> tuple:
+    # output job tidak pernah diubah setelah selesai -> strong ETag dari inode/size/mtime
+    raw = f"{stat.st_ino}-{stat.st_size}-{stat.st_mtime_ns}"
+    etag = f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+    return etag, formatdate(stat.st_mtime, usegmt=True)
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= int(parsedate_to_datetime(if_modified_since).timestamp())
+        except (TypeError, ValueError):
+            return False
+
+    return False
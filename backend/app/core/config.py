@@ -10,8 +10,138 @@ class Settings:
 
     FRONTEND_ORIGIN: str = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173")
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    REDIS_HEALTH_CHECK_INTERVAL: int = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "5"))
+
+    # antrian RQ, worker listen sesuai urutan prioritas: interactive > transcode > bulk
+    QUEUE_INTERACTIVE: str = os.getenv("QUEUE_INTERACTIVE", "interactive")
+    QUEUE_TRANSCODE: str = os.getenv("QUEUE_TRANSCODE", "transcode")
+    QUEUE_BULK: str = os.getenv("QUEUE_BULK", "bulk")
+    # stage pipeline download_job (extract -> download -> transcode -> finalize)
+    QUEUE_DOWNLOAD: str = os.getenv("QUEUE_DOWNLOAD", "download")
+    QUEUE_FINALIZE: str = os.getenv("QUEUE_FINALIZE", "finalize")
+    PIPELINE_ENABLED: bool = os.getenv("PIPELINE_ENABLED", "1") == "1"
+    PIPELINE_STAGE_RETRIES: int = int(os.getenv("PIPELINE_STAGE_RETRIES", "2"))
+    # mp3: yt-dlp -> pipe -> ffmpeg dalam satu jalan (tanpa file sumber .webm/.m4a di disk)
+    MP3_PIPELINE: bool = os.getenv("MP3_PIPELINE", "1") == "1"
+
+    # retry download: RQ (backoff eksponensial + jitter) dan di dalam yt-dlp
+    DOWNLOAD_RETRY_MAX: int = int(os.getenv("DOWNLOAD_RETRY_MAX", "3"))
+    DOWNLOAD_RETRY_BASE_SECONDS: int = int(os.getenv("DOWNLOAD_RETRY_BASE_SECONDS", "10"))
+    DOWNLOAD_RETRY_MAX_SECONDS: int = int(os.getenv("DOWNLOAD_RETRY_MAX_SECONDS", "300"))
+    YTDLP_RETRIES: int = int(os.getenv("YTDLP_RETRIES", "10"))
+    YTDLP_SOCKET_TIMEOUT_SECONDS: int = int(os.getenv("YTDLP_SOCKET_TIMEOUT_SECONDS", "30"))
+
+    # download fragment paralel & batas bandwidth (byte/detik, 0 = tanpa batas)
+    YTDLP_CONCURRENT_FRAGMENTS: int = int(os.getenv("YTDLP_CONCURRENT_FRAGMENTS", "4"))
+    DOWNLOAD_JOB_RATE_LIMIT: int = int(os.getenv("DOWNLOAD_JOB_RATE_LIMIT", "0"))
+    DOWNLOAD_HOST_RATE_LIMIT: int = int(os.getenv("DOWNLOAD_HOST_RATE_LIMIT", "0"))
+    BANDWIDTH_REBALANCE_SECONDS: float = float(os.getenv("BANDWIDTH_REBALANCE_SECONDS", "2"))
+
+    # fair-share per client (API key / IP): job aktif per client & total per queue
+    FAIR_CLIENT_MAX_ACTIVE: int = int(os.getenv("FAIR_CLIENT_MAX_ACTIVE", "3"))
+    FAIR_MAX_ACTIVE: int = int(os.getenv("FAIR_MAX_ACTIVE", "32"))
+    # bobot round-robin per API key: "key1=3,key2=2" (default 1)
+    FAIR_CLIENT_WEIGHTS: str = os.getenv("FAIR_CLIENT_WEIGHTS", "")
+    # API key yang diakui sebagai identitas client (koma); key lain diperlakukan seperti
+    # tanpa key. Key di FAIR_CLIENT_WEIGHTS otomatis ikut diakui.
+    API_KEYS: str = os.getenv("API_KEYS", "")
+    # IP/CIDR reverse proxy (koma) yang X-Forwarded-For-nya dipercaya; kosong = pakai IP peer
+    TRUSTED_PROXIES: str = os.getenv("TRUSTED_PROXIES", "")
+
+    # dedup: claim inflight yang job RQ-nya belum ada dianggap aktif selama ini (detik)
+    DEDUP_CLAIM_GRACE_SECONDS: float = float(os.getenv("DEDUP_CLAIM_GRACE_SECONDS", "30"))
 
     STORAGE_DIR: str = os.getenv("STORAGE_DIR", "storage")
     JOB_TTL_SECONDS: int = int(os.getenv("JOB_TTL_SECONDS", "3600"))
 
+    # kalau di belakang nginx: prefix internal location untuk X-Accel-Redirect (kosong = off)
+    DOWNLOAD_ACCEL_REDIRECT_PREFIX: str = os.getenv("DOWNLOAD_ACCEL_REDIRECT_PREFIX", "")
+
+    # /stream/{job_id}: jeda cek ulang file yang sedang ditulis worker (detik)
+    STREAM_POLL_INTERVAL_SECONDS: float = float(os.getenv("STREAM_POLL_INTERVAL_SECONDS", "0.25"))
+    # /stream/{job_id} untuk job yang masih antri: tunggu worker mulai menulis maksimal (detik)
+    STREAM_START_TIMEOUT_SECONDS: float = float(os.getenv("STREAM_START_TIMEOUT_SECONDS", "30"))
+
+    # import yt-dlp di thread background setelah startup API (0 = tunggu /parse pertama)
+    API_PRELOAD_YTDLP: bool = os.getenv("API_PRELOAD_YTDLP", "0") == "1"
+
+    # cache hasil parse (LRU in-process + Redis)
+    PARSE_CACHE_TTL_SECONDS: int = int(os.getenv("PARSE_CACHE_TTL_SECONDS", "900"))
+    PARSE_CACHE_STALE_SECONDS: int = int(os.getenv("PARSE_CACHE_STALE_SECONDS", "3600"))
+    PARSE_CACHE_LRU_SIZE: int = int(os.getenv("PARSE_CACHE_LRU_SIZE", "512"))
+
+    # pool extractor untuk /parse (terpisah dari threadpool Starlette)
+    PARSE_POOL_WORKERS: int = int(os.getenv("PARSE_POOL_WORKERS", "4"))
+    PARSE_POOL_MAX_PENDING: int = int(os.getenv("PARSE_POOL_MAX_PENDING", "32"))
+    PARSE_TIMEOUT_SECONDS: float = float(os.getenv("PARSE_TIMEOUT_SECONDS", "30"))
+    # pool penuh: request /parse menunggu giliran maksimal selama ini sebelum 503
+    PARSE_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("PARSE_QUEUE_TIMEOUT_SECONDS", "10"))
+    PARSE_RETRY_AFTER_SECONDS: int = int(os.getenv("PARSE_RETRY_AFTER_SECONDS", "5"))
+
+    # artifact store (STORAGE_DIR/artifacts), dibatasi total ukuran
+    ARTIFACT_MAX_BYTES: int = int(os.getenv("ARTIFACT_MAX_BYTES", str(10 * 1024 ** 3)))
+
+    # janitor storage (app.services.storage_janitor): hapus folder job yang state-nya expire,
+    # file antara setelah job selesai, scratch & artifact yatim; hapus maks N file/detik
+    STORAGE_JANITOR_INTERVAL_SECONDS: float = float(os.getenv("STORAGE_JANITOR_INTERVAL_SECONDS", "30"))
+    STORAGE_JANITOR_BATCH: int = int(os.getenv("STORAGE_JANITOR_BATCH", "200"))
+    STORAGE_JANITOR_DELETE_RATE: float = float(os.getenv("STORAGE_JANITOR_DELETE_RATE", "50"))
+    STORAGE_JANITOR_DONE_GRACE_SECONDS: int = int(os.getenv("STORAGE_JANITOR_DONE_GRACE_SECONDS", "60"))
+    STORAGE_JANITOR_SWEEP_SECONDS: int = int(os.getenv("STORAGE_JANITOR_SWEEP_SECONDS", "3600"))
+    STORAGE_SCRATCH_DIRS: str = os.getenv("STORAGE_SCRATCH_DIRS", "TEMP")
+    # pemakaian disk (%) mulai hapus folder job selesai / evict artifact, sampai di bawah low water
+    STORAGE_HIGH_WATER_PERCENT: float = float(os.getenv("STORAGE_HIGH_WATER_PERCENT", "90"))
+    STORAGE_LOW_WATER_PERCENT: float = float(os.getenv("STORAGE_LOW_WATER_PERCENT", "80"))
+
+    # jarak minimum antar tulis progress ke Redis (detik)
+    PROGRESS_MIN_INTERVAL_SECONDS: float = float(os.getenv("PROGRESS_MIN_INTERVAL_SECONDS", "0.5"))
+
+    # SSE /jobs/{id}/events: interval baca ulang status kalau tidak ada event
+    SSE_HEARTBEAT_SECONDS: float = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+    # batch / playlist: job anak paralel per batch, jumlah item maksimum
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+    BATCH_EXPAND_CHUNK: int = int(os.getenv("BATCH_EXPAND_CHUNK", "25"))
+
+    # admission control pembuatan job (lihat app.queue.admission)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "1") == "1"
+    ADMISSION_MAX_QUEUE_DEPTH: int = int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "200"))
+    ADMISSION_MAX_WAIT_SECONDS: int = int(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "900"))
+    # antrian interactive penuh -> job turun ke QUEUE_BULK selama bulk masih di bawah batas ini
+    ADMISSION_DOWNGRADE: bool = os.getenv("ADMISSION_DOWNGRADE", "1") == "1"
+    ADMISSION_BULK_MAX_QUEUE_DEPTH: int = int(os.getenv("ADMISSION_BULK_MAX_QUEUE_DEPTH", "2000"))
+    ADMISSION_CLIENT_MAX_PENDING: int = int(os.getenv("ADMISSION_CLIENT_MAX_PENDING", "20"))
+    # sisa disk STORAGE_DIR minimum setelah dikurangi estimasi ukuran file job (byte)
+    ADMISSION_MIN_FREE_BYTES: int = int(os.getenv("ADMISSION_MIN_FREE_BYTES", str(2 * 1024 ** 3)))
+    ADMISSION_DISK_RETRY_AFTER_SECONDS: int = int(os.getenv("ADMISSION_DISK_RETRY_AFTER_SECONDS", "300"))
+    ADMISSION_RETRY_AFTER_MAX_SECONDS: int = int(os.getenv("ADMISSION_RETRY_AFTER_MAX_SECONDS", "600"))
+    # estimasi durasi job: rata-rata N job terakhir, default kalau belum ada data
+    ADMISSION_DURATION_SAMPLES: int = int(os.getenv("ADMISSION_DURATION_SAMPLES", "100"))
+    ADMISSION_DEFAULT_JOB_SECONDS: float = float(os.getenv("ADMISSION_DEFAULT_JOB_SECONDS", "60"))
+
+    # supervisor worker (app.jobs.supervisor / worker/worker.py): N proses slot per host.
+    # Urutan queue = prioritas: finalize (murah, menutup job) lalu interactive sebelum
+    # transcode/download/bulk. Host khusus download / transcode cukup set satu queue.
+    WORKER_QUEUES: str = os.getenv("WORKER_QUEUES", "finalize,interactive,transcode,download,bulk,default")
+    # slot download (network-bound): job yang jalan bersamaan, 0 = 2x jumlah CPU
+    WORKER_DOWNLOAD_SLOTS: int = int(os.getenv("WORKER_DOWNLOAD_SLOTS", "0")) or (os.cpu_count() or 1) * 2
+    # slot ffmpeg (CPU-bound): encode yang boleh jalan bersamaan di host ini, 0 = jumlah CPU
+    WORKER_CPU_SLOTS: int = int(os.getenv("WORKER_CPU_SLOTS", "0")) or (os.cpu_count() or 1)
+    # shutdown: tunggu job yang sedang jalan selesai sampai batas ini (detik)
+    WORKER_DRAIN_TIMEOUT_SECONDS: float = float(os.getenv("WORKER_DRAIN_TIMEOUT_SECONDS", "600"))
+    WORKER_RESTART_BACKOFF_SECONDS: float = float(os.getenv("WORKER_RESTART_BACKOFF_SECONDS", "2"))
+    # mode slot: "fork" = RQ Worker, tiap job jalan di proses anak hasil fork dari slot
+    # (terisolasi, state yt-dlp ikut hangat lewat copy-on-write); "simple" = job in-process
+    WORKER_MODE: str = os.getenv("WORKER_MODE", "fork")
+    # import job + yt-dlp & semua extractor sekali di supervisor sebelum fork slot
+    WORKER_PRELOAD: bool = os.getenv("WORKER_PRELOAD", "1") == "1"
+
+    # metrik Prometheus (/metrics), diagregasi di Redis; flush buffer API tiap N detik
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "1") == "1"
+    METRICS_FLUSH_SECONDS: float = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
 settings = Settings()
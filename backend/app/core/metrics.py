@@ -0,0 +1,359 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.queue.redis_conn import get_redis
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Metrik format Prometheus tanpa prometheus_client. API, worker dan work horse RQ
+# (proses hasil fork, umurnya satu job) sama-sama menambah nilai ke Redis,
+# /metrics di API merender gabungannya:
+#
+#   metrics:meta     hash   nama metrik -> {type, help, buckets} (JSON)
+#   metrics:{nama}   hash   counter:    '<label>'         -> total
+#                           histogram:  '<label>|<le>'    -> jumlah observasi di bucket itu (belum kumulatif)
+#                                       '<label>|sum', '<label>|count'
+#
+# Proses API: nilai dikumpulkan in-process, di-flush tiap METRICS_FLUSH_SECONDS
+# dalam satu pipeline (tidak ada round trip Redis per request). Proses lain
+# langsung menulis, supaya tidak hilang waktu work horse exit.
+# Gauge (kedalaman queue, latency Redis) dihitung saat scrape.
+
+META_KEY = "metrics:meta"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+JOB_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+RATE_BUCKETS = (64e3, 256e3, 1e6, 2.5e6, 5e6, 10e6, 25e6, 50e6, 100e6)
+
+_lock = threading.Lock()
+_buffer: Dict[Tuple[str, str], float] = {}
+_buffer_pid: Optional[int] = None
+_buffered = False
+_meta_written: set = set()
+_registry: Dict[str, "_Metric"] = {}
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+def _key(name: str) -> str:
+    return f"metrics:{name}"
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        _registry[name] = self
+
+    def _label_str(self, values: dict) -> str:
+        return ",".join(f'{n}="{_escape(values.get(n, ""))}"' for n in self.labels)
+
+    def meta(self) -> dict:
+        return {"type": self.type, "help": self.help}
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, value: float = 1, **labels):
+        if value:
+            _add({(self.name, self._label_str(labels)): value})
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def meta(self) -> dict:
+        return {**super().meta(), "buckets": list(self.buckets)}
+
+    def observe(self, value: float, **labels):
+        lbl = self._label_str(labels)
+        le = next((b for b in self.buckets if value <= b), float("inf"))
+        _add({
+            (self.name, f"{lbl}|{_fmt(le)}"): 1,
+            (self.name, f"{lbl}|sum"): value,
+            (self.name, f"{lbl}|count"): 1,
+        })
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+# ===== metrik =====
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Latency request HTTP per route.", ("method", "route", "status"),
+)
+PARSE_SECONDS = Histogram(
+    "youtube_parse_seconds", "Latency parse_youtube (hit/stale = cache, miss/nocache = extract).", ("result",),
+)
+EXTRACT_SECONDS = Histogram(
+    "youtube_extract_seconds", "Durasi extract info yt-dlp.", ("result",), JOB_BUCKETS,
+)
+JOB_QUEUE_WAIT_SECONDS = Histogram(
+    "job_queue_wait_seconds", "Waktu job di queue RQ sebelum diambil worker.", ("queue",), JOB_BUCKETS,
+)
+JOB_STAGE_SECONDS = Histogram(
+    "job_stage_seconds", "Durasi tiap stage job (init, downloading, postprocess, ...).", ("stage",), JOB_BUCKETS,
+)
+JOBS_TOTAL = Counter("jobs_total", "Job selesai per status akhir.", ("status",))
+DOWNLOAD_BYTES_TOTAL = Counter("download_bytes_total", "Byte yang didownload yt-dlp.")
+DOWNLOAD_RATE = Histogram(
+    "download_bandwidth_bytes_per_second", "Rata-rata bandwidth per download.", (), RATE_BUCKETS,
+)
+TRANSCODE_CPU_SECONDS_TOTAL = Counter(
+    "transcode_cpu_seconds_total", "CPU time (user+sys) proses ffmpeg.", ("path",),
+)
+
+
+def child_cpu_seconds() -> float:
+    """
+    CPU time child process yang sudah selesai (di-wait). Selisih sebelum/sesudah
+    satu ffmpeg = CPU ffmpeg itu. 0 kalau tidak didukung OS.
+    """
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+# ===== tulis =====
+def _add(items: Dict[Tuple[str, str], float]):
+    global _buffer_pid
+    if not settings.METRICS_ENABLED:
+        return
+
+    if _buffered:
+        with _lock:
+            if _buffer_pid != os.getpid():
+                # proses baru (fork): buffer & thread flush milik parent tidak ikut
+                _buffer.clear()
+                _buffer_pid = os.getpid()
+                _start_flusher()
+            for k, v in items.items():
+                _buffer[k] = _buffer.get(k, 0) + v
+        return
+
+    _write(items)
+
+
+def _write(items: Dict[Tuple[str, str], float]):
+    if not items:
+        return
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            for name in {name for name, _ in items} - _meta_written:
+                pipe.hset(META_KEY, name, json.dumps(_registry[name].meta()))
+            for (name, field), value in items.items():
+                pipe.hincrbyfloat(_key(name), field, value)
+            pipe.execute()
+        _meta_written.update(name for name, _ in items)
+    except Exception:
+        # metrik tidak boleh bikin request/job gagal
+        logger.warning("Gagal menulis metrik ke Redis", exc_info=True)
+
+
+def flush():
+    with _lock:
+        items = dict(_buffer)
+        _buffer.clear()
+    _write(items)
+
+
+def _start_flusher():
+    def loop():
+        while True:
+            time.sleep(settings.METRICS_FLUSH_SECONDS)
+            flush()
+
+    threading.Thread(target=loop, name="metrics-flush", daemon=True).start()
+
+
+# ===== render =====
+def _decode(v):
+    return v.decode() if isinstance(v, bytes) else v
+
+
+def _render_histogram(name: str, meta: dict, fields: Dict[str, str]) -> List[str]:
+    series: Dict[str, Dict[str, float]] = {}
+    for field, value in fields.items():
+        lbl, _, part = field.rpartition("|")
+        series.setdefault(lbl, {})[part] = float(value)
+
+    lines = []
+    bounds = [_fmt(b) for b in meta.get("buckets") or ()] + ["+Inf"]
+    for lbl, parts in sorted(series.items()):
+        sep = "," if lbl else ""
+        total = 0.0
+        for le in bounds:
+            total += parts.get(le, 0)
+            lines.append(f'{name}_bucket{{{lbl}{sep}le="{le}"}} {_fmt(total)}')
+        lines.append(f"{_series(name + '_sum', lbl)} {_fmt(parts.get('sum', 0))}")
+        lines.append(f"{_series(name + '_count', lbl)} {_fmt(parts.get('count', 0))}")
+    return lines
+
+
+def _series(name: str, lbl: str) -> str:
+    return f"{name}{{{lbl}}}" if lbl else name
+
+
+def render(gauges: Sequence[Tuple[str, str, Dict[str, str], float]] = ()) -> str:
+    """
+    Text exposition format Prometheus dari semua metrik di Redis.
+    `gauges`: (nama, help, label, nilai) yang dihitung saat scrape.
+    """
+    r = get_redis()
+    meta = {_decode(k): json.loads(v) for k, v in r.hgetall(META_KEY).items()}
+    names = sorted(meta)
+    with r.pipeline(transaction=False) as pipe:
+        for name in names:
+            pipe.hgetall(_key(name))
+        rows = pipe.execute()
+
+    lines = []
+    for name, row in zip(names, rows):
+        fields = {_decode(k): _decode(v) for k, v in row.items()}
+        lines.append(f"# HELP {name} {meta[name]['help']}")
+        lines.append(f"# TYPE {name} {meta[name]['type']}")
+        if meta[name]["type"] == "histogram":
+            lines += _render_histogram(name, meta[name], fields)
+        else:
+            for lbl, value in sorted(fields.items()):
+                lines.append(f"{_series(name, lbl)} {_fmt(float(value))}")
+
+    declared = set()
+    for name, help, labels, value in gauges:
+        if name not in declared:
+            declared.add(name)
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+        lbl = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        lines.append(f"{_series(name, lbl)} {_fmt(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+# ===== API =====
+class _MetricsMiddleware:
+    """
+    Latency per route (template path, bukan path asli, supaya label tidak meledak).
+    ASGI murni: tidak membungkus body response seperti BaseHTTPMiddleware.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        root_path = scope.get("root_path", "")
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                # router yang di-include/mount: prefix-nya ada di root_path
+                route = scope.get("root_path", "")[len(root_path):] + route
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route or "unmatched",
+                status=status["code"],
+            )
+
+
+def _scrape_gauges() -> List[Tuple[str, str, Dict[str, str], float]]:
+    from rq.registry import DeferredJobRegistry, FailedJobRegistry, ScheduledJobRegistry, StartedJobRegistry
+
+    from app.queue.rq_queue import get_queue, queue_names
+
+    r = get_redis()
+    start = time.perf_counter()
+    r.ping()
+    gauges = [("redis_ping_seconds", "Round trip PING ke Redis saat scrape.", {}, time.perf_counter() - start)]
+
+    names = queue_names()
+    registries = (
+        ("started", StartedJobRegistry),
+        ("deferred", DeferredJobRegistry),
+        ("scheduled", ScheduledJobRegistry),
+        ("failed", FailedJobRegistry),
+    )
+    with r.pipeline(transaction=False) as pipe:
+        for name in names:
+            q = get_queue(name)
+            pipe.llen(q.key)
+            for _, cls in registries:
+                pipe.zcard(cls(queue=q).key)
+        counts = iter(pipe.execute())
+
+    help = "Jumlah job RQ per queue dan state."
+    for name in names:
+        gauges.append(("rq_queue_jobs", help, {"queue": name, "state": "queued"}, next(counts)))
+        for state, _ in registries:
+            gauges.append(("rq_queue_jobs", help, {"queue": name, "state": state}, next(counts)))
+    return gauges
+
+
+def setup_metrics(app):
+    """
+    Pasang middleware latency dan endpoint GET /metrics (format Prometheus).
+    """
+    from starlette.responses import PlainTextResponse
+    from starlette.concurrency import run_in_threadpool
+
+    global _buffered
+    if not settings.METRICS_ENABLED:
+        return
+    _buffered = True
+
+    app.add_middleware(_MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        def collect():
+            flush()
+            return render(_scrape_gauges())
+
+        body = await run_in_threadpool(collect)
+        return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,223 @@
+import os
+import re
+import signal
+import socket
+import subprocess
+import time
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.metrics import DOWNLOAD_BYTES_TOTAL, DOWNLOAD_RATE
+from app.queue.job_state import set_state
+from app.queue.redis_conn import get_redis
+
+# Governor bandwidth per host, dibagi semua download yang aktif di host itu:
+#
+#   bw:{host}:bucket   hash   token bucket bersama (tokens, ts), satuan byte
+#   bw:{host}:jobs     zset   job id -> heartbeat terakhir (download aktif)
+#
+# yt-dlp jalan sebagai proses sendiri, jadi throttle dilakukan dari luar:
+# byte yang sudah didownload (dari baris progress) diambil dari bucket, kalau
+# bucket minus process group yt-dlp (termasuk downloader eksternal & ffmpeg anaknya,
+# karena itu yt-dlp dijalankan dengan start_new_session=True) di-SIGSTOP sampai
+# utangnya lunas lalu SIGCONT.
+# Tiap job juga dibatasi jatah adil = limit host / jumlah job aktif, supaya
+# satu job besar (4K) tidak menghabiskan bucket sendirian.
+
+# token bucket dengan utang: byte sudah terlanjur didownload, jadi selalu dikurangi;
+# return detik yang harus ditunggu sampai saldo kembali >= 0
+_TAKE_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local n = tonumber(ARGV[4])
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate) - n
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 60)
+if tokens >= 0 then
+  return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+# template progress: format tetap "[download]  12.3%" (dibaca _parse_download_pct)
+# plus jumlah byte untuk governor
+PROGRESS_TEMPLATE = "download:[download] %(progress._percent_str)s bytes=%(progress.downloaded_bytes)s"
+_BYTES_RE = re.compile(r"bytes=(\d+)")
+
+# job dianggap tidak aktif kalau tidak heartbeat selama ini (detik)
+_STALE_SECONDS = 30
+
+
+def ytdlp_speed_args() -> List[str]:
+    """
+    Download fragment DASH/HLS paralel (-N) dan batas rate per job (--limit-rate).
+    """
+    args = ["--concurrent-fragments", str(settings.YTDLP_CONCURRENT_FRAGMENTS)]
+    if settings.DOWNLOAD_JOB_RATE_LIMIT > 0:
+        args += ["--limit-rate", str(settings.DOWNLOAD_JOB_RATE_LIMIT)]
+    args += ["--progress-template", PROGRESS_TEMPLATE]
+    return args
+
+
+def _key(*parts: str) -> str:
+    return ":".join(("bw", socket.gethostname()) + parts)
+
+
+class BandwidthGovernor:
+    """
+    Dipasang di loop pembacaan output yt-dlp: feed(line) tiap baris.
+
+        with BandwidthGovernor(job_id) as gov:
+            gov.attach(proc)
+            for line in proc.stdout:
+                gov.feed(line)
+
+    Pemakaian (rate terukur, jatah, jumlah job aktif) ditulis ke state job, field "bandwidth".
+    """
+
+    def __init__(self, job_id: str, interval: Optional[float] = None):
+        self.job_id = job_id
+        self.host_rate = settings.DOWNLOAD_HOST_RATE_LIMIT
+        self.interval = settings.BANDWIDTH_REBALANCE_SECONDS if interval is None else interval
+
+        self._proc: Optional[subprocess.Popen] = None
+        self._r = get_redis()
+        self._take = self._r.register_script(_TAKE_LUA)
+
+        self._last_bytes = 0
+        self._started = time.monotonic()
+        self._total = 0
+        self._share = 0.0
+        self._active = 1
+        # jatah per job: token bucket lokal (tanpa Redis)
+        self._local_tokens = 0.0
+        self._local_ts = time.monotonic()
+        self._next_beat = 0.0
+
+    def __enter__(self):
+        self._heartbeat()
+        return self
+
+    def __exit__(self, *exc):
+        self._resume()
+        if self._total > 0:
+            DOWNLOAD_BYTES_TOTAL.inc(self._total)
+            DOWNLOAD_RATE.observe(self._total / max(time.monotonic() - self._started, 1e-6))
+        try:
+            self._r.zrem(_key("jobs"), self.job_id)
+        except Exception:
+            pass
+        return False
+
+    def attach(self, proc: subprocess.Popen):
+        """proc harus dijalankan dengan start_new_session=True (pause satu process group)."""
+        self._proc = proc
+
+    def feed(self, line: str):
+        m = _BYTES_RE.search(line)
+        if not m:
+            return
+
+        downloaded = int(m.group(1))
+        # attempt/format baru: counter yt-dlp mulai dari 0 lagi
+        delta = downloaded - self._last_bytes if downloaded >= self._last_bytes else downloaded
+        self._last_bytes = downloaded
+        self._total += delta
+
+        now = time.monotonic()
+        if now >= self._next_beat:
+            self._heartbeat()
+
+        if self.host_rate > 0 and delta > 0:
+            self._throttle(delta, now)
+
+    def _heartbeat(self):
+        now = time.monotonic()
+        self._next_beat = now + self.interval
+
+        jobs = _key("jobs")
+        with self._r.pipeline() as pipe:
+            pipe.zadd(jobs, {self.job_id: time.time()})
+            pipe.zremrangebyscore(jobs, "-inf", time.time() - _STALE_SECONDS)
+            pipe.zcard(jobs)
+            pipe.expire(jobs, _STALE_SECONDS * 2)
+            self._active = max(1, pipe.execute()[2])
+
+        if self.host_rate > 0:
+            self._share = self.host_rate / self._active
+            if settings.DOWNLOAD_JOB_RATE_LIMIT > 0:
+                self._share = min(self._share, settings.DOWNLOAD_JOB_RATE_LIMIT)
+
+        elapsed = max(now - self._started, 1e-6)
+        set_state(self.job_id, {"bandwidth": {
+            "rate": int(self._total / elapsed),
+            "bytes": self._total,
+            "share": int(self._share) or None,
+            "host_limit": self.host_rate or None,
+            "active_jobs": self._active,
+        }})
+
+    def _throttle(self, delta: int, now: float):
+        # bucket host (Redis), burst 1 detik
+        wait = float(self._take(
+            keys=[_key("bucket")],
+            args=[self.host_rate, self.host_rate, time.time(), delta],
+        ))
+
+        # jatah adil job ini, burst 1 detik
+        self._local_tokens = min(self._share, self._local_tokens + (now - self._local_ts) * self._share) - delta
+        self._local_ts = now
+        if self._local_tokens < 0:
+            wait = max(wait, -self._local_tokens / self._share)
+
+        if wait > 0:
+            self._pause(wait)
+
+    def _debt_seconds(self) -> float:
+        # sisa utang sekarang: bucket host (ambil 0 byte) dan jatah lokal yang sudah terisi lagi
+        wait = float(self._take(
+            keys=[_key("bucket")],
+            args=[self.host_rate, self.host_rate, time.time(), 0],
+        ))
+        if self._local_tokens < 0:
+            now = time.monotonic()
+            self._local_tokens = min(self._share, self._local_tokens + (now - self._local_ts) * self._share)
+            self._local_ts = now
+            if self._local_tokens < 0:
+                wait = max(wait, -self._local_tokens / self._share)
+        return wait
+
+    def _pause(self, seconds: float):
+        """
+        Tahan download sampai utang lunas. Tidur per `interval`: heartbeat tetap jalan
+        (job tidak dianggap mati) dan utang dihitung ulang, karena job lain ikut
+        menarik bucket host selama kita berhenti.
+        """
+        stopped = self._signal(getattr(signal, "SIGSTOP", None))
+        try:
+            while seconds > 0:
+                # tanpa SIGSTOP (Windows): berhenti baca, yt-dlp ikut tertahan saat pipe penuh
+                time.sleep(min(seconds, self.interval))
+                if time.monotonic() >= self._next_beat:
+                    self._heartbeat()
+                seconds = self._debt_seconds()
+        finally:
+            if stopped:
+                self._resume()
+
+    def _signal(self, sig) -> bool:
+        if self._proc is None or sig is None or self._proc.poll() is not None:
+            return False
+        try:
+            os.killpg(self._proc.pid, sig)
+        except ProcessLookupError:
+            # bukan leader process group sendiri: cukup proses yt-dlp-nya
+            self._proc.send_signal(sig)
+        return True
+
+    def _resume(self):
+        self._signal(getattr(signal, "SIGCONT", None))
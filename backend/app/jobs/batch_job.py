@@ -0,0 +1,74 @@
+import uuid
+from typing import Iterator, List
+
+from yt_dlp import YoutubeDL
+
+from app.core.config import settings
+from app.queue.batch import add_batch_items, finish_expansion
+from app.utils.validators import extract_video_id
+
+
+def _iter_urls(sources: List[str]) -> Iterator[str]:
+    """
+    URL video dari list sumber. Playlist di-expand lazy (extract_flat, process=False):
+    entry diambil per halaman selagi diiterasi, tidak dimuat semua di awal.
+    """
+    opts = {
+        "quiet": True,
+        "no_warnings": True,
+        "extract_flat": "in_playlist",
+        "lazy_playlist": True,
+        "skip_download": True,
+    }
+    with YoutubeDL(opts) as ydl:
+        for source in sources:
+            # URL video biasa tidak perlu extract
+            if extract_video_id(source) and "list=" not in source:
+                yield source
+                continue
+
+            info = ydl.extract_info(source, download=False, process=False)
+
+            if info.get("_type") not in ("playlist", "multi_video"):
+                yield info.get("webpage_url") or source
+                continue
+
+            for entry in info.get("entries") or []:
+                if not entry:
+                    continue
+                url = entry.get("url") or entry.get("id")
+                if url and not url.startswith("http"):
+                    url = f"https://www.youtube.com/watch?v={url}"
+                if url:
+                    yield url
+
+
+def expand_batch_job(batch_id: str, sources: List[str], max_items: int = 0):
+    """
+    Expand playlist / list URL jadi item batch secara bertahap (per chunk),
+    item langsung di-enqueue selama slot paralel batch masih ada.
+    """
+    max_items = max_items or settings.BATCH_MAX_ITEMS
+    chunk = []
+    count = 0
+
+    try:
+        for url in _iter_urls(sources):
+            chunk.append({"id": uuid.uuid4().hex, "url": url})
+            count += 1
+
+            if len(chunk) >= settings.BATCH_EXPAND_CHUNK:
+                add_batch_items(batch_id, chunk)
+                chunk = []
+
+            if count >= max_items:
+                break
+
+        add_batch_items(batch_id, chunk)
+    except Exception as e:
+        add_batch_items(batch_id, chunk)
+        finish_expansion(batch_id, error=str(e))
+        raise
+
+    finish_expansion(batch_id)
+    return {"batch_id": batch_id, "items": count}
@@ -0,0 +1,465 @@
+import json
+import subprocess
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from rq import Callback, Retry
+from rq.job import Dependency, Job
+
+from app.core.config import settings
+from app.core.metrics import TRANSCODE_CPU_SECONDS_TOTAL, child_cpu_seconds
+from app.jobs.bandwidth import BandwidthGovernor, ytdlp_speed_args
+from app.jobs.progress import state_progress_reporter
+from app.jobs.retry import checkpoint, download_error, start_attempt, stop_if_permanent, ytdlp_retry_args
+from app.jobs.slots import cpu_slot
+from app.jobs.youtube_job import _kill_and_wait, _parse_download_pct, _safe_name, _which_ffmpeg
+from app.queue import batch, fair
+from app.queue.job_meta import PIPELINED
+from app.queue.job_state import get_state, set_state
+from app.queue.redis_conn import get_redis
+from app.queue.rq_queue import get_queue, retry_policy
+from app.services import artifact_store, storage_janitor
+from app.services.transcode_planner import PATH_COPY, plan_state
+
+# Job download dipecah jadi stage, masing-masing job RQ di queue sendiri:
+#
+#   extract   (job utama, di dalam download_job)  info + plan -> .pipeline.json
+#   download  (QUEUE_DOWNLOAD)   stream sumber -> .src.<format_id>.<ext>
+#                                (mp3 + MP3_PIPELINE: yt-dlp | ffmpeg langsung -> <title>.mp3)
+#   transcode (QUEUE_TRANSCODE)  remux / encode -> <title>.<ext> (dilewati kalau output sudah ada
+#                                atau download gagal; retry hanya untuk ffmpeg gagal)
+#   finalize  (QUEUE_FINALIZE)   publish artifact, index file, status selesai
+#
+# Antar stage cukup lewat folder job di storage dir. Stage download/transcode
+# di-retry sendiri (transcode gagal tidak download ulang). Status job untuk client
+# ada di job:{id}:state karena job utama sudah selesai setelah extract.
+
+MANIFEST_NAME = ".pipeline.json"
+
+# return stage transcode kalau download gagal (dilewati, tidak di-retry)
+STAGE_SKIPPED = "skipped"
+
+
+# ===== helper bersama (dipakai juga rendition_job) =====
+def download_sources(
+    info_path: Path,
+    out_dir: Path,
+    source_ids: List[str],
+    on_pct: Callable[[float], None],
+) -> Dict[str, Path]:
+    """
+    Download tiap format sumber sekali (tanpa merge) dari .info.json:
+    out_dir/.src.<format_id>.<ext>. on_pct(0-100) untuk progress gabungan.
+    Format yang sudah selesai di attempt sebelumnya dilewati, .part dilanjutkan.
+    """
+    cmd = [
+        "yt-dlp",
+        "--load-info-json", str(info_path),
+        "-f", ",".join(source_ids),
+        "-o", str(out_dir / ".src.%(format_id)s.%(ext)s"),
+        "--newline",
+        *ytdlp_retry_args(),
+        *ytdlp_speed_args(),
+    ]
+    proc = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="ignore",
+        start_new_session=True,
+    )
+
+    # yt-dlp download format satu per satu, tiap format diawali "Destination:"
+    # (format yang sudah lengkap: "has already been downloaded")
+    done = -1
+    tail = deque(maxlen=20)
+    # folder = job id
+    try:
+        with BandwidthGovernor(out_dir.name) as governor:
+            governor.attach(proc)
+            for line in proc.stdout:
+                tail.append(line)
+                governor.feed(line)
+                if "Destination:" in line or "has already been downloaded" in line:
+                    done += 1
+                pct = _parse_download_pct(line)
+                if pct is not None:
+                    on_pct((max(done, 0) + pct / 100) / len(source_ids) * 100)
+
+            ret = proc.wait()
+    finally:
+        _kill_and_wait(proc)
+
+    if ret != 0:
+        raise download_error(tail, "yt-dlp gagal download stream sumber.")
+
+    sources = {}
+    for fid in source_ids:
+        found = sorted(out_dir.glob(f".src.{fid}.*"))
+        if not found:
+            raise RuntimeError(f"Stream sumber {fid} tidak ditemukan.")
+        sources[fid] = found[0]
+    return sources
+
+
+def pipe_audio(
+    info_path: Path,
+    out_dir: Path,
+    plan: dict,
+    bitrate: Optional[int],
+    output: Path,
+    on_pct: Callable[[float], None],
+) -> Path:
+    """
+    mp3 satu jalan: yt-dlp tulis stream audio ke stdout, ffmpeg encode (atau copy)
+    dari stdin selama download berjalan, jadi sumber tidak ditulis ke disk lalu dibaca
+    ulang. Ditulis ke <output>.part lalu di-rename ke `output` (path pasti, tidak
+    perlu cari file hasil). Tidak bisa lanjut dari .part: retry mulai dari awal.
+    """
+    part = output.with_name(output.name + ".part")
+    ytdlp_cmd = [
+        "yt-dlp",
+        "--load-info-json", str(info_path),
+        "-f", plan["format"],
+        "-o", "-",
+        "--newline",
+        *ytdlp_retry_args(),
+        *ytdlp_speed_args(),
+    ]
+    ffmpeg_cmd = [
+        _which_ffmpeg(), "-y", "-loglevel", "error", "-i", "pipe:0",
+        *ffmpeg_output_args("mp3", plan, {plan["format"].split("+")[0]: 0}, bitrate, part),
+    ]
+
+    tail = deque(maxlen=20)
+    cpu_before = child_cpu_seconds()
+    with cpu_slot(plan["path"] != PATH_COPY):
+        ytdlp = subprocess.Popen(ytdlp_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+        ffmpeg = None
+        try:
+            ffmpeg = subprocess.Popen(ffmpeg_cmd, stdin=ytdlp.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            ytdlp.stdout.close()  # ffmpeg pegang satu-satunya ujung baca
+
+            # dengan -o -, progress yt-dlp keluar di stderr (folder = job id)
+            with BandwidthGovernor(out_dir.name) as governor:
+                governor.attach(ytdlp)
+                for raw in ytdlp.stderr:
+                    line = raw.decode("utf-8", errors="ignore").strip()
+                    tail.append(line)
+                    governor.feed(line)
+                    pct = _parse_download_pct(line)
+                    if pct is not None:
+                        on_pct(pct)
+                ytdlp_ret = ytdlp.wait()
+
+            err = ffmpeg.stderr.read().decode("utf-8", errors="ignore")
+            ffmpeg_ret = ffmpeg.wait()
+        finally:
+            _kill_and_wait(ytdlp, ffmpeg)
+    # termasuk CPU yt-dlp, encode dan download jalan di satu pipe
+    TRANSCODE_CPU_SECONDS_TOTAL.inc(child_cpu_seconds() - cpu_before, path=plan["path"])
+
+    if ytdlp_ret != 0:
+        part.unlink(missing_ok=True)
+        raise download_error(tail, "yt-dlp gagal download stream audio.")
+    if ffmpeg_ret != 0:
+        part.unlink(missing_ok=True)
+        raise RuntimeError(f"ffmpeg gagal: {err.strip()[-300:]}")
+
+    part.replace(output)
+    return output
+
+
+def ffmpeg_output_args(
+    file_type: str,
+    plan: dict,
+    index: Dict[str, int],
+    bitrate: Optional[int],
+    out_path: Path,
+) -> List[str]:
+    """
+    Argumen ffmpeg untuk satu output: -map dari input `index[format_id]`,
+    stream copy kalau plan copy, encode kalau tidak.
+    """
+    fids = plan["format"].split("+")
+    copy = plan["path"] == PATH_COPY
+
+    if file_type == "mp4":
+        if len(fids) == 2:
+            maps = ["-map", f"{index[fids[0]]}:v:0", "-map", f"{index[fids[1]]}:a:0"]
+        else:
+            maps = ["-map", f"{index[fids[0]]}:v:0", "-map", f"{index[fids[0]]}:a:0?"]
+        codec = ["-c", "copy"] if copy else ["-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac"]
+        return [*maps, *codec, "-movflags", "+faststart", "-f", "mp4", str(out_path)]
+
+    codec = ["-c:a", "copy"] if copy else ["-b:a", f"{bitrate or 192}k"]
+    return ["-map", f"{index[fids[0]]}:a:0", "-vn", *codec, "-f", "mp3", str(out_path)]
+
+
+def plan_sources(plan: dict, formats: List[dict]) -> Optional[List[str]]:
+    """
+    format_id sumber dari plan, None kalau plan berupa selector
+    (format list tidak lengkap) dan tidak bisa didownload per stream.
+    """
+    known = {f.get("format_id") for f in formats}
+    fids = plan["format"].split("+")
+    return fids if all(fid in known for fid in fids) else None
+
+
+# ===== manifest =====
+def _manifest_path(out_dir: Path) -> Path:
+    return out_dir / MANIFEST_NAME
+
+
+def _load(storage_dir: str, job_id: str) -> tuple:
+    out_dir = Path(storage_dir) / job_id
+    manifest = json.loads(_manifest_path(out_dir).read_text(encoding="utf-8"))
+    return out_dir, manifest
+
+
+def _save(out_dir: Path, manifest: dict):
+    tmp = out_dir / (MANIFEST_NAME + ".tmp")
+    tmp.write_text(json.dumps(manifest), encoding="utf-8")
+    tmp.replace(_manifest_path(out_dir))
+
+
+def _stage_failed(job_id: str, e: Exception):
+    # status final ditentukan finalize, di sini cukup catat error terakhir
+    set_state(job_id, {"error": str(e)})
+
+
+# ===== stage 1: extract (dipanggil dari download_job) =====
+def start_pipeline(
+    job_id: str,
+    out_dir: Path,
+    info_path: Path,
+    plan: dict,
+    file_type: str,
+    bitrate: Optional[int],
+    storage_dir: str,
+    key: Optional[str],
+) -> Optional[dict]:
+    """
+    Simpan manifest lalu enqueue stage download -> transcode -> finalize.
+    Return None kalau plan tidak bisa dipecah per stream (job jalan seperti biasa).
+    """
+    info = json.loads(info_path.read_text(encoding="utf-8"))
+    sources = plan_sources(plan, info.get("formats") or [])
+    if not sources:
+        return None
+
+    _save(out_dir, {
+        "job_id": job_id,
+        "type": file_type,
+        "bitrate": bitrate,
+        "title": (info.get("title") or "output")[:80],
+        "duration": info.get("duration"),
+        "plan": plan,
+        "sources": sources,
+        "key": key,
+    })
+
+    set_state(job_id, {"status": "started", "progress": 5, "stage": "queued", "error": ""})
+
+    common = {"result_ttl": settings.JOB_TTL_SECONDS, "failure_ttl": settings.JOB_TTL_SECONDS}
+    retry = Retry(max=settings.PIPELINE_STAGE_RETRIES) if settings.PIPELINE_STAGE_RETRIES else None
+
+    # download: backoff + jitter, attempt berikutnya lanjut dari .part
+    download = get_queue(settings.QUEUE_DOWNLOAD).enqueue(
+        download_stage, job_id, storage_dir,
+        job_id=f"{job_id}-download", retry=retry_policy(settings.PIPELINE_STAGE_RETRIES), **common,
+    )
+    # allow_failure: stage berikutnya tetap jalan dan ikut gagal, supaya finalize
+    # selalu jalan dan status akhir job tercatat
+    transcode = get_queue(settings.QUEUE_TRANSCODE).enqueue(
+        transcode_stage, job_id, storage_dir,
+        job_id=f"{job_id}-transcode", retry=retry,
+        depends_on=Dependency(jobs=[download], allow_failure=True), **common,
+    )
+    get_queue(settings.QUEUE_FINALIZE).enqueue(
+        finalize_stage, job_id, storage_dir,
+        job_id=f"{job_id}-finalize",
+        depends_on=Dependency(jobs=[transcode], allow_failure=True),
+        meta={"entry_job_id": job_id},
+        on_success=Callback(on_finalize_success),
+        on_failure=Callback(on_finalize_failure),
+        **common,
+    )
+
+    return {"job_id": job_id, "type": file_type, "status": PIPELINED, "transcode_path": plan.get("path")}
+
+
+# ===== stage 2: download =====
+def download_stage(job_id: str, storage_dir: str = "storage"):
+    out_dir, manifest = _load(storage_dir, job_id)
+    progress = state_progress_reporter(job_id)
+    attempt = start_attempt(job_id, out_dir)
+    progress.update(5, "resuming" if attempt > 1 else "downloading")
+
+    if manifest["type"] == "mp3" and settings.MP3_PIPELINE:
+        _download_mp3(job_id, out_dir, manifest, progress)
+        return
+
+    try:
+        files = download_sources(
+            out_dir / ".info.json",
+            out_dir,
+            manifest["sources"],
+            lambda pct: progress.update(5 + int(pct * 0.65), "downloading"),
+        )
+    except Exception as e:
+        stop_if_permanent(e)
+        checkpoint(job_id, out_dir, pct=progress.pct, error=str(e))
+        _stage_failed(job_id, e)
+        raise
+
+    manifest["files"] = {fid: path.name for fid, path in files.items()}
+    _save(out_dir, manifest)
+    if attempt > 1:
+        # error attempt sebelumnya sudah tidak relevan
+        set_state(job_id, {"error": ""})
+    checkpoint(job_id, out_dir, pct=70, error="")
+    progress.update(70, "downloaded")
+
+
+def _download_mp3(job_id: str, out_dir: Path, manifest: dict, progress):
+    """Stage download untuk mp3: langsung ke output lewat pipe, stage transcode tinggal lewat."""
+    output = out_dir / f"{_safe_name(manifest['title'])}.mp3"
+    try:
+        pipe_audio(
+            out_dir / ".info.json",
+            out_dir,
+            manifest["plan"],
+            manifest.get("bitrate"),
+            output,
+            lambda pct: progress.update(5 + int(pct * 0.9), "downloading"),
+        )
+    except Exception as e:
+        stop_if_permanent(e)
+        checkpoint(job_id, out_dir, pct=progress.pct, error=str(e))
+        _stage_failed(job_id, e)
+        raise
+
+    manifest["output"] = output.name
+    _save(out_dir, manifest)
+    set_state(job_id, {"error": ""})
+    checkpoint(job_id, out_dir, pct=95, error="")
+    progress.update(95, "finalizing")
+
+
+# ===== stage 3: transcode / remux =====
+def transcode_stage(job_id: str, storage_dir: str = "storage"):
+    out_dir, manifest = _load(storage_dir, job_id)
+    if manifest.get("output") and (out_dir / manifest["output"]).exists():
+        # mp3 lewat pipe: sudah di-encode di stage download
+        return
+    if not manifest.get("files"):
+        # download gagal: bukan kegagalan transcode, jangan raise (bisa di-retry RQ
+        # percuma). Error download sudah dicatat, finalize yang menandai job gagal.
+        if not (get_state(job_id, ("error",)) or {}).get("error"):
+            _stage_failed(job_id, RuntimeError("Stage download gagal, transcode dilewati."))
+        return STAGE_SKIPPED
+
+    progress = state_progress_reporter(job_id)
+    progress.update(70, "postprocess")
+
+    file_type = manifest["type"]
+    source_ids = manifest["sources"]
+    output = out_dir / f"{_safe_name(manifest['title'])}.{file_type}"
+
+    cmd = [_which_ffmpeg(), "-y", "-loglevel", "error", "-nostats", "-progress", "pipe:1"]
+    for fid in source_ids:
+        cmd += ["-i", str(out_dir / manifest["files"][fid])]
+    index = {fid: i for i, fid in enumerate(source_ids)}
+    cmd += ffmpeg_output_args(file_type, manifest["plan"], index, manifest.get("bitrate"), output)
+
+    duration_us = (manifest.get("duration") or 0) * 1_000_000
+    cpu_before = child_cpu_seconds()
+    with cpu_slot(manifest["plan"].get("path") != PATH_COPY):
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8", errors="ignore")
+        try:
+            for line in proc.stdout:
+                # -progress: "out_time_us=12345678"
+                if duration_us and line.startswith("out_time_us="):
+                    try:
+                        done_us = int(line.split("=", 1)[1])
+                    except ValueError:
+                        continue
+                    progress.update(70 + int(min(done_us / duration_us, 1) * 25), "postprocess")
+
+            err = proc.stderr.read()
+            returncode = proc.wait()
+        finally:
+            _kill_and_wait(proc)
+    TRANSCODE_CPU_SECONDS_TOTAL.inc(child_cpu_seconds() - cpu_before, path=manifest["plan"].get("path"))
+    if returncode != 0:
+        e = RuntimeError(f"ffmpeg gagal: {err.strip()[-300:]}")
+        _stage_failed(job_id, e)
+        raise e
+
+    manifest["output"] = output.name
+    _save(out_dir, manifest)
+    progress.update(95, "finalizing")
+
+
+# ===== stage 4: finalize =====
+def finalize_stage(job_id: str, storage_dir: str = "storage"):
+    out_dir, manifest = _load(storage_dir, job_id)
+    progress = state_progress_reporter(job_id)
+    key = manifest.get("key")
+
+    output = out_dir / manifest["output"] if manifest.get("output") else None
+    if output is None or not output.exists():
+        # stage sebelumnya gagal / dilewati (STAGE_SKIPPED): tidak ada output
+        if key:
+            artifact_store.clear_pending(key)
+        error = (get_state(job_id) or {}).get("error") or "Pipeline gagal."
+        set_state(job_id, {"error": error})
+        progress.update(100, "failed")
+        storage_janitor.job_done(out_dir)
+        raise RuntimeError(error)
+
+    if key:
+        artifact_store.publish(key, output, Path(storage_dir))
+
+    # bersihkan file antar stage
+    for name in list((manifest.get("files") or {}).values()) + [".info.json", MANIFEST_NAME]:
+        (out_dir / name).unlink(missing_ok=True)
+
+    set_state(job_id, {
+        "path": str(output.resolve()),
+        "filename": output.name,
+        **plan_state(manifest["plan"]),
+        "artifact": key or "",
+    })
+    progress.update(100, "done")
+    storage_janitor.job_done(out_dir, [output])
+
+    return {
+        "job_id": job_id,
+        "type": manifest["type"],
+        "file_name": output.name,
+        "file_path": str(output),
+        "download_url": f"/api/youtube/download/{job_id}",
+        "transcode_path": manifest["plan"].get("path"),
+        "status": "finished",
+    }
+
+
+# ===== callback: lepas slot fair-share / batch milik job utama =====
+def _release_entry(job, ok: bool):
+    try:
+        entry = Job.fetch(job.meta["entry_job_id"], connection=get_redis())
+    except Exception:
+        return
+
+    if entry.meta.get("batch_id"):
+        batch.release_item(entry, ok)
+    else:
+        fair.release(entry)
+
+
+def on_finalize_success(job, connection, result):
+    _release_entry(job, True)
+
+
+def on_finalize_failure(job, connection, type, value, traceback):
+    _release_entry(job, False)
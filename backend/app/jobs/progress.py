@@ -0,0 +1,110 @@
+import time
+from typing import Callable, Optional
+
+from rq import get_current_job
+
+from app.core.config import settings
+from app.core.metrics import JOB_QUEUE_WAIT_SECONDS, JOB_STAGE_SECONDS, JOBS_TOTAL
+from app.queue.events import publish_job_event
+from app.queue.job_state import set_state, status_for_stage
+from app.queue.redis_conn import get_redis
+
+# stage terminal selalu ditulis, tidak kena throttle
+FINAL_STAGES = {"done", "failed", "error"}
+
+
+class ProgressReporter:
+    """
+    Throttle update progress ke Redis.
+
+    - tidak menulis kalau progress & stage sama dengan yang terakhir ditulis
+    - perubahan progress saja dibatasi max 1 tulis per `min_interval` detik
+    - perubahan stage dan stage terakhir (done/failed) selalu ditulis
+    - nilai yang ketahan throttle ditulis saat flush()
+    - setelah stage terakhir ditulis, update non-terminal diabaikan (status
+      "finished"/"failed" tidak bisa turun lagi jadi "started")
+    """
+
+    def __init__(self, write: Callable[[int, str], None], min_interval: Optional[float] = None):
+        self._write = write
+        self.min_interval = settings.PROGRESS_MIN_INTERVAL_SECONDS if min_interval is None else min_interval
+
+        self._written: Optional[tuple] = None
+        self._pending: Optional[tuple] = None
+        self._last_write = 0.0
+        self.writes = 0
+
+    def update(self, pct: int, stage: str, force: bool = False):
+        state = (max(0, min(100, int(pct))), stage)
+        if self._written is not None and self._written[1] in FINAL_STAGES and stage not in FINAL_STAGES:
+            return
+        if state == self._written:
+            self._pending = None
+            return
+
+        stage_changed = self._written is None or self._written[1] != stage
+        due = time.monotonic() - self._last_write >= self.min_interval
+
+        if force or stage_changed or stage in FINAL_STAGES or due:
+            self._commit(state)
+        else:
+            self._pending = state
+
+    @property
+    def pct(self) -> int:
+        # progress terakhir (termasuk yang masih ketahan throttle)
+        state = self._pending or self._written
+        return state[0] if state else 0
+
+    def flush(self):
+        if self._pending is not None:
+            self._commit(self._pending)
+
+    def _commit(self, state: tuple):
+        self._write(*state)
+        self._written = state
+        self._pending = None
+        self._last_write = time.monotonic()
+        self.writes += 1
+
+
+def job_progress_reporter() -> ProgressReporter:
+    """
+    Reporter untuk job RQ yang sedang jalan (state job + publish event SSE).
+    Di luar worker (job None) update diabaikan.
+    """
+    job = get_current_job()
+    if not job:
+        return ProgressReporter(lambda pct, stage: None)
+    return state_progress_reporter(job.id)
+
+
+def state_progress_reporter(job_id: str, timed: bool = True) -> ProgressReporter:
+    """
+    Reporter yang menulis ke state job_id: dipakai job RQ sendiri, maupun job
+    yang statusnya tidak diwakili satu job RQ (rendition, stage pipeline).
+
+    timed: catat waktu tunggu job RQ yang sedang jalan dan durasi tiap stage ke
+    metrik. False untuk reporter yang stage-nya sudah diukur reporter lain.
+    """
+    job = get_current_job()
+    if timed and job and job.enqueued_at and job.started_at:
+        JOB_QUEUE_WAIT_SECONDS.observe(
+            max(0.0, (job.started_at - job.enqueued_at).total_seconds()), queue=job.origin,
+        )
+
+    current = {"stage": None, "since": time.monotonic()}
+
+    def write(pct: int, stage: str):
+        set_state(job_id, {"status": status_for_stage(stage), "progress": pct, "stage": stage})
+        publish_job_event(get_redis(), job_id, {"progress": pct, "stage": stage})
+
+        if timed and stage != current["stage"]:
+            now = time.monotonic()
+            if current["stage"] is not None:
+                JOB_STAGE_SECONDS.observe(now - current["since"], stage=current["stage"])
+            current["stage"], current["since"] = stage, now
+            if stage in FINAL_STAGES:
+                JOBS_TOTAL.inc(status=status_for_stage(stage))
+
+    return ProgressReporter(write)
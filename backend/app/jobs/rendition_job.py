@@ -0,0 +1,228 @@
+import json
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+from rq import get_current_job
+from yt_dlp import YoutubeDL
+
+from app.core.metrics import TRANSCODE_CPU_SECONDS_TOTAL, child_cpu_seconds
+from app.jobs.pipeline import download_sources, ffmpeg_output_args, plan_sources
+from app.jobs.progress import ProgressReporter, job_progress_reporter, state_progress_reporter
+from app.jobs.retry import stop_if_permanent
+from app.jobs.slots import cpu_slot
+from app.jobs.youtube_job import _ensure_dir, _kill_and_wait, _safe_name, _which_ffmpeg
+from app.queue.dedup import canonical_job_key
+from app.queue.events import publish_job_event
+from app.queue.job_meta import will_retry
+from app.queue.job_state import mark_failed, set_state
+from app.queue.redis_conn import get_redis
+from app.services import artifact_store, storage_janitor
+from app.services.transcode_planner import PATH_COPY, plan_state, plan_transcode
+
+
+def renditions_job(
+    url: str,
+    job_id: str,
+    renditions: List[dict],
+    storage_dir: str = "storage",
+):
+    """
+    Satu URL, banyak output (mis. mp3 + mp4 720p, atau beberapa bitrate mp3).
+
+    renditions: [{"id": "<job id rendition>", "type": "mp4"|"mp3", "quality": ..., "bitrate": ...}]
+
+    Tiap stream sumber didownload sekali (satu panggilan yt-dlp), semua output
+    dibuat dari satu panggilan ffmpeg dengan banyak output. Rendition yang sudah
+    ada di artifact store langsung dipakai ulang.
+    Tiap rendition punya state & file sendiri (/jobs/{id}, /download/{id}).
+    """
+    progress = job_progress_reporter()
+    progress.update(1, "init")
+
+    storage_path = _ensure_dir(storage_dir)
+    out_dir = _ensure_dir(storage_path / job_id)
+    storage_janitor.track_job_dir(out_dir)
+
+    # rendition tidak punya job RQ sendiri -> progress di job:{id}:state
+    reporters = {r["id"]: state_progress_reporter(r["id"], timed=False) for r in renditions}
+    results = []
+    pending = []
+
+    # ===== reuse artifact =====
+    for r in renditions:
+        r["key"] = canonical_job_key(url, r["type"], r.get("quality"), r.get("bitrate"))
+        artifact = artifact_store.lookup(r["key"]) if r["key"] else None
+        if artifact:
+            output_file = artifact_store.link_into(artifact, out_dir)
+            results.append(_finish_rendition(r, output_file, {"path": "reuse", "reason": "artifact reuse"}, reporters[r["id"]]))
+        else:
+            pending.append(r)
+
+    if pending:
+        for r in pending:
+            if r["key"]:
+                artifact_store.mark_pending(r["key"])
+
+        try:
+            outputs = _build_renditions(url, out_dir, pending, progress, reporters)
+        except Exception as e:
+            stop_if_permanent(e)
+            job = get_current_job()
+            retrying = job is not None and will_retry(job)
+            for r in pending:
+                if r["key"]:
+                    artifact_store.clear_pending(r["key"])
+                if retrying:
+                    reporters[r["id"]].update(reporters[r["id"]].pct, "retrying")
+                    continue
+                mark_failed(r["id"], str(e))
+                publish_job_event(get_redis(), r["id"], {"progress": 100, "stage": "failed"})
+            progress.update(progress.pct if retrying else 100, "retrying" if retrying else "failed")
+            if not retrying:
+                storage_janitor.job_done(out_dir)
+            raise
+
+        for r, output_file, plan in outputs:
+            if r["key"]:
+                artifact_store.publish(r["key"], output_file, storage_path)
+            results.append(_finish_rendition(r, output_file, plan, reporters[r["id"]]))
+
+    progress.update(100, "done")
+    storage_janitor.job_done(out_dir, [out_dir / r["file_name"] for r in results], [r["id"] for r in renditions])
+    return {"job_id": job_id, "status": "finished", "renditions": results}
+
+
+def _finish_rendition(r: dict, output_file: Path, plan: dict, reporter: ProgressReporter) -> dict:
+    # index file + status final dalam satu tulis, supaya /download langsung bisa dipakai
+    # dan status rendition pasti "finished" (reporter hanya publish event "done")
+    set_state(r["id"], {
+        "path": str(output_file.resolve()),
+        "filename": output_file.name,
+        **plan_state(plan),
+        "artifact": r["key"] or "",
+        "status": "finished",
+        "progress": 100,
+        "stage": "done",
+    })
+    reporter.update(100, "done")
+    return {
+        "job_id": r["id"],
+        "type": r["type"],
+        "file_name": output_file.name,
+        "download_url": f"/api/youtube/download/{r['id']}",
+        "transcode_path": plan.get("path"),
+    }
+
+
+def _report(reporters: Dict[str, ProgressReporter], ids: List[str], pct: int, stage: str):
+    for rid in ids:
+        reporters[rid].update(pct, stage)
+
+
+def _output_name(title: str, r: dict) -> str:
+    if r["type"] == "mp4":
+        return f"{title} [{r.get('quality') or 'best'}].mp4"
+    return f"{title} [{r.get('bitrate') or 192}k].mp3"
+
+
+def _build_renditions(
+    url: str,
+    out_dir: Path,
+    renditions: List[dict],
+    progress: ProgressReporter,
+    reporters: Dict[str, ProgressReporter],
+) -> List[tuple]:
+    ffmpeg_path = _which_ffmpeg()
+    ids = [r["id"] for r in renditions]
+
+    # ===== extract sekali + plan per rendition =====
+    with YoutubeDL({"quiet": True, "no_warnings": True, "noplaylist": True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+        info_path = out_dir / ".info.json"
+        info_path.write_text(json.dumps(ydl.sanitize_info(info)), encoding="utf-8")
+
+    formats = info.get("formats") or []
+    by_id = {f.get("format_id"): f for f in formats}
+    plans = [plan_transcode(formats, r["type"], r.get("quality"), r.get("bitrate")) for r in renditions]
+
+    if not all(plan_sources(plan, formats) for plan in plans):
+        raise RuntimeError("Format list tidak tersedia untuk video ini.")
+
+    # mp3 yang harus encode: pakai track audio yang sudah didownload untuk mp4 kalau ada
+    shared_audio = [
+        fid for plan in plans for fid in plan["format"].split("+")
+        if (by_id[fid].get("vcodec") or "none") == "none"
+    ]
+    for r, plan in zip(renditions, plans):
+        if r["type"] == "mp3" and plan["path"] != PATH_COPY and shared_audio:
+            best = max(shared_audio, key=lambda fid: by_id[fid].get("abr") or by_id[fid].get("tbr") or 0)
+            plan["format"] = best
+            plan["acodec"] = by_id[best].get("acodec")
+
+    source_ids: List[str] = []
+    for plan in plans:
+        for fid in plan["format"].split("+"):
+            if fid not in source_ids:
+                source_ids.append(fid)
+
+    # ===== download semua stream sumber, masing-masing sekali =====
+    progress.update(5, "downloading")
+    _report(reporters, ids, 5, "downloading")
+
+    def on_pct(pct: float):
+        mapped = 5 + int(pct * 0.55)
+        progress.update(mapped, "downloading")
+        _report(reporters, ids, mapped, "downloading")
+
+    try:
+        sources = download_sources(info_path, out_dir, source_ids, on_pct)
+    finally:
+        info_path.unlink(missing_ok=True)
+
+    # ===== satu ffmpeg, banyak output =====
+    title = _safe_name((info.get("title") or "output")[:80])
+    index = {fid: i for i, fid in enumerate(source_ids)}
+
+    ffmpeg_cmd = [ffmpeg_path, "-y", "-loglevel", "error", "-nostats", "-progress", "pipe:1"]
+    for fid in source_ids:
+        ffmpeg_cmd += ["-i", str(sources[fid])]
+
+    outputs = []
+    for r, plan in zip(renditions, plans):
+        out_path = out_dir / _output_name(title, r)
+        ffmpeg_cmd += ffmpeg_output_args(r["type"], plan, index, r.get("bitrate"), out_path)
+        outputs.append((r, out_path, plan))
+
+    progress.update(60, "postprocess")
+    _report(reporters, ids, 60, "postprocess")
+
+    duration_us = (info.get("duration") or 0) * 1_000_000
+    cpu_before = child_cpu_seconds()
+    with cpu_slot(any(plan["path"] != PATH_COPY for _, _, plan in outputs)):
+        proc = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8", errors="ignore")
+        try:
+            for line in proc.stdout:
+                # -progress: "out_time_us=12345678"
+                if duration_us and line.startswith("out_time_us="):
+                    try:
+                        done_us = int(line.split("=", 1)[1])
+                    except ValueError:
+                        continue
+                    mapped = 60 + int(min(done_us / duration_us, 1) * 35)
+                    progress.update(mapped, "postprocess")
+                    _report(reporters, ids, mapped, "postprocess")
+
+            err = proc.stderr.read()
+            returncode = proc.wait()
+        finally:
+            _kill_and_wait(proc)
+    TRANSCODE_CPU_SECONDS_TOTAL.inc(child_cpu_seconds() - cpu_before, path="rendition")
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg gagal: {err.strip()[-300:]}")
+
+    for path in sources.values():
+        path.unlink(missing_ok=True)
+
+    progress.update(95, "finalizing")
+    return outputs
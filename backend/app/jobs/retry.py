@@ -0,0 +1,112 @@
+import re
+from pathlib import Path
+from typing import Iterable, List
+
+from rq import get_current_job
+
+from app.core.config import settings
+from app.queue.job_state import get_state, set_state
+
+# Retry download dua lapis:
+#   - di dalam yt-dlp: --retries / --fragment-retries (backoff eksponensial per request)
+#   - di RQ: job diulang dengan backoff eksponensial + jitter (rq_queue.retry_policy)
+# Folder job (storage/<job_id>) sama di tiap attempt, jadi .part & fragment dari
+# attempt sebelumnya dilanjutkan yt-dlp (--continue), bukan download dari nol.
+# Checkpoint tiap attempt (attempt, partial_bytes, pct, error) ada di state job.
+# Error permanen (video private/dihapus, URL tidak didukung) tidak di-retry.
+
+
+class DownloadError(RuntimeError):
+    """yt-dlp gagal download."""
+
+
+class TransientDownloadError(DownloadError):
+    """Gagal sementara (jaringan, 5xx, timeout, throttling): di-retry."""
+
+
+class PermanentDownloadError(DownloadError):
+    """Gagal permanen: diulang pun hasilnya sama, retry dihentikan."""
+
+
+# pesan error yt-dlp yang tidak akan berhasil walau diulang
+_PERMANENT_PATTERNS = re.compile(
+    r"video unavailable|private video|has been removed|account .* terminated|"
+    r"sign in to confirm your age|members-only|join this channel|copyright|"
+    r"unsupported url|not made this video available in your country|"
+    r"http error 404|http error 410|requested format is not available",
+    re.IGNORECASE,
+)
+
+
+def ytdlp_retry_args() -> List[str]:
+    """
+    Argumen yt-dlp: retry per request/fragment dengan backoff eksponensial,
+    lanjutkan .part yang sudah ada.
+    """
+    n = str(settings.YTDLP_RETRIES)
+    return [
+        "--continue",
+        "--retries", n,
+        "--fragment-retries", n,
+        "--retry-sleep", "http:exp=1:30",
+        "--retry-sleep", "fragment:exp=1:30",
+        "--socket-timeout", str(settings.YTDLP_SOCKET_TIMEOUT_SECONDS),
+    ]
+
+
+def is_permanent(e: BaseException) -> bool:
+    if isinstance(e, PermanentDownloadError):
+        return True
+    if isinstance(e, TransientDownloadError):
+        return False
+    # error dari yt_dlp API (extract) cukup dicek pesannya
+    return bool(_PERMANENT_PATTERNS.search(str(e)))
+
+
+def stop_if_permanent(e: BaseException):
+    """
+    Error permanen: sisa retry job yang sedang jalan di-nol-kan.
+    Worker memegang objek job yang sama dengan get_current_job().
+    """
+    job = get_current_job()
+    if job and is_permanent(e):
+        job.retries_left = 0
+
+
+def download_error(lines: Iterable[str], message: str) -> DownloadError:
+    """
+    Klasifikasi kegagalan yt-dlp dari output-nya (baris "ERROR:").
+    """
+    errors = [line.strip() for line in lines if "ERROR" in line]
+    text = f"{message} {errors[-1]}" if errors else message
+
+    if any(_PERMANENT_PATTERNS.search(line) for line in errors):
+        e = PermanentDownloadError(text)
+    else:
+        e = TransientDownloadError(text)
+    stop_if_permanent(e)
+    return e
+
+
+def partial_bytes(out_dir: Path) -> int:
+    # .part (download biasa) dan .part-FragN (download per fragment)
+    return sum(p.stat().st_size for p in out_dir.glob("*.part*") if p.is_file())
+
+
+def checkpoint(job_id: str, out_dir: Path, **fields):
+    """
+    Checkpoint download di state job (app.queue.job_state): attempt, byte .part
+    yang bisa dilanjutkan, progress terakhir (pct), error terakhir. Satu tulis
+    HSET + EXPIRE, tidak lewat job.meta (pickle ulang seluruh meta tiap save).
+    """
+    set_state(job_id, {**fields, "partial_bytes": partial_bytes(out_dir)})
+
+
+def start_attempt(job_id: str, out_dir: Path) -> int:
+    """
+    Awal attempt download: catat attempt ke berapa, return nomor attempt.
+    """
+    previous = get_state(job_id, ("attempt",)) or {}
+    attempt = int(previous.get("attempt") or 0) + 1
+    checkpoint(job_id, out_dir, attempt=attempt)
+    return attempt
@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+
+# slot CPU, dibuat supervisor sebelum fork -> dibagi semua proses slot.
+# Tiap slot menyimpan PID pemegangnya (0 = kosong). Proses job yang mati di tengah
+# encode (mode fork: horse di-SIGKILL RQ saat timeout / stop) tidak sempat melepas
+# slotnya; slot dengan PID yang sudah tidak ada diambil alih acquire berikutnya.
+_holders = None
+_lock = None
+
+# jeda cek ulang selama semua slot terpakai (detik)
+_POLL_SECONDS = 0.2
+
+
+def init_cpu_slots(n: int):
+    global _holders, _lock
+    ctx = multiprocessing.get_context("fork")
+    _lock = ctx.Lock()
+    _holders = ctx.RawArray("i", n)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _acquire() -> int:
+    pid = os.getpid()
+    while True:
+        with _lock:
+            for index, holder in enumerate(_holders):
+                if holder == 0 or not _alive(holder):
+                    _holders[index] = pid
+                    return index
+        time.sleep(_POLL_SECONDS)
+
+
+@contextmanager
+def cpu_slot(needed: bool = True):
+    """
+    Batasi encode ffmpeg yang jalan bersamaan di satu host. needed=False (remux
+    -c copy, murah) lewat tanpa menunggu slot.
+    Di luar supervisor (mis. `rq worker` biasa) tidak membatasi apa-apa.
+    """
+    if _holders is None or not needed:
+        yield
+        return
+
+    index = _acquire()
+    try:
+        yield
+    finally:
+        with _lock:
+            _holders[index] = 0
@@ -0,0 +1,178 @@
+import gc
+import importlib
+import logging
+import multiprocessing
+import os
+import signal
+import statistics
+import time
+
+from redis import Redis
+from rq import Queue
+from rq.worker import SimpleWorker, Worker
+
+from app.core.config import settings
+from app.jobs.slots import init_cpu_slots
+
+# Supervisor worker: satu-satunya entry point worker. Jalankan dari folder backend
+# (cwd yang sama dengan API: .env dan STORAGE_DIR relatif ke sini):
+#
+#   python -m app.jobs.supervisor
+#
+# atau lewat worker/worker.py.
+
+# urutan = prioritas (lihat WORKER_QUEUES)
+listen = [q.strip() for q in settings.WORKER_QUEUES.split(",") if q.strip()]
+
+logger = logging.getLogger("worker.supervisor")
+
+
+def preload() -> dict:
+    """
+    Import modul job, yt-dlp dan semua class extractor-nya di supervisor, sebelum
+    slot di-fork: slot dan proses anak per job (WORKER_MODE=fork) mewarisi state
+    hangat ini lewat copy-on-write, tidak ada yang import ulang.
+    """
+    start = time.perf_counter()
+    for module in ("app.jobs.youtube_job", "app.jobs.pipeline", "app.jobs.rendition_job", "app.jobs.batch_job"):
+        importlib.import_module(module)
+    from yt_dlp import YoutubeDL
+    from yt_dlp.extractor import gen_extractor_classes
+
+    extractors = len(gen_extractor_classes())
+    # init YoutubeDL sekali: ikut load postprocessor & handler network
+    YoutubeDL({"quiet": True, "no_warnings": True}).close()
+    elapsed = time.perf_counter() - start
+
+    # objek hasil import tidak disentuh GC lagi -> halaman memori tetap dibagi antar fork
+    gc.freeze()
+    return {"seconds": elapsed, "extractors": extractors}
+
+
+def fork_overhead(samples: int = 5) -> float:
+    """
+    Median waktu fork + exit + reap satu proses anak dari state sekarang (detik):
+    perkiraan overhead per job di WORKER_MODE=fork.
+    """
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0)
+        os.waitpid(pid, 0)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run_slot(index: int):
+    """
+    Satu slot = satu proses RQ worker. WORKER_MODE=fork: tiap job di proses anak
+    (Worker), crash/leak job tidak membawa slot; simple: job in-process (SimpleWorker).
+    SIGTERM dari supervisor -> RQ warm shutdown: job yang sedang jalan diselesaikan dulu.
+    """
+    # group proses sendiri: Ctrl+C di terminal hanya sampai ke supervisor,
+    # slot dihentikan supervisor lewat satu SIGTERM (warm shutdown)
+    os.setpgrp()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    conn = Redis.from_url(settings.REDIS_URL)
+    worker_class = Worker if settings.WORKER_MODE == "fork" else SimpleWorker
+    worker = worker_class(
+        [Queue(name, connection=conn) for name in listen],
+        connection=conn,
+        name=f"{os.uname().nodename}.{os.getpid()}.slot{index}",
+    )
+    # scheduler: job yang di-retry dengan interval (backoff) masuk antrian lagi.
+    # Satu scheduler aktif per queue (lock Redis), slot lain otomatis standby.
+    worker.work(with_scheduler=True)
+
+
+class Supervisor:
+    """
+    Jalankan WORKER_DOWNLOAD_SLOTS proses slot, restart yang crash,
+    shutdown dengan drain job yang sedang jalan.
+    Encode ffmpeg dibatasi terpisah lewat WORKER_CPU_SLOTS (app.jobs.slots.cpu_slot).
+    """
+
+    def __init__(self, slots: int, cpu_slots: int):
+        self.slots = slots
+        self.cpu_slots = cpu_slots
+        self._ctx = multiprocessing.get_context("fork")
+        self._procs = {}
+        self._stopping = False
+
+    def _spawn(self, index: int):
+        proc = self._ctx.Process(target=run_slot, args=(index,), name=f"slot{index}", daemon=False)
+        proc.start()
+        self._procs[index] = proc
+        logger.info("slot %s started (pid %s)", index, proc.pid)
+
+    def _request_stop(self, signum, frame):
+        if self._stopping:
+            # sinyal kedua: berhenti paksa
+            logger.warning("forced shutdown")
+            for proc in self._procs.values():
+                if proc.is_alive():
+                    proc.kill()
+            return
+        self._stopping = True
+
+    def _report_startup(self, started: float):
+        if settings.WORKER_PRELOAD:
+            warm = preload()
+            logger.info("preloaded jobs + yt-dlp (%s extractors) in %.0f ms", warm["extractors"], warm["seconds"] * 1000)
+        else:
+            logger.info("preload disabled, each slot imports yt-dlp on its first job")
+
+        if settings.WORKER_MODE == "fork":
+            logger.info("mode fork: per-job fork overhead %.2f ms (median)", fork_overhead() * 1000)
+        else:
+            logger.info("mode simple: jobs run in-process, no per-job fork")
+        logger.info("supervisor ready in %.0f ms", (time.perf_counter() - started) * 1000)
+
+    def run(self):
+        started = time.perf_counter()
+        init_cpu_slots(self.cpu_slots)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        self._report_startup(started)
+
+        logger.info("starting %s job slots (%s cpu slots, mode %s) on %s", self.slots, self.cpu_slots, settings.WORKER_MODE, ",".join(listen))
+        for index in range(self.slots):
+            self._spawn(index)
+
+        while not self._stopping:
+            for index, proc in list(self._procs.items()):
+                if not proc.is_alive() and not self._stopping:
+                    logger.warning("slot %s exited with %s, restarting", index, proc.exitcode)
+                    time.sleep(settings.WORKER_RESTART_BACKOFF_SECONDS)
+                    self._spawn(index)
+            time.sleep(1)
+
+        self._drain()
+
+    def _drain(self):
+        logger.info("draining %s slots", len(self._procs))
+        for proc in self._procs.values():
+            if proc.is_alive():
+                os.kill(proc.pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + settings.WORKER_DRAIN_TIMEOUT_SECONDS
+        for proc in self._procs.values():
+            proc.join(max(0.0, deadline - time.monotonic()))
+
+        for index, proc in self._procs.items():
+            if proc.is_alive():
+                logger.warning("slot %s did not drain in time, killing", index)
+                proc.kill()
+                proc.join()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    Supervisor(settings.WORKER_DOWNLOAD_SLOTS, settings.WORKER_CPU_SLOTS).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,25 @@
+import json
+import os
 import shutil
+import signal
 import subprocess
+from collections import deque
 from pathlib import Path
-from typing import Optional, Literal
+from typing import Optional, Literal, Tuple
 
 from rq import get_current_job
+from yt_dlp import YoutubeDL
+
+from app.core.config import settings
+from app.jobs.bandwidth import BandwidthGovernor, ytdlp_speed_args
+from app.jobs.progress import ProgressReporter, job_progress_reporter
+from app.jobs.retry import checkpoint, download_error, start_attempt, stop_if_permanent, ytdlp_retry_args
+from app.jobs.slots import cpu_slot
+from app.queue.job_meta import finish_job_stream, set_job_stream, will_retry
+from app.queue.job_state import set_state
+from app.queue.dedup import canonical_job_key
+from app.services import artifact_store, storage_janitor
+from app.services.transcode_planner import PATH_COPY, parse_height, plan_state, plan_transcode
 
 
 def _ensure_dir(path: str | Path) -> Path:
@@ -30,19 +46,6 @@ def _which_ffmpeg() -> str:
     raise RuntimeError("FFmpeg tidak ditemukan. Install ffmpeg dan pastikan ada di PATH.")
 
 
-def _progress(pct: int, stage: str = "processing"):
-    """
-    Simpan progress ke Redis (job.meta)
-    """
-    job = get_current_job()
-    if not job:
-        return
-
-    job.meta["progress"] = max(0, min(100, int(pct)))
-    job.meta["stage"] = stage
-    job.save_meta()
-
-
 def download_job(
     url: str,
     job_id: str,
@@ -50,10 +53,20 @@ def download_job(
     quality: Optional[str] = None,
     bitrate: Optional[int] = None,
     storage_dir: str = "storage",
+    stream: bool = False,
 ):
     """
     Download YouTube video/audio using yt-dlp.
-    Progress saved to job.meta.
+    Progress ditulis ke state job (app.queue.job_state, throttled lihat ProgressReporter).
+
+    stream=True: yt-dlp -> ffmpeg lewat pipe ke file yang terus bertambah,
+    API bisa mulai kirim byte ke client sebelum job selesai (/api/youtube/stream/{job_id}).
+
+    PIPELINE_ENABLED (non-stream): job ini hanya extract + plan, download/transcode/finalize
+    lanjut sebagai job terpisah (app.jobs.pipeline) dan return {"status": "pipelined", ...}.
+
+    Gagal sementara -> di-retry RQ (backoff + jitter), download lanjut dari .part
+    di folder job. Gagal permanen (video private/dihapus) tidak di-retry (app.jobs.retry).
 
     Returns dict:
         {
@@ -67,112 +80,375 @@ def download_job(
     """
 
     # ===== setup =====
-    _progress(1, "init")
-    ffmpeg_path = _which_ffmpeg()
+    progress = job_progress_reporter()
+    progress.update(1, "init")
 
     storage_path = _ensure_dir(storage_dir)
     out_dir = _ensure_dir(storage_path / job_id)
+    storage_janitor.track_job_dir(out_dir)
+
+    # ===== reuse artifact kalau sudah pernah dibuat =====
+    key = canonical_job_key(url, file_type, quality, bitrate)
+    if key:
+        artifact = artifact_store.lookup(key)
+        if artifact:
+            output_file = artifact_store.link_into(artifact, out_dir)
+            return _finish(job_id, file_type, out_dir, output_file, progress, {"path": "reuse"}, key)
+
+        artifact_store.mark_pending(key)
+
+    try:
+        if stream:
+            output_file, plan = _run_stream(job_id, url, out_dir, file_type, quality, bitrate, progress)
+        else:
+            progress.update(2, "extracting")
+            prepared = _prepare(url, out_dir, file_type, quality, bitrate)
+
+            if settings.PIPELINE_ENABLED:
+                # download/transcode/finalize lanjut di queue masing-masing
+                from app.jobs.pipeline import start_pipeline
+
+                _record_plan(prepared[1])
+                started = start_pipeline(job_id, out_dir, *prepared, file_type, bitrate, storage_dir, key)
+                if started:
+                    progress.update(5, "queued")
+                    return started
+
+            output_file, plan = _run_download(job_id, url, out_dir, file_type, quality, bitrate, progress, prepared)
+    except Exception as e:
+        if key:
+            artifact_store.clear_pending(key)
+        stop_if_permanent(e)
+        job = get_current_job()
+        if job and will_retry(job):
+            progress.update(progress.pct, "retrying")
+        else:
+            progress.update(100, "failed")
+            storage_janitor.job_done(out_dir)
+        raise
+
+    if key:
+        artifact_store.publish(key, output_file, storage_path)
+
+    return _finish(job_id, file_type, out_dir, output_file, progress, plan, key)
+
+
+def _finish(
+    job_id: str,
+    file_type: str,
+    out_dir: Path,
+    output_file: Path,
+    progress: ProgressReporter,
+    plan: dict,
+    artifact: Optional[str] = None,
+) -> dict:
+    # index file dulu sebelum "done", supaya /download langsung bisa dipakai
+    set_state(job_id, {
+        "path": str(output_file.resolve()),
+        "filename": output_file.name,
+        **plan_state(plan),
+        "artifact": artifact or "",
+    })
+    finish_job_stream(job_id, "complete")
+    progress.update(100, "done")
+    storage_janitor.job_done(out_dir, [output_file])
+
+    return {
+        "job_id": job_id,
+        "type": file_type,
+        "file_name": output_file.name,
+        "file_path": str(output_file),
+        "download_url": f"/api/youtube/download/{job_id}",
+        "transcode_path": plan.get("path"),
+        "status": "finished",
+    }
+
+
+def _prepare(url: str, out_dir: Path, file_type: str, quality: Optional[str], bitrate: Optional[int]) -> Tuple[Path, dict]:
+    """
+    Extract info sekali (tanpa download), pilih format sumber lewat planner,
+    simpan info ke .info.json untuk yt-dlp --load-info-json (tidak extract ulang).
+    """
+    with YoutubeDL({"quiet": True, "no_warnings": True, "noplaylist": True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+        info_path = out_dir / ".info.json"
+        info_path.write_text(json.dumps(ydl.sanitize_info(info)), encoding="utf-8")
+
+    plan = plan_transcode(info.get("formats") or [], file_type, quality, bitrate)
+    return info_path, plan
+
+
+def _record_plan(plan: dict):
+    # jalur yang dipakai job (copy/transcode), alasannya, dan tinggi video yang
+    # dikirim dicatat di state job (downgrade resolusi kelihatan di status)
+    job = get_current_job()
+    if job:
+        set_state(job.id, plan_state(plan))
+
+
+STREAM_MEDIA_TYPES = {"mp3": "audio/mpeg", "mp4": "video/mp4"}
+
+
+def _run_stream(
+    job_id: str,
+    url: str,
+    out_dir: Path,
+    file_type: str,
+    quality: Optional[str],
+    bitrate: Optional[int],
+    progress: ProgressReporter,
+) -> Tuple[Path, dict]:
+    """
+    Mode streaming: yt-dlp tulis ke stdout, ffmpeg baca dari pipe dan tulis
+    output ke out_dir/.stream.<ext> yang terus bertambah selama download.
+      - mp3: format audio dari planner, copy kalau sumber sudah mp3
+      - mp4: format progressive (video+audio 1 file), remux ke fragmented mp4
+    Selesai -> rename ke <title>.<ext> (fd yang sedang dibaca API tetap valid).
+    """
+    ffmpeg_path = _which_ffmpeg()
+
+    stream_path = out_dir / f".stream.{file_type}"
+    title_path = out_dir / ".title"
+
+    info_path, plan = _prepare(url, out_dir, file_type, quality, bitrate)
+
+    if file_type == "mp4":
+        height = parse_height(quality)
+        if height:
+            fmt = f"best[ext=mp4][vcodec!=none][acodec!=none][height<={height}]/best[vcodec!=none][acodec!=none][height<={height}]"
+        else:
+            fmt = "best[ext=mp4][vcodec!=none][acodec!=none]/best[vcodec!=none][acodec!=none]"
+        encode = ["-c", "copy", "-movflags", "frag_keyframe+empty_moov", "-f", "mp4"]
+        plan = {"path": PATH_COPY, "format": fmt, "reason": "progressive remux (stream mode)"}
+    elif plan["path"] == PATH_COPY:
+        fmt = plan["format"]
+        encode = ["-vn", "-c:a", "copy", "-f", "mp3"]
+    else:
+        fmt = plan["format"]
+        encode = ["-vn", "-b:a", f"{bitrate or 192}k", "-f", "mp3"]
+
+    _record_plan(plan)
+
+    ytdlp_cmd = [
+        "yt-dlp",
+        "--load-info-json", str(info_path),
+        "-f", fmt,
+        "-o", "-",
+        "--print-to-file", "%(title).80s", str(title_path),
+        "--newline",
+        *ytdlp_retry_args(),
+        *ytdlp_speed_args(),
+    ]
+    ffmpeg_cmd = [ffmpeg_path, "-y", "-loglevel", "error", "-i", "pipe:0", *encode, str(stream_path)]
+
+    # file dibuat dulu supaya API bisa langsung buka (ffmpeg -y truncate inode yang sama)
+    stream_path.touch()
+    set_job_stream(job_id, str(stream_path.resolve()), STREAM_MEDIA_TYPES[file_type], settings.JOB_TTL_SECONDS)
+    progress.update(5, "downloading")
+
+    errors = deque(maxlen=20)
+    failed = True
+    with cpu_slot(plan["path"] != PATH_COPY):
+        ytdlp = subprocess.Popen(ytdlp_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+        ffmpeg = None
+        try:
+            ffmpeg = subprocess.Popen(ffmpeg_cmd, stdin=ytdlp.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            ytdlp.stdout.close()  # ffmpeg pegang satu-satunya ujung baca
+
+            # dengan -o -, progress yt-dlp keluar di stderr
+            with BandwidthGovernor(job_id) as governor:
+                governor.attach(ytdlp)
+                for raw in ytdlp.stderr:
+                    line = raw.decode("utf-8", errors="ignore").strip()
+                    errors.append(line)
+                    governor.feed(line)
+                    pct = _parse_download_pct(line)
+                    if pct is not None:
+                        progress.update(5 + int((pct / 100) * 85), "downloading")
+
+                failed = ytdlp.wait() != 0 or ffmpeg.wait() != 0
+        finally:
+            if failed:
+                # gagal / exception di tengah loop: jangan tinggalkan pipe yang masih jalan,
+                # API yang sedang tail stream ini memutus respons-nya
+                _kill_and_wait(ytdlp, ffmpeg)
+                finish_job_stream(job_id, "failed")
+            info_path.unlink(missing_ok=True)
+
+    if failed:
+        # output pipe tidak bisa dilanjutkan, retry mulai dari awal
+        raise download_error(errors, "yt-dlp/ffmpeg gagal saat streaming.")
+
+    progress.update(95, "finalizing")
+
+    try:
+        title = title_path.read_text(encoding="utf-8").strip() or "output"
+        title_path.unlink()
+    except OSError:
+        title = "output"
+
+    output_file = out_dir / f"{_safe_name(title)}.{file_type}"
+    stream_path.replace(output_file)
+    return output_file, plan
+
+
+def _kill_and_wait(*procs: Optional[subprocess.Popen]):
+    """
+    Hentikan & reap proses anak yang masih jalan (tidak jadi zombie/yatim).
+    Proses dengan session sendiri (yt-dlp) dibunuh satu group dengan anak-anaknya.
+    """
+    for proc in procs:
+        if proc is not None and proc.poll() is None:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except (AttributeError, ProcessLookupError):
+                # Windows / bukan leader process group sendiri
+                proc.kill()
+    for proc in procs:
+        if proc is not None:
+            proc.wait()
+
+
+def _safe_name(name: str) -> str:
+    return "".join(c for c in name if c not in '\\/:*?"<>|').strip() or "output"
+
+
+def _parse_download_pct(line: str) -> Optional[float]:
+    # contoh: [download]  12.3% of ...
+    if "[download]" not in line or "%" not in line:
+        return None
+    try:
+        left = line.split("%")[0]
+        return float(left.split()[-1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _run_download(
+    job_id: str,
+    url: str,
+    out_dir: Path,
+    file_type: str,
+    quality: Optional[str],
+    bitrate: Optional[int],
+    progress: ProgressReporter,
+    prepared: Optional[Tuple[Path, dict]] = None,
+) -> Tuple[Path, dict]:
+    """
+    Jalankan yt-dlp (+ ffmpeg) ke out_dir, return (file output, plan).
+    Format sumber dipilih planner: remux (-c copy) kalau codec sudah cocok
+    dengan container, encode ulang hanya kalau perlu. mp3 (MP3_PIPELINE): yt-dlp
+    langsung di-pipe ke ffmpeg, lihat app.jobs.pipeline.pipe_audio.
+    """
+    ffmpeg_path = _which_ffmpeg()
 
     # output template: yt-dlp replace %(ext)s
     outtmpl = str(out_dir / "%(title).80s.%(ext)s")
 
+    info_path, plan = prepared or _prepare(url, out_dir, file_type, quality, bitrate)
+    _record_plan(plan)
+
     # ===== yt-dlp command =====
-    _progress(5, "downloading")
+    # attempt ke-2 dst: .part dari attempt sebelumnya dilanjutkan (--continue)
+    attempt = start_attempt(job_id, out_dir)
+    progress.update(5, "resuming" if attempt > 1 else "downloading")
+
+    if file_type == "mp3" and settings.MP3_PIPELINE:
+        # yt-dlp -> pipe -> ffmpeg: tanpa file sumber di disk, path output pasti
+        from app.jobs.pipeline import pipe_audio
+
+        title = json.loads(info_path.read_text(encoding="utf-8")).get("title") or "output"
+        output_file = out_dir / f"{_safe_name(title[:80])}.mp3"
+        try:
+            pipe_audio(
+                info_path, out_dir, plan, bitrate, output_file,
+                lambda pct: progress.update(5 + int(pct * 0.9), "downloading"),
+            )
+        except Exception as e:
+            checkpoint(job_id, out_dir, pct=progress.pct, error=str(e))
+            raise
+        finally:
+            info_path.unlink(missing_ok=True)
+        progress.update(95, "finalizing")
+        return output_file, plan
+
+    cmd = [
+        "yt-dlp",
+        "--load-info-json", str(info_path),
+        "-f", plan["format"],
+        "-o", outtmpl,
+        "--ffmpeg-location", ffmpeg_path,
+        *ytdlp_retry_args(),
+        *ytdlp_speed_args(),
+    ]
 
     if file_type == "mp4":
-        height = None
-        if quality and quality.endswith("p"):
-            try:
-                height = int(quality.replace("p", ""))
-            except:
-                height = None
-
-        if height:
-            fmt = f"bestvideo[height<={height}]+bestaudio/best[height<={height}]/best"
+        if plan["path"] == PATH_COPY:
+            # h264 + aac: merge ke mp4 cukup stream copy
+            cmd += ["--merge-output-format", "mp4"]
         else:
-            fmt = "bestvideo+bestaudio/best"
-
-        cmd = [
-            "yt-dlp",
-            url,
-            "-f", fmt,
-            "--merge-output-format", "mp4",
-            "-o", outtmpl,
-            "--ffmpeg-location", ffmpeg_path,
-            "--no-playlist",
-        ]
+            cmd += ["--merge-output-format", "mkv", "--recode-video", "mp4"]
 
     else:  # mp3
         if bitrate is None:
             bitrate = 192
 
-        cmd = [
-            "yt-dlp",
-            url,
+        # sumber mp3: yt-dlp ExtractAudio otomatis copy, tidak encode ulang
+        cmd += [
             "-x",
             "--audio-format", "mp3",
             "--audio-quality", str(bitrate),
-            "-o", outtmpl,
-            "--ffmpeg-location", ffmpeg_path,
-            "--no-playlist",
         ]
 
     # ===== run =====
-    proc = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        encoding="utf-8",
-        errors="ignore",
-    )
-
-    # parsing progress dari output yt-dlp
-    for line in proc.stdout:
-        line = line.strip()
-
-        # contoh: [download]  12.3% of ...
-        if "[download]" in line and "%" in line:
-            try:
-                left = line.split("%")[0]
-                pct_str = left.split()[-1]
-                pct = float(pct_str)
-
-                # map download pct (0-100) -> progress 5-85
-                mapped = 5 + int((pct / 100) * 80)
-                _progress(mapped, "downloading")
-            except:
-                pass
-
-        if "Destination:" in line:
-            _progress(86, "postprocess")
-
-        if "Merging formats" in line or "ExtractAudio" in line:
-            _progress(90, "postprocess")
-
-    ret = proc.wait()
+    # --recode-video / encode audio dijalankan yt-dlp di dalam proses ini
+    with cpu_slot(plan["path"] != PATH_COPY):
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+            start_new_session=True,
+        )
+
+        # parsing progress dari output yt-dlp
+        tail = deque(maxlen=20)
+        try:
+            with BandwidthGovernor(out_dir.name) as governor:
+                governor.attach(proc)
+                for line in proc.stdout:
+                    line = line.strip()
+                    tail.append(line)
+                    governor.feed(line)
+
+                    pct = _parse_download_pct(line)
+                    if pct is not None:
+                        # map download pct (0-100) -> progress 5-85
+                        progress.update(5 + int((pct / 100) * 80), "downloading")
+
+                    if "Destination:" in line:
+                        progress.update(86, "postprocess")
+
+                    if "Merging formats" in line or "ExtractAudio" in line or "VideoConvertor" in line:
+                        progress.update(90, "postprocess")
+
+                ret = proc.wait()
+        finally:
+            _kill_and_wait(proc)
+    info_path.unlink(missing_ok=True)
     if ret != 0:
-        _progress(100, "failed")
-        raise RuntimeError("yt-dlp gagal. Pastikan URL valid, yt-dlp & ffmpeg tersedia.")
+        e = download_error(tail, "yt-dlp gagal. Pastikan URL valid, yt-dlp & ffmpeg tersedia.")
+        checkpoint(job_id, out_dir, pct=progress.pct, error=str(e))
+        raise e
 
-    _progress(95, "finalizing")
+    progress.update(95, "finalizing")
 
     # ===== cari file output =====
     files = list(out_dir.glob("*"))
     if not files:
-        _progress(100, "failed")
         raise RuntimeError("Output file tidak ditemukan setelah download selesai.")
 
     files.sort(key=lambda p: p.stat().st_size, reverse=True)
-    output_file = files[0]
-
-    _progress(100, "done")
-
-    return {
-        "job_id": job_id,
-        "type": file_type,
-        "file_name": output_file.name,
-        "file_path": str(output_file),
-        "download_url": f"/api/youtube/download/{job_id}",
-        "status": "finished",
-    }
+    return files[0], plan
@@ -1,12 +1,51 @@
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+
+# startup diukur dari sini: import FastAPI + seluruh route (yt-dlp tidak termasuk)
+_import_start = time.perf_counter()
+
 from fastapi import FastAPI
+from app.core.config import settings
 from app.core.cors import setup_cors
+from app.core.metrics import setup_metrics
 from app.api.router import api_router
 
-app = FastAPI()
+# log uvicorn supaya ikut tampil tanpa konfigurasi logging tambahan
+logger = logging.getLogger("uvicorn.error")
+
+
+def _preload_ytdlp():
+    from app.services.youtube_service import load_ytdlp
+
+    start = time.perf_counter()
+    load_ytdlp()
+    logger.info("yt-dlp preloaded in %.0f ms", (time.perf_counter() - start) * 1000)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(
+        "app startup: import %.0f ms, ready %.0f ms after import (yt-dlp %s)",
+        _import_ms, (time.perf_counter() - _import_start) * 1000,
+        "preloading in background" if settings.API_PRELOAD_YTDLP else "deferred to first extract",
+    )
+    if settings.API_PRELOAD_YTDLP:
+        # di luar jalur request: startup tetap cepat, /parse pertama tidak menunggu import
+        threading.Thread(target=_preload_ytdlp, name="ytdlp-preload", daemon=True).start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 setup_cors(app)
+setup_metrics(app)
 
 app.include_router(api_router, prefix="/api")
 
 @app.get("/ping")
 def ping():
     return {"ok": True}
+
+
+_import_ms = (time.perf_counter() - _import_start) * 1000
@@ -0,0 +1,150 @@
+import math
+import shutil
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from rq import Worker
+
+from app.core.config import settings
+from app.queue import fair
+from app.queue.redis_conn import get_redis
+from app.queue.rq_queue import get_queue
+from app.services.parse_cache import parse_cache
+from app.services.transcode_planner import parse_height
+from app.utils.validators import extract_video_id
+
+# Admission control sebelum job dibuat:
+#
+#   - client yang pending-nya sudah banyak (fair-share)  -> 429
+#   - antrian terlalu panjang / estimasi tunggu terlalu lama
+#       -> turun ke queue bulk kalau masih muat, selain itu 503
+#   - disk STORAGE_DIR tidak cukup untuk estimasi ukuran file  -> 503
+#
+# Estimasi tunggu = job di depan (pending fair-share + antrian RQ) / slot paralel
+# * rata-rata durasi job terakhir (fair.mean_duration), + setengah durasi kalau
+# semua slot sedang terpakai. Slot paralel = min(worker yang listen, FAIR_MAX_ACTIVE).
+
+
+class AdmissionRejected(Exception):
+    """Job tidak diterima sekarang, client diminta coba lagi setelah retry_after detik."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _retry_after(seconds: float) -> int:
+    return int(min(settings.ADMISSION_RETRY_AFTER_MAX_SECONDS, max(1, math.ceil(seconds))))
+
+
+def queue_load(queue_name: str) -> Dict[str, Any]:
+    """
+    Beban queue: job di depan, slot paralel, estimasi tunggu job baru (detik).
+    """
+    r = get_redis()
+    q = get_queue(queue_name)
+    stats = fair.get_stats(queue_name)
+
+    ahead = stats["pending"] + q.count
+    workers = Worker.count(connection=r, queue=q)
+    slots = max(1, min(workers or 1, settings.FAIR_MAX_ACTIVE))
+    duration = fair.mean_duration(queue_name) or settings.ADMISSION_DEFAULT_JOB_SECONDS
+
+    wait = ahead / slots * duration
+    if stats["active"] >= slots:
+        wait += duration / 2
+    return {"queue": queue_name, "ahead": ahead, "slots": slots, "workers": workers, "wait": wait}
+
+
+def estimate_output_bytes(url: str, file_type: str, quality: Optional[str], bitrate: Optional[int]) -> int:
+    """
+    Estimasi byte di disk (sumber + output) dari hasil /parse yang sudah di-cache.
+    Tidak extract ulang: video yang belum pernah di-parse dapat 0 (tidak diketahui).
+    """
+    video_id = extract_video_id(url)
+    hit = parse_cache.lookup(video_id) if video_id else None
+    if not hit:
+        return 0
+    data = hit[0]
+    formats = data.get("formats") or {}
+    audios = [f for f in formats.get("audio") or [] if f.get("filesize")]
+
+    if file_type == "mp3":
+        out = int((data.get("duration") or 0) * (bitrate or 192) * 1000 / 8)
+        source = min((f["filesize"] for f in audios), default=0)
+        return source + out
+
+    height = parse_height(quality)
+
+    def fits(f):
+        h = parse_height(f.get("label"))
+        return height is None or h is None or h <= height
+
+    videos = [f for f in formats.get("mp4") or [] if f.get("filesize") and fits(f)]
+    if not videos:
+        return 0
+    video = videos[-1]  # list sudah urut dari resolusi terendah
+    size = video["filesize"]
+    if not video.get("hasAudio"):
+        size += max((f["filesize"] for f in audios), default=0)
+    # stream sumber + file hasil merge/remux
+    return size * 2
+
+
+def _check_disk(estimated_bytes: int):
+    path = Path(settings.STORAGE_DIR)
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    try:
+        free = shutil.disk_usage(path).free
+    except OSError:
+        return
+
+    needed = settings.ADMISSION_MIN_FREE_BYTES + estimated_bytes
+    if free < needed:
+        raise AdmissionRejected(503, "Storage is almost full, try again later", settings.ADMISSION_DISK_RETRY_AFTER_SECONDS)
+
+
+def admit(
+    queue_name: str,
+    client: str,
+    estimated_bytes: int = 0,
+    downgrade_to: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Putuskan job baru masuk queue mana. Raise AdmissionRejected kalau ditolak.
+
+    Return: {"queue", "downgraded", "estimatedWaitSeconds", "estimatedStartAt"}
+    """
+    if not settings.ADMISSION_ENABLED:
+        return {"queue": queue_name, "downgraded": False, "estimatedWaitSeconds": None, "estimatedStartAt": None}
+
+    if fair.client_pending(queue_name, client) >= settings.ADMISSION_CLIENT_MAX_PENDING:
+        # satu slot client ini lepas kira-kira tiap (durasi / slot per client)
+        duration = fair.mean_duration(queue_name) or settings.ADMISSION_DEFAULT_JOB_SECONDS
+        raise AdmissionRejected(429, "Too many pending jobs for this client", _retry_after(duration / max(1, settings.FAIR_CLIENT_MAX_ACTIVE)))
+
+    _check_disk(estimated_bytes)
+
+    load = queue_load(queue_name)
+    overloaded = load["ahead"] >= settings.ADMISSION_MAX_QUEUE_DEPTH or load["wait"] > settings.ADMISSION_MAX_WAIT_SECONDS
+    downgraded = False
+    if overloaded and downgrade_to:
+        bulk = queue_load(downgrade_to)
+        if bulk["ahead"] < settings.ADMISSION_BULK_MAX_QUEUE_DEPTH:
+            load, downgraded, overloaded = bulk, True, False
+
+    if overloaded:
+        raise AdmissionRejected(503, "Job queue is full, try again later", _retry_after(load["wait"]))
+
+    wait = int(math.ceil(load["wait"]))
+    start_at = datetime.now(timezone.utc) + timedelta(seconds=wait)
+    return {
+        "queue": load["queue"],
+        "downgraded": downgraded,
+        "estimatedWaitSeconds": wait,
+        "estimatedStartAt": start_at.isoformat(timespec="seconds"),
+    }
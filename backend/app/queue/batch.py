@@ -0,0 +1,216 @@
+import json
+import time
+from typing import Dict, List, Optional
+
+from rq import Callback
+
+from app.core.config import settings
+from app.queue.redis_conn import get_redis
+from app.queue import fair
+from app.queue.job_meta import is_pipelined, will_retry
+from app.queue.job_state import mark_failed
+from app.queue.rq_queue import retry_policy
+
+# Batch = banyak job download (playlist / list URL) dengan batas paralel per batch.
+#
+#   batch:{id}          hash   status, total, done, failed, expanded, client, type, quality, bitrate, concurrency
+#   batch:{id}:items    list   job id anak, urut sesuai playlist
+#   batch:{id}:pending  list   item yang belum di-enqueue ({"id", "url"} JSON)
+#   batch:{id}:active   int    slot yang sedang dipakai (job anak queued/started)
+#
+# Job anak baru di-enqueue kalau ada slot kosong; tiap anak selesai (callback RQ)
+# slot dilepas dan item pending berikutnya masuk antrian.
+
+
+def batch_key(batch_id: str) -> str:
+    return f"batch:{batch_id}"
+
+
+def batch_items_key(batch_id: str) -> str:
+    return f"batch:{batch_id}:items"
+
+
+def batch_pending_key(batch_id: str) -> str:
+    return f"batch:{batch_id}:pending"
+
+
+def batch_active_key(batch_id: str) -> str:
+    return f"batch:{batch_id}:active"
+
+
+def _keys(batch_id: str) -> List[str]:
+    return [batch_key(batch_id), batch_items_key(batch_id), batch_pending_key(batch_id), batch_active_key(batch_id)]
+
+
+def _touch(pipe, batch_id: str):
+    # TTL semua key batch diperpanjang tiap ada kemajuan: batch yang jalan lebih lama
+    # dari JOB_TTL_SECONDS tidak kehilangan hash-nya di tengah jalan
+    for key in _keys(batch_id):
+        pipe.expire(key, settings.JOB_TTL_SECONDS)
+
+
+def _decode(v):
+    return v.decode() if isinstance(v, bytes) else v
+
+
+def create_batch(batch_id: str, client: str, file_type: str, quality: Optional[str], bitrate: Optional[int], concurrency: int):
+    r = get_redis()
+    with r.pipeline() as pipe:
+        pipe.hset(batch_key(batch_id), mapping={
+            "status": "expanding",
+            "total": 0,
+            "done": 0,
+            "failed": 0,
+            "expanded": 0,
+            "client": client,
+            "type": file_type,
+            "quality": quality or "",
+            "bitrate": bitrate or "",
+            "concurrency": concurrency,
+            "created_at": time.time(),
+        })
+        pipe.expire(batch_key(batch_id), settings.JOB_TTL_SECONDS)
+        pipe.execute()
+
+
+def get_batch(batch_id: str) -> Optional[Dict[str, str]]:
+    data = get_redis().hgetall(batch_key(batch_id))
+    if not data:
+        return None
+    return {_decode(k): _decode(v) for k, v in data.items()}
+
+
+def get_batch_items(batch_id: str, start: int = 0, end: int = -1) -> List[str]:
+    return [_decode(v) for v in get_redis().lrange(batch_items_key(batch_id), start, end)]
+
+
+def add_batch_items(batch_id: str, items: List[Dict[str, str]]):
+    """
+    Tambah item hasil ekspansi (dipanggil bertahap, per chunk), lalu isi slot kosong.
+    """
+    if not items:
+        return
+
+    r = get_redis()
+    with r.pipeline() as pipe:
+        pipe.rpush(batch_items_key(batch_id), *[it["id"] for it in items])
+        pipe.rpush(batch_pending_key(batch_id), *[json.dumps(it) for it in items])
+        pipe.hincrby(batch_key(batch_id), "total", len(items))
+        _touch(pipe, batch_id)
+        pipe.execute()
+
+    fill_batch_slots(batch_id)
+
+
+def finish_expansion(batch_id: str, error: Optional[str] = None):
+    r = get_redis()
+    mapping = {"expanded": 1}
+    if error:
+        mapping["error"] = error
+    with r.pipeline() as pipe:
+        pipe.hset(batch_key(batch_id), mapping=mapping)
+        _touch(pipe, batch_id)
+        pipe.execute()
+    _maybe_complete(batch_id)
+
+
+def fill_batch_slots(batch_id: str):
+    """
+    Enqueue item pending selama slot masih ada.
+    Aman dipanggil paralel (expander + callback anak): slot diklaim dengan INCR.
+    """
+    r = get_redis()
+    meta = get_batch(batch_id)
+    if not meta:
+        return
+
+    limit = int(meta.get("concurrency") or 1)
+    active_key = batch_active_key(batch_id)
+
+    while True:
+        if r.incr(active_key) > limit:
+            r.decr(active_key)
+            return
+
+        raw = r.lpop(batch_pending_key(batch_id))
+        if raw is None:
+            r.decr(active_key)
+            return
+
+        item = json.loads(raw)
+        try:
+            _enqueue_item(batch_id, item, meta)
+        except Exception:
+            r.decr(active_key)
+            raise
+
+
+def _enqueue_item(batch_id: str, item: Dict[str, str], meta: Dict[str, str]):
+    # anak batch ikut fair-share client pemilik batch di antrian bulk
+    fair.submit(
+        settings.QUEUE_BULK,
+        meta.get("client") or "batch",
+        "app.jobs.youtube_job.download_job",
+        args=(
+            item["url"],
+            item["id"],
+            meta["type"],
+            meta.get("quality") or None,
+            int(meta["bitrate"]) if meta.get("bitrate") else None,
+            settings.STORAGE_DIR,
+        ),
+        job_id=item["id"],
+        meta={"batch_id": batch_id},
+        on_success=Callback(on_batch_item_success),
+        on_failure=Callback(on_batch_item_failure),
+        retry=retry_policy(),
+    )
+
+
+def _release_slot(batch_id: str, counter: str):
+    r = get_redis()
+    with r.pipeline() as pipe:
+        pipe.hincrby(batch_key(batch_id), counter, 1)
+        pipe.decr(batch_active_key(batch_id))
+        _touch(pipe, batch_id)
+        pipe.execute()
+
+    fill_batch_slots(batch_id)
+    _maybe_complete(batch_id)
+
+
+def _maybe_complete(batch_id: str):
+    # expanding -> running (ekspansi selesai) -> finished (semua anak selesai)
+    meta = get_batch(batch_id)
+    if not meta or meta.get("expanded") != "1" or meta.get("status") == "finished":
+        return
+
+    settled = int(meta.get("done") or 0) + int(meta.get("failed") or 0)
+    status = "finished" if settled >= int(meta.get("total") or 0) else "running"
+    if status != meta.get("status"):
+        get_redis().hset(batch_key(batch_id), "status", status)
+
+
+# ===== callback RQ (dijalankan di worker setelah job anak selesai) =====
+def release_item(job, ok: bool):
+    """
+    Item batch selesai (final): lepas slot fair-share & batch, hitung done/failed.
+    """
+    fair.release(job)
+    batch_id = job.meta.get("batch_id")
+    if batch_id:
+        _release_slot(batch_id, "done" if ok else "failed")
+
+
+def on_batch_item_success(job, connection, result):
+    if is_pipelined(result):
+        # slot dilepas stage finalize
+        return
+    release_item(job, True)
+
+
+def on_batch_item_failure(job, connection, type, value, traceback):
+    if will_retry(job):
+        return
+    mark_failed(job.id, str(value))
+    release_item(job, False)
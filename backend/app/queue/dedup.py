@@ -0,0 +1,139 @@
+import time
+import uuid
+from typing import Callable, Optional, Tuple
+
+from redis.exceptions import WatchError
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
+
+from app.core.config import settings
+from app.queue.job_meta import is_pipelined
+from app.queue.job_state import get_state
+from app.queue.redis_conn import get_redis
+from app.utils.validators import extract_video_id
+
+# status RQ yang berarti job masih jalan / akan jalan
+ACTIVE_STATUSES = {"created", "queued", "started", "deferred", "scheduled"}
+
+
+def canonical_job_key(url: str, file_type: str, quality: Optional[str], bitrate: Optional[int]) -> Optional[str]:
+    """
+    Key kanonik untuk permintaan download:
+      youtu.be/X, watch?v=X&t=.., m.youtube.com/... -> "X:mp4:720p" / "X:mp3:192"
+    Return None kalau video ID tidak bisa diambil (tidak di-dedup).
+    """
+    video_id = extract_video_id(url)
+    if not video_id:
+        return None
+
+    if file_type == "mp4":
+        return f"{video_id}:mp4:{(quality or '').strip().lower()}"
+    return f"{video_id}:mp3:{int(bitrate or 0)}"
+
+
+def inflight_key(canonical_key: str) -> str:
+    return f"inflight:{canonical_key}"
+
+
+def alias_key(job_id: str) -> str:
+    return f"jobalias:{job_id}"
+
+
+def resolve_job_id(job_id: str) -> str:
+    """
+    Handle milik caller -> job RQ yang sebenarnya dijalankan.
+    Job primary tidak punya alias, jadi dikembalikan apa adanya.
+    """
+    primary = get_redis().get(alias_key(job_id))
+    if not primary:
+        return job_id
+    return primary.decode() if isinstance(primary, bytes) else primary
+
+
+def _claim_value(job_id: str) -> str:
+    # waktu claim ikut disimpan: job yang belum ada di RQ hanya dianggap aktif sebentar
+    return f"{job_id}|{time.time()}"
+
+
+def _parse_claim(raw) -> Tuple[str, float]:
+    raw = raw.decode() if isinstance(raw, bytes) else raw
+    job_id, _, claimed_at = raw.partition("|")
+    try:
+        return job_id, float(claimed_at)
+    except ValueError:
+        return job_id, 0.0
+
+
+def _is_active(job_id: str, claimed_at: float) -> bool:
+    try:
+        job = Job.fetch(job_id, connection=get_redis())
+    except NoSuchJobError:
+        # claim baru: enqueue mungkin belum selesai. Claim lama tanpa job
+        # (job dihapus/expire, proses mati sebelum enqueue) -> basi
+        return time.time() - claimed_at < settings.DEDUP_CLAIM_GRACE_SECONDS
+    status = job.get_status()
+    if status == "finished" and is_pipelined(job.result):
+        # job utama selesai, stage pipeline mungkin masih jalan
+        state = get_state(job_id, ("status",)) or {}
+        return state.get("status") not in ("finished", "failed")
+    return status in ACTIVE_STATUSES
+
+
+def enqueue_single_flight(
+    canonical_key: Optional[str],
+    enqueue: Callable[[str], Job],
+) -> Tuple[str, bool]:
+    """
+    Single-flight enqueue.
+
+    - Request pertama untuk canonical_key meng-claim key inflight lalu enqueue job.
+    - Request berikutnya (selama job masih aktif) tidak enqueue lagi, tapi dapat
+      handle baru (alias) yang menunjuk ke job yang sudah jalan.
+
+    `enqueue(job_id)` harus meng-enqueue job dengan id tersebut.
+    Return: (job_id untuk caller, attached)
+    """
+    if not canonical_key:
+        job = enqueue(uuid.uuid4().hex)
+        return job.id, False
+
+    r = get_redis()
+    key = inflight_key(canonical_key)
+    ttl = settings.JOB_TTL_SECONDS
+
+    for _ in range(3):
+        job_id = uuid.uuid4().hex
+
+        if r.set(key, _claim_value(job_id), nx=True, ex=ttl):
+            try:
+                enqueue(job_id)
+            except Exception:
+                r.delete(key)
+                raise
+            return job_id, False
+
+        existing = r.get(key)
+        if not existing:
+            continue
+        existing_id, claimed_at = _parse_claim(existing)
+
+        if _is_active(existing_id, claimed_at):
+            handle = uuid.uuid4().hex
+            r.set(alias_key(handle), existing_id, ex=ttl)
+            return handle, True
+
+        # job lama sudah selesai/gagal/basi -> lepas claim, coba lagi
+        with r.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                current = pipe.get(key)
+                pipe.multi()
+                if current == existing:
+                    pipe.delete(key)
+                pipe.execute()
+            except WatchError:
+                pass
+
+    # fallback: tanpa dedup
+    job = enqueue(uuid.uuid4().hex)
+    return job.id, False
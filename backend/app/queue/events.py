@@ -0,0 +1,100 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional, Set
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# channel pub/sub per job, worker publish tiap progress berubah
+CHANNEL_PATTERN = "job:*:events"
+
+
+def job_events_channel(job_id: str) -> str:
+    return f"job:{job_id}:events"
+
+
+def publish_job_event(redis_conn, job_id: str, data: Dict[str, Any]):
+    """
+    Dipanggil dari worker (sync redis client).
+    """
+    redis_conn.publish(job_events_channel(job_id), json.dumps(data))
+
+
+class JobEventBroadcaster:
+    """
+    Satu subscription Redis (PSUBSCRIBE job:*:events) per proses API,
+    di-fan-out ke asyncio.Queue milik tiap client SSE.
+    """
+
+    def __init__(self, queue_size: int = 32):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(job_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, job_id: str, q: asyncio.Queue):
+        subs = self._subscribers.get(job_id)
+        if not subs:
+            return
+        subs.discard(q)
+        if not subs:
+            self._subscribers.pop(job_id, None)
+
+    def _dispatch(self, job_id: str, data: Dict[str, Any]):
+        for q in list(self._subscribers.get(job_id, ())):
+            if q.full():
+                # client lambat: buang event lama, yang penting state terbaru
+                try:
+                    q.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            q.put_nowait(data)
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            # koneksi khusus (di luar pool): listen() blocking, tidak boleh kena socket_timeout
+            conn = aioredis.Redis.from_url(
+                settings.REDIS_URL,
+                health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            )
+            pubsub = conn.pubsub()
+            try:
+                await pubsub.psubscribe(CHANNEL_PATTERN)
+                backoff = 1
+                async for msg in pubsub.listen():
+                    if msg.get("type") != "pmessage":
+                        continue
+                    channel = msg["channel"]
+                    channel = channel.decode() if isinstance(channel, bytes) else channel
+                    try:
+                        data = json.loads(msg["data"])
+                    except Exception:
+                        continue
+                    self._dispatch(channel.split(":")[1], data)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("job events: pubsub disconnected, retry in %ss", backoff, exc_info=True)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                try:
+                    await pubsub.aclose()
+                    await conn.aclose()
+                except Exception:
+                    pass
+
+
+broadcaster = JobEventBroadcaster()
@@ -0,0 +1,291 @@
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+from redis.exceptions import LockError
+from rq import Callback, Retry
+from rq.job import Job, JobStatus
+from rq.utils import now
+
+from app.core.config import settings
+from app.queue.dedup import ACTIVE_STATUSES
+from app.queue.job_meta import is_pipelined, will_retry
+from app.queue.job_state import mark_failed, set_state, state_key
+from app.queue.redis_conn import get_redis
+from app.queue.rq_queue import get_queue
+
+logger = logging.getLogger(__name__)
+
+# Fair-share per client di atas antrian RQ (per queue):
+#
+#   fair:{q}:active            set    job yang sudah masuk antrian RQ (queued/started)
+#   fair:{q}:active:{client}   set    idem, per client
+#   fair:{q}:owner             hash   job id -> client
+#   fair:{q}:pending:{client}  list   job deferred milik client, menunggu slot
+#   fair:{q}:clients           list   ring client yang punya job pending (round-robin)
+#   fair:{q}:durations         list   lama slot dipegang job terakhir (detik), untuk estimasi antrian
+#
+# Job dibuat dulu sebagai "deferred" lalu dispatch() memindahkannya ke antrian RQ
+# selama batas global (FAIR_MAX_ACTIVE) dan batas per client (FAIR_CLIENT_MAX_ACTIVE)
+# belum penuh. Client bergiliran, tiap giliran dapat `weight` job.
+# Slot dilepas di callback RQ saat job selesai/gagal.
+
+
+def _key(queue_name: str, *parts: str) -> str:
+    return ":".join(("fair", queue_name) + parts)
+
+
+def _decode(v):
+    return v.decode() if isinstance(v, bytes) else v
+
+
+def api_key_client_id(api_key: str) -> str:
+    return "key:" + hashlib.sha1(api_key.encode()).hexdigest()[:16]
+
+
+_weights: Optional[Dict[str, int]] = None
+
+
+def client_weight(client: str) -> int:
+    """
+    Bobot client dari FAIR_CLIENT_WEIGHTS ("apikey=3,apikey2=2"), default 1.
+    """
+    global _weights
+    if _weights is None:
+        weights = {}
+        for item in settings.FAIR_CLIENT_WEIGHTS.split(","):
+            key, _, weight = item.strip().partition("=")
+            if key and weight.isdigit():
+                weights[api_key_client_id(key)] = max(1, int(weight))
+        _weights = weights
+    return _weights.get(client, 1)
+
+
+def submit(
+    queue_name: str,
+    client: str,
+    func: str,
+    args: Iterable[Any] = (),
+    kwargs: Optional[Dict[str, Any]] = None,
+    job_id: Optional[str] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    on_success: Optional[Callback] = None,
+    on_failure: Optional[Callback] = None,
+    retry: Optional[Retry] = None,
+) -> Job:
+    """
+    Pengganti q.enqueue(): job langsung jalan kalau client masih punya slot,
+    kalau tidak menunggu (deferred) sampai giliran client berikutnya.
+    """
+    q = get_queue(queue_name)
+    job = q.create_job(
+        func,
+        args=tuple(args),
+        kwargs=kwargs or {},
+        job_id=job_id,
+        meta={**(meta or {}), "fair_queue": queue_name, "fair_client": client},
+        status=JobStatus.DEFERRED,
+        result_ttl=settings.JOB_TTL_SECONDS,
+        failure_ttl=settings.JOB_TTL_SECONDS,
+        on_success=on_success or Callback(on_job_success),
+        on_failure=on_failure or Callback(on_job_failure),
+        retry=retry,
+    )
+    job.save()
+
+    r = get_redis()
+    ring = _key(queue_name, "clients")
+    with r.pipeline() as pipe:
+        set_state(job.id, {"status": "deferred", "progress": 0, "stage": "queued"}, pipe=pipe)
+        pipe.rpush(_key(queue_name, "pending", client), job.id)
+        pipe.expire(_key(queue_name, "pending", client), settings.JOB_TTL_SECONDS)
+        # job deferred tidak punya TTL dari RQ; kalau tidak pernah di-dispatch jangan bocor
+        pipe.expire(job.key, settings.JOB_TTL_SECONDS)
+        # client masuk ring sekali saja
+        pipe.lrem(ring, 0, client)
+        pipe.rpush(ring, client)
+        pipe.execute()
+
+    dispatch(queue_name)
+    return job
+
+
+def dispatch(queue_name: str):
+    """
+    Pindahkan job pending ke antrian RQ, round-robin antar client.
+    Lock dipegang dispatch lain terlalu lama: job tetap pending, diambil dispatch
+    berikutnya (job selesai / submit berikutnya), bukan error ke pemanggil.
+    """
+    r = get_redis()
+    try:
+        with r.lock(_key(queue_name, "lock"), timeout=10, blocking_timeout=10):
+            _dispatch_locked(r, queue_name)
+    except LockError:
+        logger.warning("fair dispatch %s: lock busy, job tetap pending", queue_name)
+
+
+def _dispatch_locked(r, queue_name: str):
+    q = get_queue(queue_name)
+    ring = _key(queue_name, "clients")
+    active = _key(queue_name, "active")
+
+    _prune(queue_name)
+
+    budget = settings.FAIR_MAX_ACTIVE - r.scard(active)
+    clients = [_decode(c) for c in r.lrange(ring, 0, -1)]
+
+    while budget > 0 and clients:
+        progressed = False
+        for client in list(clients):
+            client_active = _key(queue_name, "active", client)
+            for _ in range(client_weight(client)):
+                if budget <= 0 or r.scard(client_active) >= settings.FAIR_CLIENT_MAX_ACTIVE:
+                    break
+
+                job_id = r.lpop(_key(queue_name, "pending", client))
+                if job_id is None:
+                    r.lrem(ring, 0, client)
+                    clients.remove(client)
+                    break
+
+                job_id = _decode(job_id)
+                try:
+                    job = Job.fetch(job_id, connection=r)
+                except Exception:
+                    # job sudah expire / dihapus: jangan biarkan state-nya tetap "deferred"
+                    mark_failed(job_id, "job expired while waiting in queue")
+                    progressed = True
+                    continue
+
+                with r.pipeline() as pipe:
+                    # TTL deferred dilepas, selanjutnya umur job diatur RQ (result_ttl/failure_ttl)
+                    pipe.persist(job.key)
+                    pipe.sadd(active, job_id)
+                    pipe.sadd(client_active, job_id)
+                    pipe.hset(_key(queue_name, "owner"), job_id, client)
+                    set_state(job_id, {"status": "queued"}, pipe=pipe)
+                    pipe.execute()
+                # enqueue_job() tidak memproses job yang masih berstatus deferred
+                job.set_status(JobStatus.QUEUED)
+                q.enqueue_job(job)
+                budget -= 1
+                progressed = True
+
+        if not progressed:
+            break
+
+    _touch_pending(queue_name, clients)
+
+    # putar ring: dispatch berikutnya mulai dari client lain
+    if r.llen(ring) > 1:
+        r.lmove(ring, ring, "LEFT", "RIGHT")
+
+
+def _prune(queue_name: str):
+    """
+    Lepas slot job yang sudah tidak jalan tapi callbacknya tidak terpanggil
+    (mis. worker mati di tengah job).
+    """
+    r = get_redis()
+    active = _key(queue_name, "active")
+    job_ids = [_decode(j) for j in r.smembers(active)]
+    if not job_ids:
+        return
+
+    jobs = Job.fetch_many(job_ids, connection=r)
+    stale = [
+        job_id for job_id, job in zip(job_ids, jobs)
+        if job is None or job.get_status(refresh=False) not in ACTIVE_STATUSES
+    ]
+    for job_id in stale:
+        _release_slot(queue_name, job_id)
+
+
+def _touch_pending(queue_name: str, clients: Iterable[str]):
+    """
+    Perpanjang TTL antrian pending yang masih berisi, beserta job deferred dan state-nya,
+    supaya backlog yang lebih lama dari JOB_TTL_SECONDS tidak hilang di tengah jalan.
+    """
+    r = get_redis()
+    with r.pipeline() as pipe:
+        for client in clients:
+            pending = _key(queue_name, "pending", client)
+            for job_id in r.lrange(pending, 0, -1):
+                job_id = _decode(job_id)
+                pipe.expire(Job.key_for(job_id), settings.JOB_TTL_SECONDS)
+                pipe.expire(state_key(job_id), settings.JOB_TTL_SECONDS)
+            pipe.expire(pending, settings.JOB_TTL_SECONDS)
+        pipe.execute()
+
+
+def _release_slot(queue_name: str, job_id: str):
+    r = get_redis()
+    owner_key = _key(queue_name, "owner")
+    client = _decode(r.hget(owner_key, job_id))
+
+    with r.pipeline() as pipe:
+        pipe.srem(_key(queue_name, "active"), job_id)
+        if client:
+            pipe.srem(_key(queue_name, "active", client), job_id)
+        pipe.hdel(owner_key, job_id)
+        pipe.execute()
+
+
+def release(job: Job):
+    """
+    Dipanggil saat job selesai/gagal: lepas slot lalu jalankan job berikutnya.
+    """
+    queue_name = job.meta.get("fair_queue")
+    if not queue_name:
+        return
+    _release_slot(queue_name, job.id)
+    if job.started_at:
+        _record_duration(queue_name, (now() - job.started_at).total_seconds())
+    dispatch(queue_name)
+
+
+def _record_duration(queue_name: str, seconds: float):
+    key = _key(queue_name, "durations")
+    with get_redis().pipeline() as pipe:
+        pipe.lpush(key, round(max(0.0, seconds), 3))
+        pipe.ltrim(key, 0, settings.ADMISSION_DURATION_SAMPLES - 1)
+        pipe.execute()
+
+
+def mean_duration(queue_name: str) -> Optional[float]:
+    """
+    Rata-rata lama job di queue ini (start sampai slot dilepas, termasuk stage
+    pipeline), dari ADMISSION_DURATION_SAMPLES job terakhir. None kalau belum ada data.
+    """
+    samples = [float(v) for v in get_redis().lrange(_key(queue_name, "durations"), 0, -1)]
+    return sum(samples) / len(samples) if samples else None
+
+
+def client_pending(queue_name: str, client: str) -> int:
+    return get_redis().llen(_key(queue_name, "pending", client))
+
+
+def get_stats(queue_name: str) -> Dict[str, Any]:
+    r = get_redis()
+    clients = [_decode(c) for c in r.lrange(_key(queue_name, "clients"), 0, -1)]
+    return {
+        "active": r.scard(_key(queue_name, "active")),
+        "waiting_clients": len(clients),
+        "pending": sum(r.llen(_key(queue_name, "pending", c)) for c in clients),
+    }
+
+
+# ===== callback RQ =====
+def on_job_success(job, connection, result):
+    if is_pipelined(result):
+        # slot dilepas stage finalize
+        return
+    release(job)
+
+
+def on_job_failure(job, connection, type, value, traceback):
+    if will_retry(job):
+        # slot tetap dipegang sampai attempt terakhir
+        return
+    mark_failed(job.id, str(value))
+    release(job)
@@ -1,23 +1,47 @@
-import json
 from typing import Any, Dict, Optional
 from app.queue.redis_conn import get_redis
 
-def job_meta_key(job_id: str) -> str:
-    return f"job:{job_id}:meta"
+def job_stream_key(job_id: str) -> str:
+    return f"job:{job_id}:stream"
 
-def set_job_meta(job_id: str, data: Dict[str, Any], ttl_seconds: int = 3600):
+def set_job_stream(job_id: str, path: str, media_type: str, ttl_seconds: int = 3600):
+    """
+    Job mode streaming: file output yang sedang ditulis worker.
+    state: writing -> complete / failed
+    """
     r = get_redis()
-    key = job_meta_key(job_id)
-    r.set(key, json.dumps(data))
-    r.expire(key, ttl_seconds)
+    key = job_stream_key(job_id)
+    with r.pipeline() as pipe:
+        pipe.hset(key, mapping={"path": path, "media_type": media_type, "state": "writing"})
+        pipe.expire(key, ttl_seconds)
+        pipe.execute()
 
-def get_job_meta(job_id: str) -> Optional[Dict[str, Any]]:
+def finish_job_stream(job_id: str, state: str):
+    # no-op untuk job yang bukan mode streaming
     r = get_redis()
-    key = job_meta_key(job_id)
-    raw = r.get(key)
-    if not raw:
-        return None
-    try:
-        return json.loads(raw)
-    except Exception:
+    key = job_stream_key(job_id)
+    if r.exists(key):
+        r.hset(key, "state", state)
+
+def get_job_stream(job_id: str) -> Optional[Dict[str, str]]:
+    r = get_redis()
+    data = r.hgetall(job_stream_key(job_id))
+    if not data:
         return None
+    return {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in data.items()
+    }
+
+# result job utama yang dilanjutkan stage pipeline: status akhirnya ada di state job (job_state)
+PIPELINED = "pipelined"
+
+def is_pipelined(result: Any) -> bool:
+    return isinstance(result, dict) and result.get("status") == PIPELINED
+
+def will_retry(job) -> bool:
+    """
+    Callback on_failure RQ terpanggil di tiap attempt, termasuk yang masih
+    akan di-retry. True kalau kegagalan ini belum final.
+    """
+    return (job.retries_left or 0) > 0
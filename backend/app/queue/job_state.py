@@ -0,0 +1,128 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.queue.redis_conn import get_redis
+
+# State job di satu hash Redis, job:{id}:state
+#
+#   status          deferred/queued/started/finished/failed
+#   progress        0-100
+#   stage           init/extracting/downloading/postprocess/.../done/failed
+#   filename        nama file output (untuk Content-Disposition)
+#   path            path file output (dipakai /download)
+#   error           error terakhir
+#   transcode_path  copy/transcode/reuse
+#   transcode_reason  alasan planner memilih jalur itu
+#   transcode_height  tinggi video yang dikirim (bisa di bawah kualitas diminta)
+#   parent          job induk (rendition)
+#   artifact        key artifact store yang menyimpan copy output (janitor: redirect path)
+#   bandwidth       pemakaian bandwidth download (JSON, lihat BandwidthGovernor)
+#   attempt         attempt download ke berapa (app.jobs.retry checkpoint)
+#   partial_bytes   byte .part yang bisa dilanjutkan attempt berikutnya
+#   pct             progress terakhir saat checkpoint
+#   version         nomor urut global tulisan terakhir (job:state:version)
+#
+# Tulis per field: HSET + EXPIRE + nomor versi dalam satu script (atomik).
+# Baca: HMGET field yang perlu. Client yang polling banyak job cukup minta
+# job dengan version > versi terakhir yang sudah dia lihat.
+# Ditulis API (deferred/queued), worker backend & worker standalone (progress),
+# callback RQ (failed). Tidak perlu Job.fetch + unpickle untuk baca status.
+
+STATE_FIELDS = ("status", "progress", "stage", "filename", "path", "error", "transcode_path", "transcode_reason", "transcode_height", "parent")
+
+STATE_VERSION_KEY = "job:state:version"
+
+_SET_STATE_LUA = """
+local v = redis.call('INCR', KEYS[2])
+redis.call('HSET', KEYS[1], 'version', v, unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return v
+"""
+_set_state_script = None
+
+
+def state_key(job_id: str) -> str:
+    return f"job:{job_id}:state"
+
+
+def _encode(v: Any):
+    if v is None:
+        return ""
+    if isinstance(v, (dict, list)):
+        return json.dumps(v)
+    return v
+
+
+def _decode(v):
+    return v.decode() if isinstance(v, bytes) else v
+
+
+def status_for_stage(stage: str) -> str:
+    if stage == "done":
+        return "finished"
+    if stage in ("failed", "error"):
+        return "failed"
+    return "started"
+
+
+def set_state(job_id: str, fields: Dict[str, Any], ttl_seconds: Optional[int] = None, pipe=None):
+    """
+    Update sebagian field state. `pipe`: ikut pipeline/transaksi milik caller.
+    """
+    global _set_state_script
+    if _set_state_script is None:
+        _set_state_script = get_redis().register_script(_SET_STATE_LUA)
+
+    ttl = settings.JOB_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    args = [ttl]
+    for k, v in fields.items():
+        args += [k, _encode(v)]
+
+    _set_state_script(keys=[state_key(job_id), STATE_VERSION_KEY], args=args, client=pipe)
+
+
+def decode_state(fields: Iterable[str], values: List[Any]) -> Optional[Dict[str, str]]:
+    if all(v is None for v in values):
+        return None
+    return {f: _decode(v) for f, v in zip(fields, values) if v is not None}
+
+
+def get_state(job_id: str, fields: Iterable[str] = STATE_FIELDS) -> Optional[Dict[str, str]]:
+    """
+    Field state yang diminta (field kosong tidak ikut), None kalau job tidak ada.
+    """
+    fields = tuple(fields)
+    return decode_state(fields, get_redis().hmget(state_key(job_id), fields))
+
+
+def get_states(job_ids: List[str], fields: Iterable[str] = STATE_FIELDS) -> List[Optional[Dict[str, str]]]:
+    """
+    get_state untuk banyak job sekaligus (satu round trip).
+    """
+    if not job_ids:
+        return []
+    fields = tuple(fields)
+    with get_redis().pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.hmget(state_key(job_id), fields)
+        rows = pipe.execute()
+    return [decode_state(fields, values) for values in rows]
+
+
+def set_job_file(job_id: str, path: str, file_name: str, ttl_seconds: Optional[int] = None):
+    """
+    Index job -> file output, supaya /download tidak perlu Job.fetch + unpickle result.
+    """
+    set_state(job_id, {"path": path, "filename": file_name}, ttl_seconds)
+
+
+def get_job_file(job_id: str) -> Optional[Dict[str, str]]:
+    state = get_state(job_id, ("path", "filename"))
+    if not state or not state.get("path"):
+        return None
+    return {"path": state["path"], "file_name": state.get("filename") or ""}
+
+
+def mark_failed(job_id: str, error: str, pipe=None):
+    set_state(job_id, {"status": "failed", "stage": "failed", "progress": 100, "error": error}, pipe=pipe)
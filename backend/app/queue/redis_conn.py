@@ -1,5 +1,38 @@
 import redis
+import redis.asyncio as aioredis
 from app.core.config import settings
 
-def get_redis():
-    return redis.Redis.from_url(settings.REDIS_URL)
+# satu pool per proses (redis-py reset pool sendiri kalau proses di-fork)
+_pool = None
+_async_pool = None
+
+
+def _pool_kwargs() -> dict:
+    return {
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+    }
+
+
+def get_pool() -> redis.ConnectionPool:
+    global _pool
+    if _pool is None:
+        _pool = redis.ConnectionPool.from_url(settings.REDIS_URL, **_pool_kwargs())
+    return _pool
+
+
+def get_async_pool() -> aioredis.ConnectionPool:
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = aioredis.ConnectionPool.from_url(settings.REDIS_URL, **_pool_kwargs())
+    return _async_pool
+
+
+def get_redis() -> redis.Redis:
+    return redis.Redis(connection_pool=get_pool())
+
+
+def get_async_redis() -> aioredis.Redis:
+    return aioredis.Redis(connection_pool=get_async_pool())
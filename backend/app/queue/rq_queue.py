@@ -1,6 +1,45 @@
-from rq import Queue
+import random
+from typing import Dict, List, Optional
+
+from rq import Queue, Retry
+
+from app.core.config import settings
 from app.queue.redis_conn import get_redis
 
+_queues: Dict[str, Queue] = {}
+
+
 def get_queue(name: str = "default") -> Queue:
-    redis_conn = get_redis()
-    return Queue(name, connection=redis_conn)
+    # Queue dibuat sekali per nama, koneksi dari pool bersama
+    q = _queues.get(name)
+    if q is None:
+        q = _queues[name] = Queue(name, connection=get_redis())
+    return q
+
+
+def queue_names() -> List[str]:
+    # urutan = prioritas worker
+    return [
+        settings.QUEUE_FINALIZE,
+        settings.QUEUE_INTERACTIVE,
+        settings.QUEUE_TRANSCODE,
+        settings.QUEUE_DOWNLOAD,
+        settings.QUEUE_BULK,
+        "default",
+    ]
+
+
+def retry_policy(max_retries: Optional[int] = None) -> Optional[Retry]:
+    """
+    Retry RQ dengan interval eksponensial + jitter (butuh worker dengan scheduler).
+    Jitter supaya job yang gagal barengan (mis. koneksi putus) tidak retry barengan juga.
+    """
+    max_retries = settings.DOWNLOAD_RETRY_MAX if max_retries is None else max_retries
+    if max_retries <= 0:
+        return None
+
+    intervals = []
+    for attempt in range(max_retries):
+        delay = min(settings.DOWNLOAD_RETRY_MAX_SECONDS, settings.DOWNLOAD_RETRY_BASE_SECONDS * 2 ** attempt)
+        intervals.append(int(random.uniform(delay / 2, delay)))
+    return Retry(max=max_retries, interval=intervals)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, HttpUrl
-from typing import Optional, Literal
+from pydantic import BaseModel, Field, HttpUrl
+from typing import List, Optional, Literal
 
 
 class CreateJobRequest(BaseModel):
@@ -7,6 +7,7 @@ class CreateJobRequest(BaseModel):
     type: Literal["mp4", "mp3"]
     quality: Optional[str] = None   # contoh: "720p"
     bitrate: Optional[int] = None   # contoh: 128, 192, 320
+    stream: bool = False            # kirim byte ke client selama download (/stream/{job_id})
 
 
 class JobStatusResponse(BaseModel):
@@ -15,5 +16,36 @@ class JobStatusResponse(BaseModel):
     progress: int
     stage: str
     downloadUrl: Optional[str] = None
+    streamUrl: Optional[str] = None
     filename: Optional[str] = None
     error: Optional[str] = None
+
+
+class RenditionSpec(BaseModel):
+    type: Literal["mp4", "mp3"]
+    quality: Optional[str] = None   # mp4, contoh: "720p"
+    bitrate: Optional[int] = None   # mp3, contoh: 128, 192, 320
+
+
+class CreateRenditionsJobRequest(BaseModel):
+    url: HttpUrl
+    renditions: List[RenditionSpec] = Field(..., min_length=1, max_length=8)
+
+
+class CreateBatchRequest(BaseModel):
+    url: Optional[HttpUrl] = None                 # playlist
+    urls: Optional[List[HttpUrl]] = None          # atau list URL video
+    type: Literal["mp4", "mp3"]
+    quality: Optional[str] = None
+    bitrate: Optional[int] = None
+    concurrency: Optional[int] = Field(None, ge=1)  # dibatasi BATCH_MAX_CONCURRENCY
+
+
+# field respons yang bisa diminta di /jobs/status (jobId & version selalu ada)
+JobStatusField = Literal["status", "progress", "stage", "filename", "downloadUrl", "error"]
+
+
+class BulkJobStatusRequest(BaseModel):
+    job_ids: List[str] = Field(..., min_length=1, max_length=500)
+    fields: Optional[List[JobStatusField]] = None   # None = semua field
+    since: Optional[int] = None                     # hanya job dengan version > since
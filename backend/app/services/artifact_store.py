@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.queue.redis_conn import get_redis
+
+logger = logging.getLogger(__name__)
+
+# index Redis:
+#   artifact:{key}   hash  -> state, path, file_name, size, created_at
+#   artifacts:lru    zset  -> key, score = terakhir dipakai
+#   artifacts:bytes  int   -> total ukuran artifact yang "ready"
+LRU_KEY = "artifacts:lru"
+BYTES_KEY = "artifacts:bytes"
+
+STATE_PENDING = "pending"
+STATE_READY = "ready"
+
+
+def artifact_key(key: str) -> str:
+    return f"artifact:{key}"
+
+
+def _decode(data: Dict[Any, Any]) -> Dict[str, str]:
+    return {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in data.items()
+    }
+
+
+def store_root(storage_dir: str | Path) -> Path:
+    return Path(storage_dir) / "artifacts"
+
+
+def _link_or_copy(src: Path, dst: Path):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # beda filesystem / tidak support hard link
+        shutil.copy2(src, dst)
+
+
+def lookup(key: str) -> Optional[Dict[str, str]]:
+    """
+    Artifact yang sudah ready untuk key ini, atau None.
+    Entry yang file-nya sudah hilang dibersihkan dari index.
+    """
+    r = get_redis()
+    data = _decode(r.hgetall(artifact_key(key)))
+    if data.get("state") != STATE_READY:
+        return None
+
+    if not os.path.exists(data.get("path", "")):
+        _forget(key, data)
+        return None
+
+    r.zadd(LRU_KEY, {key: time.time()})
+    return data
+
+
+def mark_pending(key: str):
+    """
+    Tandai artifact sedang didownload supaya evictor tidak menyentuhnya.
+    Pakai TTL supaya marker tidak nyangkut kalau worker mati.
+    """
+    r = get_redis()
+    akey = artifact_key(key)
+    if r.hget(akey, "state") in (STATE_READY, STATE_READY.encode()):
+        return
+    with r.pipeline() as pipe:
+        pipe.hset(akey, mapping={"state": STATE_PENDING, "created_at": time.time()})
+        pipe.expire(akey, settings.JOB_TTL_SECONDS)
+        pipe.execute()
+
+
+def clear_pending(key: str):
+    r = get_redis()
+    akey = artifact_key(key)
+    if r.hget(akey, "state") in (STATE_PENDING, STATE_PENDING.encode()):
+        r.delete(akey)
+
+
+def publish(key: str, output_file: Path, storage_dir: str | Path) -> Path:
+    """
+    Simpan output job ke store (content-addressed per key) dan daftarkan di index.
+    Return path artifact di store.
+    """
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    target_dir = store_root(storage_dir) / digest
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    target = target_dir / output_file.name
+    if not target.exists():
+        _link_or_copy(output_file, target)
+
+    size = target.stat().st_size
+    r = get_redis()
+    akey = artifact_key(key)
+    already_ready = _decode(r.hgetall(akey)).get("state") == STATE_READY
+    with r.pipeline() as pipe:
+        pipe.hset(akey, mapping={
+            "state": STATE_READY,
+            "path": str(target),
+            "file_name": target.name,
+            "size": size,
+            "created_at": time.time(),
+        })
+        pipe.persist(akey)
+        pipe.zadd(LRU_KEY, {key: time.time()})
+        if not already_ready:
+            pipe.incrby(BYTES_KEY, size)
+        pipe.execute()
+
+    evict(settings.ARTIFACT_MAX_BYTES)
+    return target
+
+
+def link_into(artifact: Dict[str, str], out_dir: Path) -> Path:
+    """
+    Pakai ulang artifact untuk job baru: hard link ke folder job,
+    fallback ke path artifact langsung kalau link/copy gagal.
+    """
+    src = Path(artifact["path"])
+    dst = out_dir / artifact.get("file_name", src.name)
+    if dst.exists():
+        return dst
+    try:
+        _link_or_copy(src, dst)
+        return dst
+    except OSError:
+        logger.warning("artifact store: link failed, referencing %s", src, exc_info=True)
+        return src
+
+
+def _forget(key: str, data: Dict[str, str]):
+    r = get_redis()
+    with r.pipeline() as pipe:
+        pipe.delete(artifact_key(key))
+        pipe.zrem(LRU_KEY, key)
+        if data.get("state") == STATE_READY:
+            pipe.decrby(BYTES_KEY, int(data.get("size") or 0))
+        pipe.execute()
+
+
+def evict(max_bytes: int, batch: int = 50) -> int:
+    """
+    Hapus artifact yang paling lama tidak dipakai sampai total <= max_bytes.
+    Artifact yang masih pending (sedang didownload) dilewati, begitu juga yang
+    masih di-hard link folder job (st_nlink > 1): menghapusnya tidak membebaskan
+    blok disk, jadi tidak dihitung. Link di folder job hilang saat janitor
+    storage me-reap folder itu, setelah itu artifact bisa di-evict.
+    Return jumlah byte yang benar-benar dibebaskan di disk.
+    """
+    r = get_redis()
+    total = int(r.get(BYTES_KEY) or 0)
+    if max_bytes <= 0 or total <= max_bytes:
+        return 0
+
+    freed = 0
+    for raw in r.zrange(LRU_KEY, 0, batch - 1):
+        if total - freed <= max_bytes:
+            break
+
+        key = raw.decode() if isinstance(raw, bytes) else raw
+        data = _decode(r.hgetall(artifact_key(key)))
+        if data.get("state") == STATE_PENDING:
+            continue
+
+        path = data.get("path")
+        size = 0
+        if path:
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+            if st is not None and st.st_nlink > 1:
+                continue
+            try:
+                os.remove(path)
+                size = st.st_size if st is not None else 0
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+        _forget(key, data)
+        freed += size
+
+    return freed
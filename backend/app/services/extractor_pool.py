@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+
+class ExtractorPoolSaturated(Exception):
+    """Antrian extractor penuh (lewat queue_timeout), request harus dicoba lagi nanti."""
+
+
+class ExtractorPool:
+    """
+    Thread pool khusus untuk yt-dlp extract_info, terpisah dari threadpool Starlette,
+    supaya burst parse tidak menghabiskan slot untuk /health & status job.
+
+    Admission control: jumlah task (jalan + antri) dibatasi `max_pending`.
+    run() (request) menunggu giliran sampai `queue_timeout` detik, baru raise
+    ExtractorPoolSaturated; submit() (refresh background) langsung raise.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float, queue_timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extractor")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._waiting = 0
+        self.rejected = 0
+        # giliran request async, dibuat per event loop
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop = None
+
+    def submit(self, fn: Callable[..., Any], *args, admitted: bool = False) -> Future:
+        with self._lock:
+            if not admitted and self._pending >= self.max_pending:
+                self.rejected += 1
+                raise ExtractorPoolSaturated()
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    def _loop_slots(self):
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        return self._slots, loop
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Jalankan fn di pool dan tunggu hasilnya (asyncio.TimeoutError kalau lewat timeout).
+        Kalau pool penuh, tunggu slot maksimal queue_timeout (ExtractorPoolSaturated).
+        Task yang timeout tetap jalan sampai selesai dan tetap dihitung pending.
+        """
+        slots, loop = self._loop_slots()
+        with self._lock:
+            self._waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.rejected += 1
+            raise ExtractorPoolSaturated()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        try:
+            future = self.submit(fn, *args, admitted=True)
+        except Exception:
+            slots.release()
+            raise
+
+        def release_slot(_future):
+            try:
+                loop.call_soon_threadsafe(slots.release)
+            except RuntimeError:
+                # event loop sudah ditutup (shutdown)
+                pass
+
+        future.add_done_callback(release_slot)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "waiting": self._waiting,
+                "rejected": self.rejected,
+            }
+
+
+extractor_pool = ExtractorPool(
+    workers=settings.PARSE_POOL_WORKERS,
+    max_pending=settings.PARSE_POOL_MAX_PENDING,
+    timeout=settings.PARSE_TIMEOUT_SECONDS,
+    queue_timeout=settings.PARSE_QUEUE_TIMEOUT_SECONDS,
+)
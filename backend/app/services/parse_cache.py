@@ -0,0 +1,186 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.queue.redis_conn import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def parse_cache_key(video_id: str) -> str:
+    return f"parse:{video_id}"
+
+
+class ParseCache:
+    """
+    Cache hasil parse_youtube per video ID, 2 tingkat:
+      - LRU in-process (paling cepat, per worker uvicorn)
+      - Redis (dibagi semua proses API)
+
+    Entry umur < ttl          -> fresh, langsung dipakai
+    Entry umur < ttl + stale  -> stale, tetap dipakai + refresh di background
+    Lebih tua dari itu        -> miss, extract ulang
+    """
+
+    def __init__(self, ttl: int, stale: int, max_size: int):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_size = max_size
+
+        self._lru: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+
+        self.stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "errors": 0,
+        }
+
+    # ===== counters =====
+    def _incr(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self.stats)
+            data["local_size"] = len(self._lru)
+        return data
+
+    # ===== local LRU =====
+    def _local_get(self, video_id: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self._lock:
+            entry = self._lru.get(video_id)
+            if entry is not None:
+                self._lru.move_to_end(video_id)
+            return entry
+
+    def _local_set(self, video_id: str, cached_at: float, data: Dict[str, Any]):
+        with self._lock:
+            self._lru[video_id] = (cached_at, data)
+            self._lru.move_to_end(video_id)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    # ===== redis =====
+    def _redis_get(self, video_id: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        try:
+            raw = get_redis().get(parse_cache_key(video_id))
+        except Exception:
+            logger.warning("parse cache: redis get failed", exc_info=True)
+            self._incr("errors")
+            return None
+
+        if not raw:
+            return None
+        try:
+            payload = json.loads(raw)
+            return float(payload["cached_at"]), payload["data"]
+        except Exception:
+            return None
+
+    def _redis_set(self, video_id: str, cached_at: float, data: Dict[str, Any]):
+        payload = json.dumps({"cached_at": cached_at, "data": data})
+        try:
+            get_redis().set(parse_cache_key(video_id), payload, ex=self.ttl + self.stale)
+        except Exception:
+            logger.warning("parse cache: redis set failed", exc_info=True)
+            self._incr("errors")
+
+    # ===== public =====
+    def store(self, video_id: str, data: Dict[str, Any]):
+        cached_at = time.time()
+        self._local_set(video_id, cached_at, data)
+        self._redis_set(video_id, cached_at, data)
+
+    def lookup(self, video_id: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """
+        Return (data, is_stale) atau None kalau miss / sudah terlalu tua.
+        Tidak memanggil extractor.
+        """
+        entry = self._local_get(video_id)
+        source = "local_hits"
+
+        if entry is None or time.time() - entry[0] >= self.ttl:
+            remote = self._redis_get(video_id)
+            if remote is not None and (entry is None or remote[0] > entry[0]):
+                entry = remote
+                source = "redis_hits"
+                self._local_set(video_id, remote[0], remote[1])
+
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < self.ttl:
+                self._incr(source)
+                return entry[1], False
+            if age < self.ttl + self.stale:
+                self._incr("stale_hits")
+                return entry[1], True
+
+        self._incr("misses")
+        return None
+
+    def get_or_load(self, video_id: str, loader: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        hit = self.lookup(video_id)
+        if hit is not None:
+            data, stale = hit
+            if stale:
+                self.refresh(video_id, loader)
+            return data
+
+        data = loader()
+        self.store(video_id, data)
+        return data
+
+    def refresh(
+        self,
+        video_id: str,
+        loader: Callable[[], Dict[str, Any]],
+        spawn: Optional[Callable[[Callable[[], None]], Any]] = None,
+    ):
+        """
+        Refresh entry di background. Satu refresh per video,
+        request lain tetap dapat data stale.
+        `spawn(run)` menjalankan refresh (default: daemon thread).
+        """
+        with self._lock:
+            if video_id in self._refreshing:
+                return
+            self._refreshing.add(video_id)
+
+        def run():
+            try:
+                self.store(video_id, loader())
+                self._incr("refreshes")
+            except Exception:
+                logger.warning("parse cache: refresh failed for %s", video_id, exc_info=True)
+                self._incr("errors")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(video_id)
+
+        if spawn is None:
+            threading.Thread(target=run, name=f"parse-refresh-{video_id}", daemon=True).start()
+            return
+
+        try:
+            spawn(run)
+        except Exception:
+            # pool penuh: refresh dilewati, coba lagi di request berikutnya
+            with self._lock:
+                self._refreshing.discard(video_id)
+
+
+parse_cache = ParseCache(
+    ttl=settings.PARSE_CACHE_TTL_SECONDS,
+    stale=settings.PARSE_CACHE_STALE_SECONDS,
+    max_size=settings.PARSE_CACHE_LRU_SIZE,
+)
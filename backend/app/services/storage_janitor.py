@@ -0,0 +1,412 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.queue.job_state import get_state, set_state, state_key
+from app.queue.redis_conn import get_redis
+from app.services import artifact_store
+
+logger = logging.getLogger(__name__)
+
+# Janitor storage: hapus folder job yang state-nya sudah expire, file antara
+# (sumber .webm/.m4a, .part) setelah job selesai, isi folder scratch (TEMP) dan
+# artifact yatim; jaga pemakaian disk di bawah high-water mark.
+#
+# Tidak scan disk: folder job didaftarkan worker ke index Redis per host
+# (path lokal hanya berarti di host itu):
+#
+#   storage:{host}:dirs      zset  path folder job -> boleh dihapus setelah (epoch)
+#   storage:{host}:done      zset  path folder job -> waktu job selesai
+#   storage:{host}:keep      hash  path folder job -> JSON list file output (tidak dihapus)
+#   storage:{host}:owners    hash  path folder job -> JSON list job id yang state-nya menunjuk
+#                                  ke folder ini (default: nama folder = job id)
+#   storage:{host}:roots     set   STORAGE_DIR yang pernah dipakai di host ini
+#   storage:{host}:backfilled set  root yang folder lamanya sudah didaftarkan
+#
+# Jalan sebagai proses terpisah di tiap host worker:
+#
+#   python -m app.services.storage_janitor [--once]
+
+
+def _key(*parts: str) -> str:
+    return ":".join(("storage", socket.gethostname()) + parts)
+
+
+def _str(v) -> str:
+    return v.decode() if isinstance(v, bytes) else v
+
+
+def track_job_dir(job_dir: str | Path, ttl_seconds: Optional[int] = None):
+    """
+    Daftarkan folder job ke index janitor. Dipanggil worker saat folder dibuat;
+    dihapus paling cepat setelah ttl (default JOB_TTL_SECONDS) dan state job expire.
+    """
+    path = Path(job_dir).resolve()
+    ttl = ttl_seconds or settings.JOB_TTL_SECONDS
+    with get_redis().pipeline(transaction=False) as pipe:
+        pipe.zadd(_key("dirs"), {str(path): time.time() + ttl})
+        pipe.sadd(_key("roots"), str(path.parent))
+        pipe.execute()
+
+
+def job_done(job_dir: str | Path, keep: Iterable[str | Path] = (), job_ids: Iterable[str] = ()):
+    """
+    Job selesai (sukses atau gagal final): file di folder job selain `keep`
+    dihapus janitor setelah STORAGE_JANITOR_DONE_GRACE_SECONDS.
+    `job_ids`: job lain yang path output-nya ada di folder ini (rendition).
+    """
+    path = str(Path(job_dir).resolve())
+    now = time.time()
+    job_ids = list(job_ids)
+    with get_redis().pipeline(transaction=False) as pipe:
+        pipe.zadd(_key("done"), {path: now})
+        pipe.hset(_key("keep"), path, json.dumps([str(Path(p).resolve()) for p in keep]))
+        if job_ids:
+            pipe.hset(_key("owners"), path, json.dumps(job_ids))
+        # state job baru saja di-refresh, hitung TTL dari sekarang
+        pipe.zadd(_key("dirs"), {path: now + settings.JOB_TTL_SECONDS})
+        pipe.execute()
+
+
+class _Throttle:
+    """Batasi jumlah operasi hapus per detik (token bucket, burst 1 detik)."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.monotonic()
+
+    def wait(self):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens < 1:
+            time.sleep((1 - self.tokens) / self.rate)
+            self.last = time.monotonic()
+            self.tokens = 1
+        self.tokens -= 1
+
+
+class StorageJanitor:
+    def __init__(self, batch: Optional[int] = None, delete_rate: Optional[float] = None):
+        self.batch = batch or settings.STORAGE_JANITOR_BATCH
+        self.throttle = _Throttle(settings.STORAGE_JANITOR_DELETE_RATE if delete_rate is None else delete_rate)
+        self.token = uuid.uuid4().hex
+        self.last_sweep: Optional[float] = None
+        self.stats: Dict[str, int] = {}
+
+    # ===== hapus (rate-limited) =====
+    def _unlink(self, path: str) -> int:
+        self.throttle.wait()
+        try:
+            st = os.lstat(path)
+            os.unlink(path)
+        except FileNotFoundError:
+            return 0
+        except OSError:
+            logger.warning("storage janitor: cannot delete %s", path, exc_info=True)
+            return 0
+        # hard link (mis. artifact store) masih memegang data: disk belum lega
+        size = st.st_size if st.st_nlink == 1 else 0
+        self.stats["files"] = self.stats.get("files", 0) + 1
+        self.stats["bytes"] = self.stats.get("bytes", 0) + size
+        return size
+
+    def _remove_entry(self, path: str) -> int:
+        """File atau folder (rekursif, per file lewat throttle). Return byte yang dihapus."""
+        if not os.path.isdir(path) or os.path.islink(path):
+            return self._unlink(path)
+
+        freed = 0
+        try:
+            with os.scandir(path) as it:
+                entries = [e.path for e in it]
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            freed += self._remove_entry(entry)
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+        return freed
+
+    def _forget_dir(self, pipe, path: str):
+        pipe.zrem(_key("dirs"), path)
+        pipe.zrem(_key("done"), path)
+        pipe.hdel(_key("keep"), path)
+        pipe.hdel(_key("owners"), path)
+
+    # ===== folder job yang state-nya sudah expire =====
+    def reap_expired(self) -> int:
+        r = get_redis()
+        now = time.time()
+        paths = [_str(p) for p in r.zrangebyscore(_key("dirs"), "-inf", now, start=0, num=self.batch)]
+        if not paths:
+            return 0
+
+        with r.pipeline(transaction=False) as pipe:
+            for path in paths:
+                pipe.ttl(state_key(os.path.basename(path)))
+            ttls = pipe.execute()
+
+        reaped = 0
+        with r.pipeline(transaction=False) as pipe:
+            for path, ttl in zip(paths, ttls):
+                if ttl != -2:
+                    # state masih ada -> cek lagi setelah state expire
+                    pipe.zadd(_key("dirs"), {path: now + (ttl if ttl > 0 else settings.JOB_TTL_SECONDS)})
+                    continue
+                self._remove_entry(path)
+                self._forget_dir(pipe, path)
+                reaped += 1
+            pipe.execute()
+        self.stats["dirs"] = self.stats.get("dirs", 0) + reaped
+        return reaped
+
+    # ===== file antara di folder job yang sudah selesai =====
+    def clean_done(self) -> int:
+        r = get_redis()
+        until = time.time() - settings.STORAGE_JANITOR_DONE_GRACE_SECONDS
+        paths = [_str(p) for p in r.zrangebyscore(_key("done"), "-inf", until, start=0, num=self.batch)]
+        if not paths:
+            return 0
+
+        keeps = r.hmget(_key("keep"), paths)
+        removed = 0
+        for path, keep in zip(paths, keeps):
+            keep = set(json.loads(_str(keep) or "[]"))
+            try:
+                with os.scandir(path) as it:
+                    entries = [e.path for e in it]
+            except OSError:
+                entries = []
+            for entry in entries:
+                if os.path.realpath(entry) not in keep:
+                    self._remove_entry(entry)
+                    removed += 1
+
+        with r.pipeline(transaction=False) as pipe:
+            pipe.zrem(_key("done"), *paths)
+            pipe.hdel(_key("keep"), *paths)
+            pipe.execute()
+        return removed
+
+    # ===== high-water mark =====
+    def _roots(self) -> List[str]:
+        return sorted(_str(p) for p in get_redis().smembers(_key("roots")))
+
+    def _usage(self, root: str) -> Optional[float]:
+        try:
+            usage = shutil.disk_usage(root)
+        except OSError:
+            return None
+        return usage.used / usage.total * 100 if usage.total else None
+
+    def enforce_high_water(self) -> int:
+        """
+        Disk di atas STORAGE_HIGH_WATER_PERCENT: hapus folder job yang sudah
+        selesai/gagal (paling dekat expire dulu), lalu evict artifact, sampai
+        di bawah STORAGE_LOW_WATER_PERCENT. Job yang masih jalan tidak disentuh.
+        """
+        r = get_redis()
+        reaped = 0
+        seen_devices = set()
+        for root in self._roots():
+            try:
+                dev = os.stat(root).st_dev
+            except OSError:
+                continue
+            if dev in seen_devices:
+                continue
+            seen_devices.add(dev)
+
+            usage = self._usage(root)
+            if usage is None or usage < settings.STORAGE_HIGH_WATER_PERCENT:
+                continue
+            logger.warning("storage janitor: %s at %.1f%% (high water %s%%)", root, usage, settings.STORAGE_HIGH_WATER_PERCENT)
+
+            paths = [_str(p) for p in r.zrange(_key("dirs"), 0, self.batch - 1)]
+            with r.pipeline(transaction=False) as pipe:
+                for path in paths:
+                    pipe.hget(state_key(os.path.basename(path)), "status")
+                statuses = pipe.execute()
+
+            for path, status in zip(paths, statuses):
+                if usage < settings.STORAGE_LOW_WATER_PERCENT:
+                    break
+                if _str(status) not in (None, "finished", "failed"):
+                    continue
+                try:
+                    if os.stat(path).st_dev != dev:
+                        continue
+                except OSError:
+                    pass
+                self._detach_outputs(path)
+                self._remove_entry(path)
+                with r.pipeline(transaction=False) as pipe:
+                    self._forget_dir(pipe, path)
+                    pipe.execute()
+                reaped += 1
+                usage = self._usage(root) or 0
+
+            if usage >= settings.STORAGE_LOW_WATER_PERCENT:
+                total = shutil.disk_usage(root).total
+                excess = int((usage - settings.STORAGE_LOW_WATER_PERCENT) / 100 * total)
+                artifact_bytes = int(r.get(artifact_store.BYTES_KEY) or 0)
+                artifact_store.evict(max(1, artifact_bytes - excess), batch=self.batch)
+
+        self.stats["dirs"] = self.stats.get("dirs", 0) + reaped
+        return reaped
+
+    def _detach_outputs(self, path: str):
+        """
+        Folder job dihapus selagi state job masih hidup: /download diarahkan ke copy
+        di artifact store kalau ada, kalau tidak path di state dikosongkan.
+        """
+        r = get_redis()
+        owners = json.loads(_str(r.hget(_key("owners"), path)) or "null") or [os.path.basename(path)]
+        prefix = path.rstrip(os.sep) + os.sep
+        for job_id in owners:
+            state = get_state(job_id, ("path", "artifact"))
+            if not state or not state.get("path", "").startswith(prefix):
+                continue
+            artifact = artifact_store.lookup(state["artifact"]) if state.get("artifact") else None
+            if artifact:
+                fields = {"path": artifact["path"], "filename": artifact.get("file_name") or os.path.basename(artifact["path"])}
+            else:
+                fields = {"path": "", "filename": ""}
+            # TTL state tidak diperpanjang
+            ttl = r.ttl(state_key(job_id))
+            set_state(job_id, fields, ttl_seconds=ttl if ttl > 0 else None)
+
+    # ===== scratch (TEMP) & artifact yatim, tiap STORAGE_JANITOR_SWEEP_SECONDS =====
+    def _scratch_names(self) -> List[str]:
+        return [n.strip() for n in settings.STORAGE_SCRATCH_DIRS.split(",") if n.strip()]
+
+    def sweep(self) -> int:
+        """
+        Satu level scandir per folder scratch dan STORAGE_DIR/artifacts (bukan
+        seluruh storage): entry yang lebih tua dari JOB_TTL_SECONDS dihapus.
+        Artifact dianggap yatim kalau tidak ada di index artifacts:lru.
+        """
+        r = get_redis()
+        cutoff = time.time() - settings.JOB_TTL_SECONDS
+        known = {hashlib.sha1(_str(k).encode()).hexdigest() for k in r.zrange(artifact_store.LRU_KEY, 0, -1)}
+        removed = 0
+
+        for root in self._roots():
+            targets = [(os.path.join(root, name), None) for name in self._scratch_names()]
+            targets.append((str(artifact_store.store_root(root)), known))
+            for directory, keep in targets:
+                try:
+                    with os.scandir(directory) as it:
+                        entries = [(e.name, e.path, e.stat(follow_symlinks=False).st_mtime) for e in it]
+                except OSError:
+                    continue
+                for name, path, mtime in entries:
+                    if mtime > cutoff or (keep is not None and name in keep):
+                        continue
+                    self._remove_entry(path)
+                    removed += 1
+
+        self.stats["swept"] = self.stats.get("swept", 0) + removed
+        return removed
+
+    # ===== backfill sekali per root =====
+    def backfill(self) -> int:
+        """
+        Daftarkan folder job yang dibuat sebelum ada index (satu level scandir,
+        sekali per root). Expire dihitung dari mtime folder.
+        """
+        r = get_redis()
+        skip = set(self._scratch_names()) | {artifact_store.store_root("").name}
+        done = {_str(p) for p in r.smembers(_key("backfilled"))}
+        added = 0
+
+        for root in self._roots():
+            if root in done:
+                continue
+            try:
+                with os.scandir(root) as it:
+                    chunk = {}
+                    for e in it:
+                        if e.name in skip or not e.is_dir(follow_symlinks=False):
+                            continue
+                        chunk[e.path] = e.stat(follow_symlinks=False).st_mtime + settings.JOB_TTL_SECONDS
+                        if len(chunk) >= 1000:
+                            added += r.zadd(_key("dirs"), chunk, nx=True)
+                            chunk = {}
+                    if chunk:
+                        added += r.zadd(_key("dirs"), chunk, nx=True)
+            except OSError:
+                logger.warning("storage janitor: cannot scan %s", root, exc_info=True)
+                continue
+            r.sadd(_key("backfilled"), root)
+        return added
+
+    # ===== loop =====
+    def _acquire(self) -> bool:
+        """Satu janitor aktif per host (lock Redis, diperpanjang tiap tick)."""
+        r = get_redis()
+        lock = _key("janitor")
+        ttl = int(settings.STORAGE_JANITOR_INTERVAL_SECONDS * 3) + 60
+        if r.set(lock, self.token, nx=True, ex=ttl):
+            return True
+        if _str(r.get(lock)) == self.token:
+            r.expire(lock, ttl)
+            return True
+        return False
+
+    def tick(self) -> Dict[str, int]:
+        self.stats = {}
+        if not self._acquire():
+            return self.stats
+
+        self.backfill()
+        self.reap_expired()
+        self.clean_done()
+        self.enforce_high_water()
+        if self.last_sweep is None or time.monotonic() - self.last_sweep >= settings.STORAGE_JANITOR_SWEEP_SECONDS:
+            self.sweep()
+            self.last_sweep = time.monotonic()
+        return self.stats
+
+    def run_forever(self):
+        logger.info("storage janitor started on %s", socket.gethostname())
+        while True:
+            try:
+                stats = self.tick()
+                if stats:
+                    logger.info("storage janitor: %s", stats)
+            except Exception:
+                logger.exception("storage janitor tick failed")
+            time.sleep(settings.STORAGE_JANITOR_INTERVAL_SECONDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Janitor storage job (folder job, scratch, artifact yatim)")
+    parser.add_argument("--once", action="store_true", help="satu putaran lalu keluar (untuk cron)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    janitor = StorageJanitor()
+    if args.once:
+        print(json.dumps(janitor.tick()))
+    else:
+        janitor.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+from typing import Any, Dict, List, Optional
+
+# codec yang bisa di-copy (-c copy) ke container target tanpa encode ulang
+MP4_VIDEO_CODECS = ("avc1", "h264")
+MP4_AUDIO_CODECS = ("mp4a", "aac")
+MP3_AUDIO_CODECS = ("mp3",)
+
+PATH_COPY = "copy"
+PATH_TRANSCODE = "transcode"
+
+# tangga resolusi: remux boleh turun paling jauh satu anak tangga dari
+# resolusi terbaik yang tersedia (1080p VP9 vs 720p H.264 -> remux 720p,
+# 1080p VP9 vs 360p H.264 -> encode 1080p)
+HEIGHT_LADDER = (144, 240, 360, 480, 720, 1080, 1440, 2160, 4320)
+
+
+def _codec(f: Dict[str, Any], field: str) -> str:
+    return (f.get(field) or "none").lower()
+
+
+def _has_video(f: Dict[str, Any]) -> bool:
+    return _codec(f, "vcodec") != "none"
+
+
+def _has_audio(f: Dict[str, Any]) -> bool:
+    return _codec(f, "acodec") != "none"
+
+
+def _video_rank(f: Dict[str, Any]) -> tuple:
+    return (f.get("height") or 0, f.get("tbr") or 0)
+
+
+def _audio_rank(f: Dict[str, Any]) -> float:
+    return f.get("abr") or f.get("tbr") or 0
+
+
+def parse_height(quality: Optional[str]) -> Optional[int]:
+    if quality and quality.lower().endswith("p"):
+        try:
+            return int(quality[:-1])
+        except ValueError:
+            return None
+    return None
+
+
+def _step_below(height: int) -> int:
+    lower = [h for h in HEIGHT_LADDER if h < height]
+    return lower[-1] if lower else 0
+
+
+def plan_transcode(
+    formats: List[Dict[str, Any]],
+    file_type: str,
+    quality: Optional[str] = None,
+    bitrate: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Pilih format sumber dari list `formats` (extract_info) supaya output bisa
+    dibuat dengan remux/stream copy, encode hanya kalau memang perlu.
+
+    Return:
+        {
+          "path": "copy" | "transcode",
+          "format": "<format_id>[+<format_id>]",   # untuk yt-dlp -f
+          "vcodec": ..., "acodec": ...,
+          "height": <tinggi video yang dikirim> | None,
+          "reason": "...",
+        }
+    """
+    if file_type == "mp4":
+        return _plan_mp4(formats, parse_height(quality))
+    return _plan_mp3(formats, bitrate or 192)
+
+
+def _plan_mp4(formats: List[Dict[str, Any]], height: Optional[int]) -> Dict[str, Any]:
+    def fits(f):
+        return height is None or (f.get("height") or 0) <= height
+
+    videos = [f for f in formats if _has_video(f) and not _has_audio(f) and fits(f)]
+    audios = [f for f in formats if _has_audio(f) and not _has_video(f)]
+    progressive = [f for f in formats if _has_video(f) and _has_audio(f) and fits(f)]
+
+    h264 = [f for f in videos if _codec(f, "vcodec").startswith(MP4_VIDEO_CODECS)]
+    aac = [f for f in audios if _codec(f, "acodec").startswith(MP4_AUDIO_CODECS)]
+    prog_copy = [
+        f for f in progressive
+        if _codec(f, "vcodec").startswith(MP4_VIDEO_CODECS) and _codec(f, "acodec").startswith(MP4_AUDIO_CODECS)
+    ]
+
+    # H.264 + AAC terbaik di bawah/sama dengan kualitas yang diminta -> cukup remux,
+    # walau resolusi lebih tinggi ada di VP9/AV1 (encode ulang jauh lebih mahal),
+    # asal turunnya tidak lebih dari satu anak tangga dari yang terbaik
+    best_height = max((f.get("height") or 0 for f in videos + progressive), default=0)
+    min_height = _step_below(best_height)
+
+    candidates = []
+    if h264 and aac:
+        v = max(h264, key=_video_rank)
+        a = max(aac, key=_audio_rank)
+        candidates.append((_video_rank(v), _plan(PATH_COPY, f"{v['format_id']}+{a['format_id']}", v, a, "h264+aac remux")))
+    if prog_copy:
+        p = max(prog_copy, key=_video_rank)
+        candidates.append((_video_rank(p), _plan(PATH_COPY, p["format_id"], p, p, "progressive h264+aac")))
+    candidates = [c for c in candidates if c[0][0] >= min_height]
+    if candidates:
+        return max(candidates, key=lambda c: c[0])[1]
+
+    # encode hanya kalau tidak ada stream yang bisa di-copy ke mp4 sama sekali
+    if videos and audios:
+        v = max(videos, key=_video_rank)
+        a = max(audios, key=_audio_rank)
+        reason = "h264 copy below best resolution" if h264 or prog_copy else "codec not mp4-compatible"
+        return _plan(PATH_TRANSCODE, f"{v['format_id']}+{a['format_id']}", v, a, reason)
+
+    if progressive:
+        p = max(progressive, key=_video_rank)
+        reason = "h264 copy below best resolution" if h264 or prog_copy else "codec not mp4-compatible"
+        return _plan(PATH_TRANSCODE, p["format_id"], p, p, reason)
+
+    # format list kosong/aneh: biarkan yt-dlp yang pilih
+    selector = f"bestvideo[height<={height}]+bestaudio/best[height<={height}]/best" if height else "bestvideo+bestaudio/best"
+    return _plan(PATH_TRANSCODE, selector, None, None, "no usable format list")
+
+
+def _plan_mp3(formats: List[Dict[str, Any]], bitrate: int) -> Dict[str, Any]:
+    audios = [f for f in formats if _has_audio(f) and not _has_video(f)]
+
+    mp3 = [f for f in audios if _codec(f, "acodec").startswith(MP3_AUDIO_CODECS)]
+    if mp3:
+        a = max(mp3, key=_audio_rank)
+        return _plan(PATH_COPY, a["format_id"], None, a, "source already mp3")
+
+    if audios:
+        # track terkecil yang bitratenya masih >= target: download & decode paling murah
+        enough = [f for f in audios if _audio_rank(f) >= bitrate]
+        a = min(enough, key=_audio_rank) if enough else max(audios, key=_audio_rank)
+        return _plan(PATH_TRANSCODE, a["format_id"], None, a, f"encode to mp3 {bitrate}k")
+
+    return _plan(PATH_TRANSCODE, "bestaudio/best", None, None, "no usable format list")
+
+
+def _plan(path: str, fmt: str, video: Optional[Dict[str, Any]], audio: Optional[Dict[str, Any]], reason: str) -> Dict[str, Any]:
+    return {
+        "path": path,
+        "format": fmt,
+        "vcodec": video.get("vcodec") if video else None,
+        "acodec": audio.get("acodec") if audio else None,
+        "height": video.get("height") if video else None,
+        "reason": reason,
+    }
+
+
+def plan_state(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Field job state untuk plan: jalur, alasan, dan tinggi video yang benar-benar dikirim."""
+    return {
+        "transcode_path": plan.get("path"),
+        "transcode_reason": plan.get("reason") or "",
+        "transcode_height": plan.get("height") or "",
+    }
@@ -1,6 +1,14 @@
-from yt_dlp import YoutubeDL
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
 from typing import Dict, List, Any
 
+from app.core.metrics import EXTRACT_SECONDS, PARSE_SECONDS
+from app.services.extractor_pool import extractor_pool
+from app.services.parse_cache import parse_cache
+from app.utils.validators import extract_video_id
+
 
 YDL_OPTS = {
     "quiet": True,
@@ -11,13 +19,92 @@ YDL_OPTS = {
 
 
 def parse_youtube(url: str) -> Dict[str, Any]:
+    """
+    Parse video, pakai cache per video ID (lihat parse_cache).
+    URL yang video ID-nya tidak bisa diambil langsung di-extract tanpa cache.
+    """
+    video_id = extract_video_id(url)
+    if not video_id:
+        return _extract(url)
+
+    return parse_cache.get_or_load(video_id, lambda: _extract(url))
+
+
+async def parse_youtube_async(url: str) -> Dict[str, Any]:
+    """
+    Versi async untuk route: cache dicek dulu, extract (miss) dan refresh (stale)
+    jalan di extractor_pool, bukan di threadpool Starlette.
+    Bisa raise ExtractorPoolSaturated / asyncio.TimeoutError.
+    """
+    start = time.perf_counter()
+    result = "error"
+    try:
+        video_id = extract_video_id(url)
+        if not video_id:
+            data = await extractor_pool.run(_extract, url)
+            result = "nocache"
+            return data
+
+        hit = await run_in_threadpool(parse_cache.lookup, video_id)
+        if hit is not None:
+            data, stale = hit
+            if stale:
+                parse_cache.refresh(video_id, lambda: _extract(url), spawn=extractor_pool.submit)
+            result = "stale" if stale else "hit"
+            return data
+
+        # store di thread pool juga, supaya hasil tetap masuk cache walau request-nya timeout
+        data = await extractor_pool.run(_extract_and_store, url, video_id)
+        result = "miss"
+        return data
+    finally:
+        PARSE_SECONDS.observe(time.perf_counter() - start, result=result)
+
+
+def _extract_and_store(url: str, video_id: str) -> Dict[str, Any]:
+    data = _extract(url)
+    parse_cache.store(video_id, data)
+    return data
+
+
+# satu YoutubeDL per thread, dipakai ulang antar extract (tidak init ulang tiap request)
+_local = threading.local()
+
+# import yt_dlp (+ extractor) ditunda sampai extract pertama: proses API yang
+# hanya melayani /ping, status atau download tidak membayar biaya import-nya
+YoutubeDL = None
+
+
+def load_ytdlp():
+    """Import yt_dlp sekali per proses (thread-safe lewat import lock Python)."""
+    global YoutubeDL
+    if YoutubeDL is None:
+        from yt_dlp import YoutubeDL as cls
+
+        YoutubeDL = cls
+    return YoutubeDL
+
+
+def _ydl() -> Any:
+    ydl = getattr(_local, "ydl", None)
+    if ydl is None:
+        ydl = _local.ydl = load_ytdlp()(YDL_OPTS)
+    return ydl
+
+
+def _extract(url: str) -> Dict[str, Any]:
     """
     Return:
       - id, title, channel, duration, thumbnail
       - formats: mp4 list + audio list
     """
-    with YoutubeDL(YDL_OPTS) as ydl:
-        info = ydl.extract_info(url, download=False)
+    start = time.perf_counter()
+    try:
+        info = _ydl().extract_info(url, download=False)
+    except Exception:
+        EXTRACT_SECONDS.observe(time.perf_counter() - start, result="error")
+        raise
+    EXTRACT_SECONDS.observe(time.perf_counter() - start, result="ok")
 
     # basic metadata
     video_id = info.get("id")
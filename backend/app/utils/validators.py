@@ -1,10 +1,47 @@
-from urllib.parse import urlparse
+import re
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
 
 ALLOWED_DOMAINS = {"www.youtube.com", "youtube.com", "m.youtube.com", "youtu.be"}
 
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_PATH_PREFIXES = ("shorts", "embed", "live", "v")
+
+
 def is_allowed_youtube_url(url: str) -> bool:
     try:
         domain = urlparse(url).netloc.lower()
         return domain in ALLOWED_DOMAINS
     except Exception:
         return False
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    """
+    Ambil video ID (11 karakter) dari URL YouTube.
+    Support: youtu.be/X, watch?v=X, /shorts/X, /embed/X, /live/X
+    Return None kalau tidak ketemu.
+    """
+    try:
+        parsed = urlparse(url)
+    except Exception:
+        return None
+
+    domain = parsed.netloc.lower()
+    if domain not in ALLOWED_DOMAINS:
+        return None
+
+    parts = [p for p in parsed.path.split("/") if p]
+
+    if domain == "youtu.be":
+        candidate = parts[0] if parts else None
+    elif parts and parts[0] == "watch":
+        candidate = (parse_qs(parsed.query).get("v") or [None])[0]
+    elif len(parts) >= 2 and parts[0] in _PATH_PREFIXES:
+        candidate = parts[1]
+    else:
+        candidate = None
+
+    if candidate and _VIDEO_ID_RE.match(candidate):
+        return candidate
+    return None
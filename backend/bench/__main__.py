@@ -0,0 +1,311 @@
+"""
+Benchmark offline: API + worker dengan extractor palsu dan media sintetis dari
+HTTP server lokal, tanpa network ke YouTube. Hasil JSON (stdout / --out) untuk
+dibandingkan antar rilis.
+
+    cd backend
+    pip install -r requirements-bench.txt              # fakeredis[lua], untuk mode tanpa --redis-url
+    python -m bench                                    # fakeredis in-process
+    python -m bench --redis-url redis://127.0.0.1:6379/15 --workers 4
+    python -m bench --phases parse,api --requests 2000 --concurrency 64 --out bench.json
+
+Fase:
+  parse  POST /api/youtube/parse, campuran cache hit/miss (--unique-ratio),
+         latency extract palsu --extract-ms
+  jobs   POST /api/youtube/jobs lalu worker RQ sampai semua job selesai:
+         jobs/menit, command Redis per job, rata-rata durasi tiap stage.
+         Butuh yt-dlp dan ffmpeg di PATH (dilewati kalau tidak ada)
+  api    GET /jobs/{id}, POST /jobs/status, GET /download/{id} untuk job
+         selesai yang di-seed langsung ke state
+
+--redis-url: pakai database kosong khusus benchmark, metrik & state ditulis ke sana.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from app.core import metrics
+from app.core.config import settings
+from app.queue.job_state import get_states, set_state
+from app.queue.redis_conn import get_redis
+from bench.fake_youtube import install
+from bench.load import run_load
+from bench.media import MediaServer, generate_media
+from bench.redis_ops import RedisOpCounter, diff, merge, per, use_fakeredis
+from bench.worker import configure, drain
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PHASES = ("parse", "jobs", "api")
+
+
+def _log(msg: str):
+    print(f"[bench] {msg}", file=sys.stderr, flush=True)
+
+
+def _video_ids(n: int) -> List[str]:
+    # 11 karakter seperti ID YouTube, unik per run (tidak kena cache run sebelumnya)
+    return [secrets.token_urlsafe(8)[:11] for _ in range(n)]
+
+
+def _watch_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def _client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300)
+
+
+# ===== parse =====
+async def parse_phase(app, args, counter: RedisOpCounter) -> Dict:
+    from app.services.parse_cache import parse_cache
+
+    ids = _video_ids(max(1, int(args.requests * args.unique_ratio)))
+    async with _client(app) as client:
+        async def request(i: int):
+            return await client.post("/api/youtube/parse", json={"url": _watch_url(ids[i % len(ids)])})
+
+        before = counter.snapshot()
+        result = await run_load(request, args.requests, args.concurrency)
+
+    result["unique_videos"] = len(ids)
+    result["extract_ms"] = args.extract_ms
+    result["cache"] = parse_cache.get_stats()
+    result["redis_per_request"] = per(diff(counter.snapshot(), before), args.requests)
+    return result
+
+
+# ===== jobs =====
+def _stage_seconds() -> Dict[str, Dict[str, float]]:
+    # sum/count per stage dari hash metrik job_stage_seconds
+    metrics.flush()
+    out: Dict[str, Dict[str, float]] = {}
+    for field, value in get_redis().hgetall("metrics:job_stage_seconds").items():
+        field = field.decode() if isinstance(field, bytes) else field
+        lbl, _, part = field.rpartition("|")
+        if part in ("sum", "count"):
+            stage = lbl.split('"')[1] if '"' in lbl else lbl
+            out.setdefault(stage, {})[part] = float(value)
+    return out
+
+
+def _spawn_workers(args, media: MediaServer, media_dir: Path, storage_dir: Path) -> List[subprocess.Popen]:
+    cmd = [
+        sys.executable, "-m", "bench.worker",
+        "--redis-url", args.redis_url,
+        "--media-url", media.base_url,
+        "--media-dir", str(media_dir),
+        "--media-seconds", str(args.media_seconds),
+        "--extract-ms", str(args.extract_ms),
+        "--storage-dir", str(storage_dir),
+        "--timeout", str(args.timeout),
+    ]
+    return [
+        subprocess.Popen(cmd, cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True)
+        for _ in range(args.workers)
+    ]
+
+
+def jobs_phase(app, args, counter: RedisOpCounter, media: MediaServer, media_dir: Path, storage_dir: Path, valid_media: bool) -> Dict:
+    missing = [tool for tool in ("yt-dlp", "ffmpeg") if not shutil.which(tool)]
+    if missing or not valid_media:
+        return {"skipped": f"{', '.join(missing) or 'ffmpeg'} tidak ditemukan di PATH"}
+
+    types = ["mp3", "mp4"] if args.job_type == "mix" else [args.job_type]
+
+    async def submit() -> List[str]:
+        ids = _video_ids(args.jobs)
+        job_ids: List[str] = []
+        async with _client(app) as client:
+            async def request(i: int):
+                resp = await client.post(
+                    "/api/youtube/jobs",
+                    json={"url": _watch_url(ids[i]), "type": types[i % len(types)]},
+                    # beberapa client supaya fair-share tidak menahan semua job di satu client
+                    headers={"X-API-Key": f"bench-{i % args.clients}"},
+                )
+                if resp.status_code == 200:
+                    job_ids.append(resp.json()["data"]["jobId"])
+                return resp
+
+            result = await run_load(request, args.jobs, args.concurrency)
+        result["job_ids"] = job_ids
+        return result
+
+    submitted = asyncio.run(submit())
+    job_ids = submitted.pop("job_ids")
+    stages_before = _stage_seconds()
+
+    _log(f"jobs: {len(job_ids)} job di-submit, {args.workers} worker")
+    start = time.perf_counter()
+    if args.workers > 1:
+        procs = _spawn_workers(args, media, media_dir, storage_dir)
+        outputs = [p.communicate()[0] for p in procs]
+        ops = merge(*(json.loads(out.strip().splitlines()[-1]) for out in outputs if out.strip()))
+    else:
+        before = counter.snapshot()
+        drain(args.timeout)
+        ops = diff(counter.snapshot(), before)
+    elapsed = time.perf_counter() - start
+
+    states = get_states(job_ids, ("status", "stage", "error"))
+    finished = sum(1 for s in states if s and s.get("status") == "finished")
+    errors = sorted({s["error"][:200] for s in states if s and s.get("error")})
+
+    stages_after = _stage_seconds()
+    stage_means = {}
+    for stage, after in stages_after.items():
+        prev = stages_before.get(stage, {})
+        count = after.get("count", 0) - prev.get("count", 0)
+        if count:
+            stage_means[stage] = round((after.get("sum", 0) - prev.get("sum", 0)) / count, 3)
+
+    return {
+        "jobs": len(job_ids),
+        "job_type": args.job_type,
+        "workers": args.workers,
+        "media_seconds": args.media_seconds,
+        "finished": finished,
+        "failed": len(job_ids) - finished,
+        "errors": errors[:5],
+        "elapsed_s": round(elapsed, 3),
+        "jobs_per_minute": round(finished / elapsed * 60, 2) if elapsed else 0.0,
+        "stage_seconds_mean": stage_means,
+        "redis_per_job": per(ops, len(job_ids)),
+        "submit": submitted,
+    }
+
+
+# ===== api =====
+def _seed_finished_jobs(n: int, media_dir: Path, storage_dir: Path) -> List[str]:
+    source = media_dir / "18.mp4"
+    job_ids = []
+    for _ in range(n):
+        job_id = f"bench-{secrets.token_hex(8)}"
+        out_dir = storage_dir / job_id
+        out_dir.mkdir(parents=True, exist_ok=True)
+        output = out_dir / "Bench.mp4"
+        shutil.copyfile(source, output)
+        set_state(job_id, {
+            "status": "finished", "progress": 100, "stage": "done",
+            "path": str(output.resolve()), "filename": output.name, "transcode_path": "copy",
+        })
+        job_ids.append(job_id)
+    return job_ids
+
+
+async def api_phase(app, args, counter: RedisOpCounter, media_dir: Path, storage_dir: Path) -> Dict:
+    job_ids = _seed_finished_jobs(args.api_jobs, media_dir, storage_dir)
+    results = {"seeded_jobs": len(job_ids), "file_bytes": (media_dir / "18.mp4").stat().st_size}
+
+    async with _client(app) as client:
+        endpoints = {
+            "status": lambda i: client.get(f"/api/youtube/jobs/{job_ids[i % len(job_ids)]}"),
+            "bulk_status": lambda i: client.post("/api/youtube/jobs/status", json={"job_ids": job_ids[:50]}),
+            "download": lambda i: client.get(f"/api/youtube/download/{job_ids[i % len(job_ids)]}"),
+        }
+        for name, request in endpoints.items():
+            before = counter.snapshot()
+            result = await run_load(request, args.requests, args.concurrency)
+            result["redis_per_request"] = per(diff(counter.snapshot(), before), args.requests)
+            results[name] = result
+            _log(f"api {name}: {result['rps']} req/s, p99 {result['p99_ms']} ms")
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark offline API + worker")
+    parser.add_argument("--phases", default=",".join(PHASES), help="fase yang dijalankan, dipisah koma (%(default)s)")
+    parser.add_argument("--redis-url", help="Redis sungguhan (database kosong); default fakeredis in-process")
+    parser.add_argument("--requests", type=int, default=500, help="request per endpoint (parse/api)")
+    parser.add_argument("--concurrency", type=int, default=16, help="request bersamaan")
+    parser.add_argument("--unique-ratio", type=float, default=0.2, help="parse: fraksi video berbeda (sisanya cache hit)")
+    parser.add_argument("--extract-ms", type=float, default=300, help="latency extract palsu (ms, jitter +-50%%)")
+    parser.add_argument("--jobs", type=int, default=20, help="jumlah job untuk fase jobs")
+    parser.add_argument("--job-type", choices=("mp3", "mp4", "mix"), default="mix")
+    parser.add_argument("--workers", type=int, default=1, help="worker RQ paralel (>1 butuh --redis-url)")
+    parser.add_argument("--clients", type=int, default=4, help="jumlah API key berbeda (fair-share)")
+    parser.add_argument("--media-seconds", type=int, default=10, help="durasi media sintetis")
+    parser.add_argument("--api-jobs", type=int, default=100, help="job selesai yang di-seed untuk fase api")
+    parser.add_argument("--timeout", type=float, default=600, help="batas waktu fase jobs (detik)")
+    parser.add_argument("--workdir", type=Path, help="folder media & storage (default: temp, dihapus setelah selesai)")
+    parser.add_argument("--out", type=Path, help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args(argv)
+
+    phases = [p.strip() for p in args.phases.split(",") if p.strip()]
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        parser.error(f"fase tidak dikenal: {', '.join(sorted(unknown))}")
+    if args.workers > 1 and not args.redis_url:
+        parser.error("--workers > 1 butuh --redis-url (fakeredis hanya in-process)")
+
+    if args.redis_url:
+        settings.REDIS_URL = args.redis_url
+    else:
+        use_fakeredis()
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="ytdl-bench-"))
+    media_dir, storage_dir = workdir / "media", workdir / "storage"
+    configure(storage_dir)
+
+    _log(f"media sintetis {args.media_seconds}s di {media_dir}")
+    valid_media = generate_media(media_dir, args.media_seconds)
+
+    from app.main import app
+
+    counter = RedisOpCounter().install()
+    results: Dict = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "app_version": settings.APP_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "redis": "url" if args.redis_url else "fakeredis",
+            "pipeline_enabled": settings.PIPELINE_ENABLED,
+            "synthetic_media": "ffmpeg" if valid_media else "random",
+            "args": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items() if k != "redis_url"},
+        },
+    }
+
+    try:
+        with MediaServer(media_dir) as media:
+            install(media.base_url, media_dir, args.media_seconds, args.extract_ms)
+
+            if "parse" in phases:
+                _log("parse ...")
+                results["parse"] = asyncio.run(parse_phase(app, args, counter))
+            if "jobs" in phases:
+                _log("jobs ...")
+                results["jobs"] = jobs_phase(app, args, counter, media, media_dir, storage_dir, valid_media)
+            if "api" in phases:
+                _log("api ...")
+                results["api"] = asyncio.run(api_phase(app, args, counter, media_dir, storage_dir))
+    finally:
+        counter.uninstall()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    body = json.dumps(results, indent=2)
+    if args.out:
+        args.out.write_text(body + "\n", encoding="utf-8")
+        _log(f"hasil ditulis ke {args.out}")
+    else:
+        print(body)
+
+
+if __name__ == "__main__":
+    main()
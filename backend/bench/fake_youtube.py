@@ -0,0 +1,97 @@
+import importlib
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from app.utils.validators import extract_video_id
+from bench.media import FORMATS, media_file_name
+
+# Pengganti yt_dlp.YoutubeDL untuk extract: info video sintetis yang format-nya
+# menunjuk ke MediaServer lokal, dengan latency extract yang bisa diatur.
+# Download tetap lewat yt-dlp CLI asli (--load-info-json), ke server lokal.
+
+# modul yang memanggil YoutubeDL(...) untuk extract
+PATCHED_MODULES = (
+    "app.services.youtube_service",
+    "app.jobs.youtube_job",
+    "app.jobs.rendition_job",
+)
+
+
+def synthetic_info(url: str, base_url: str, media_dir: Path, duration: int) -> Dict[str, Any]:
+    video_id = extract_video_id(url) or "bench000000"
+    formats = []
+    for f in FORMATS:
+        name = media_file_name(f)
+        path = media_dir / name
+        formats.append({
+            **{k: v for k, v in f.items() if k != "ffmpeg"},
+            "url": f"{base_url}/{name}",
+            "protocol": "http",
+            "filesize": path.stat().st_size if path.exists() else None,
+            "format_note": f"{f.get('height')}p" if f.get("height") else "audio",
+        })
+
+    return {
+        "id": video_id,
+        "title": f"Bench {video_id}",
+        "uploader": "bench",
+        "channel": "bench",
+        "duration": duration,
+        "thumbnail": f"{base_url}/thumb.jpg",
+        "webpage_url": url,
+        "original_url": url,
+        "extractor": "generic",
+        "extractor_key": "Generic",
+        "ext": "mp4",
+        "formats": formats,
+    }
+
+
+class FakeYoutubeDL:
+    base_url = ""
+    media_dir = Path(".")
+    duration = 10
+    latency = 0.0
+
+    def __init__(self, params=None, *args, **kwargs):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url: str, download: bool = False, **kwargs) -> Dict[str, Any]:
+        if download:
+            raise NotImplementedError("FakeYoutubeDL hanya untuk extract (download=False)")
+        if self.latency:
+            # jitter +-50%, mirip variasi latency extract YouTube
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+        return synthetic_info(url, self.base_url, self.media_dir, self.duration)
+
+    @staticmethod
+    def sanitize_info(info: Dict[str, Any], *args, **kwargs) -> Dict[str, Any]:
+        return info
+
+
+def install(base_url: str, media_dir: Path, duration: int, latency_ms: float):
+    """
+    Pasang FakeYoutubeDL di semua PATCHED_MODULES (proses ini saja).
+    """
+    fake = type("BenchYoutubeDL", (FakeYoutubeDL,), {
+        "base_url": base_url,
+        "media_dir": Path(media_dir),
+        "duration": duration,
+        "latency": latency_ms / 1000,
+    })
+    for name in PATCHED_MODULES:
+        module = importlib.import_module(name)
+        module.YoutubeDL = fake
+
+    # buang instance YoutubeDL per thread yang mungkin sudah dibuat sebelum patch
+    importlib.import_module("app.services.youtube_service")._local = threading.local()
+    return fake
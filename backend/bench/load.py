@@ -0,0 +1,68 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[i]
+
+
+def latency_summary(latencies: List[float]) -> Dict:
+    values = sorted(latencies)
+    ms = lambda s: round(s * 1000, 2)  # noqa: E731
+    return {
+        "p50_ms": ms(percentile(values, 50)),
+        "p90_ms": ms(percentile(values, 90)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else 0.0,
+        "mean_ms": ms(sum(values) / len(values)) if values else 0.0,
+    }
+
+
+async def run_load(
+    request: Callable[[int], Awaitable[httpx.Response]],
+    total: int,
+    concurrency: int,
+) -> Dict:
+    """
+    Jalankan request(i) untuk i = 0..total-1 dengan `concurrency` request
+    bersamaan. Latency diukur per request dari sisi client.
+    """
+    latencies: List[float] = []
+    codes: Counter = Counter()
+    errors = 0
+    next_i = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in next_i:
+            start = time.perf_counter()
+            try:
+                resp = await request(i)
+                codes[str(resp.status_code)] += 1
+                if resp.status_code >= 400:
+                    errors += 1
+            except Exception as e:
+                codes[type(e).__name__] += 1
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "status_codes": dict(codes),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1) if elapsed else 0.0,
+        **latency_summary(latencies),
+    }
@@ -0,0 +1,153 @@
+import os
+import re
+import shutil
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Media sintetis untuk benchmark, dilayani HTTP server lokal (tanpa network):
+#
+#   format_id  isi                      codec         mirip YouTube
+#   137        video saja, mp4          avc1 (h264)   DASH video
+#   248        video saja, webm         vp9           DASH video
+#   140        audio saja, m4a          mp4a (aac)    DASH audio
+#   251        audio saja, webm         opus          DASH audio
+#   18         video+audio, mp4         avc1+mp4a     progressive
+#
+# File dibuat sekali dengan ffmpeg (lavfi testsrc + sine). Tanpa ffmpeg isi file
+# random: cukup untuk extract/parse/API, tapi job yang butuh ffmpeg akan gagal.
+
+FORMATS: List[Dict] = [
+    {"format_id": "137", "ext": "mp4", "vcodec": "avc1.640028", "acodec": "none", "height": 720, "tbr": 1500,
+     "ffmpeg": ["-f", "lavfi", "-i", "testsrc=size=1280x720:rate=30", "-c:v", "libx264", "-preset", "ultrafast", "-an"]},
+    {"format_id": "248", "ext": "webm", "vcodec": "vp9", "acodec": "none", "height": 1080, "tbr": 2500,
+     "ffmpeg": ["-f", "lavfi", "-i", "testsrc=size=1920x1080:rate=30", "-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", "-an"]},
+    {"format_id": "140", "ext": "m4a", "vcodec": "none", "acodec": "mp4a.40.2", "abr": 128,
+     "ffmpeg": ["-f", "lavfi", "-i", "sine=frequency=440", "-c:a", "aac", "-b:a", "128k", "-vn"]},
+    {"format_id": "251", "ext": "webm", "vcodec": "none", "acodec": "opus", "abr": 160,
+     "ffmpeg": ["-f", "lavfi", "-i", "sine=frequency=440", "-c:a", "libopus", "-b:a", "160k", "-vn"]},
+    {"format_id": "18", "ext": "mp4", "vcodec": "avc1.42001E", "acodec": "mp4a.40.2", "height": 360, "tbr": 600,
+     "ffmpeg": ["-f", "lavfi", "-i", "testsrc=size=640x360:rate=30", "-f", "lavfi", "-i", "sine=frequency=440",
+                "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest"]},
+]
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def media_file_name(f: Dict) -> str:
+    return f"{f['format_id']}.{f['ext']}"
+
+
+def generate_media(media_dir: Path, seconds: int) -> bool:
+    """
+    Buat semua file FORMATS di media_dir (dilewati kalau sudah ada).
+    Return True kalau file dibuat dengan ffmpeg (media valid).
+    """
+    media_dir.mkdir(parents=True, exist_ok=True)
+    ffmpeg = shutil.which("ffmpeg")
+
+    for f in FORMATS:
+        path = media_dir / media_file_name(f)
+        if path.exists() and path.stat().st_size > 0:
+            continue
+        if ffmpeg:
+            cmd = [ffmpeg, "-y", "-loglevel", "error", *f["ffmpeg"], "-t", str(seconds), str(path)]
+            subprocess.run(cmd, check=True)
+        else:
+            # kira-kira sebesar media asli dengan bitrate yang sama
+            path.write_bytes(os.urandom(int(f.get("tbr") or f.get("abr")) * 125 * seconds))
+
+    return ffmpeg is not None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    media_dir: Path = Path(".")
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def _serve(self, body: bool):
+        name = self.path.lstrip("/").split("?", 1)[0]
+        path = self.media_dir / name
+        if "/" in name or not path.is_file():
+            self.send_error(404)
+            return
+
+        size = path.stat().st_size
+        start, end = 0, size - 1
+        m = _RANGE_RE.match(self.headers.get("Range", ""))
+        if m and (m.group(1) or m.group(2)):
+            if m.group(1):
+                start = int(m.group(1))
+                end = int(m.group(2)) if m.group(2) else size - 1
+            else:
+                start = max(0, size - int(m.group(2)))
+            end = min(end, size - 1)
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if not body:
+            return
+
+        with open(path, "rb") as fh:
+            fh.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = fh.read(min(256 * 1024, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+
+class MediaServer:
+    """
+    HTTP server lokal (thread) yang melayani media_dir, dengan Range request
+    (dipakai yt-dlp untuk resume/chunk).
+
+        with MediaServer(media_dir) as server:
+            server.url("137.mp4")
+    """
+
+    def __init__(self, media_dir: Path, host: str = "127.0.0.1", port: int = 0):
+        handler = type("MediaHandler", (_Handler,), {"media_dir": Path(media_dir)})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, name: str) -> str:
+        return f"{self.base_url}/{name}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="bench-media", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        return False
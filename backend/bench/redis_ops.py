@@ -0,0 +1,121 @@
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+import redis
+from redis.client import Pipeline
+
+from app.queue import redis_conn
+
+# Hitung command Redis yang dikirim proses ini (client-side, jadi jalan juga
+# dengan fakeredis yang tidak punya INFO commandstats):
+#
+#   round_trips   satu command biasa atau satu pipeline = 1
+#   commands      total command, termasuk isi pipeline
+#   by_command    per nama command; tulis state job (script set_state ke
+#                 job:{id}:state) dan publish event progress dihitung terpisah
+
+
+def use_fakeredis():
+    """
+    Semua koneksi app (sync & async) ke satu FakeServer in-process.
+    Butuh fakeredis[lua] (lupa untuk script Lua), lihat requirements-bench.txt.
+    """
+    try:
+        import fakeredis
+        import fakeredis.aioredis
+    except ImportError:
+        raise SystemExit("fakeredis tidak terinstall: pip install -r requirements-bench.txt, atau pakai --redis-url")
+
+    server = fakeredis.FakeServer()
+    redis_conn._pool = fakeredis.FakeRedis(server=server).connection_pool
+    redis_conn._async_pool = fakeredis.aioredis.FakeRedis(server=server).connection_pool
+
+
+def _name(args) -> str:
+    name = args[0]
+    name = name.decode() if isinstance(name, bytes) else str(name)
+    name = name.upper()
+
+    if name == "EVALSHA" and len(args) > 3 and str(args[3]).endswith(":state"):
+        return "job_state_write"
+    if name == "PUBLISH" and len(args) > 1 and str(args[1]).endswith(":events"):
+        return "job_event_publish"
+    return name
+
+
+class RedisOpCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.round_trips = 0
+        self.commands: Counter = Counter()
+        self._orig = None
+
+    def install(self):
+        counter = self
+        orig_execute_command = redis.Redis.execute_command
+        orig_pipeline_execute = Pipeline.execute
+
+        def execute_command(client, *args, **options):
+            counter._count([args])
+            return orig_execute_command(client, *args, **options)
+
+        def pipeline_execute(pipe, *args, **kwargs):
+            counter._count([c[0] for c in pipe.command_stack])
+            return orig_pipeline_execute(pipe, *args, **kwargs)
+
+        redis.Redis.execute_command = execute_command
+        Pipeline.execute = pipeline_execute
+        self._orig = (orig_execute_command, orig_pipeline_execute)
+        return self
+
+    def uninstall(self):
+        if self._orig:
+            redis.Redis.execute_command, Pipeline.execute = self._orig
+            self._orig = None
+
+    def _count(self, stack):
+        if not stack:
+            return
+        with self._lock:
+            self.round_trips += 1
+            for args in stack:
+                self.commands[_name(args)] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"round_trips": self.round_trips, "by_command": dict(self.commands)}
+
+
+def diff(after: Dict, before: Optional[Dict] = None) -> Dict:
+    before = before or {"round_trips": 0, "by_command": {}}
+    by_command = {
+        k: v - before["by_command"].get(k, 0)
+        for k, v in after["by_command"].items()
+        if v - before["by_command"].get(k, 0)
+    }
+    return {
+        "round_trips": after["round_trips"] - before["round_trips"],
+        "commands": sum(by_command.values()),
+        "by_command": dict(sorted(by_command.items(), key=lambda kv: -kv[1])),
+    }
+
+
+def merge(*stats: Dict) -> Dict:
+    by_command: Counter = Counter()
+    for s in stats:
+        by_command.update(s["by_command"])
+    return {
+        "round_trips": sum(s["round_trips"] for s in stats),
+        "commands": sum(by_command.values()),
+        "by_command": dict(by_command.most_common()),
+    }
+
+
+def per(stats: Dict, n: int) -> Dict:
+    n = max(n, 1)
+    return {
+        "round_trips": round(stats["round_trips"] / n, 2),
+        "commands": round(stats["commands"] / n, 2),
+        "by_command": {k: round(v / n, 2) for k, v in stats["by_command"].items()},
+    }
@@ -0,0 +1,97 @@
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+from rq import SimpleWorker
+from rq.registry import ScheduledJobRegistry, StartedJobRegistry
+
+from app.core.config import settings
+from app.queue import fair
+from app.queue.redis_conn import get_redis
+from app.queue.rq_queue import get_queue, queue_names
+
+# Worker RQ untuk benchmark: listen semua queue (urutan prioritas sama dengan
+# worker asli), berhenti sendiri kalau tidak ada job tersisa.
+# Dipanggil in-process (drain) atau sebagai proses terpisah untuk --workers > 1:
+#
+#   python -m bench.worker --redis-url ... --media-url ... --media-dir ... --storage-dir ...
+
+
+def configure(storage_dir: Path):
+    """
+    Setting yang sama untuk proses API & worker benchmark: storage sendiri,
+    tanpa retry (retry ber-interval butuh scheduler, job gagal langsung final).
+    """
+    settings.STORAGE_DIR = str(storage_dir)
+    settings.DOWNLOAD_RETRY_MAX = 0
+    settings.PIPELINE_STAGE_RETRIES = 0
+
+
+def backlog() -> int:
+    """
+    Job yang masih harus dikerjakan: antrian RQ, yang sedang jalan, retry
+    terjadwal, dan pending fair-share yang belum di-dispatch.
+    """
+    r = get_redis()
+    names = queue_names()
+    with r.pipeline(transaction=False) as pipe:
+        for name in names:
+            q = get_queue(name)
+            pipe.llen(q.key)
+            pipe.zcard(StartedJobRegistry(queue=q).key)
+            pipe.zcard(ScheduledJobRegistry(queue=q).key)
+        total = sum(pipe.execute())
+    return total + sum(fair.get_stats(name)["pending"] for name in names)
+
+
+def drain(timeout: float, idle_seconds: float = 1.0):
+    """
+    Kerjakan job sampai backlog kosong selama `idle_seconds` (job lain mungkin
+    masih jalan di worker paralel) atau timeout.
+    """
+    queues = [get_queue(name) for name in queue_names()]
+    deadline = time.monotonic() + timeout
+    idle_since = None
+
+    while time.monotonic() < deadline:
+        SimpleWorker(queues, connection=get_redis()).work(burst=True, logging_level="WARNING", with_scheduler=False)
+        if backlog():
+            idle_since = None
+        elif idle_since is None:
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since >= idle_seconds:
+            return
+        time.sleep(0.1)
+
+
+def main():
+    from bench.fake_youtube import install
+    from bench.redis_ops import RedisOpCounter
+
+    parser = argparse.ArgumentParser(description="Worker RQ benchmark (dipanggil bench)")
+    parser.add_argument("--redis-url", required=True)
+    parser.add_argument("--media-url", required=True)
+    parser.add_argument("--media-dir", required=True, type=Path)
+    parser.add_argument("--media-seconds", type=int, default=10)
+    parser.add_argument("--extract-ms", type=float, default=0)
+    parser.add_argument("--storage-dir", required=True, type=Path)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    settings.REDIS_URL = args.redis_url
+    configure(args.storage_dir)
+    install(args.media_url, args.media_dir, args.media_seconds, args.extract_ms)
+
+    counter = RedisOpCounter().install()
+    drain(args.timeout)
+    counter.uninstall()
+
+    # baris terakhir stdout: hitungan command Redis, dijumlah proses utama
+    print(json.dumps(counter.snapshot()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import { useEffect, useMemo, useState } from "react";
-import { api } from "./lib/api";
+import { api, API_BASE } from "./lib/api";
 import {
   Youtube,
   Link2,
@@ -79,22 +79,23 @@ export default function App() {
     }
   }
 
-  // Polling job status
+  // Job status: SSE stream, fallback ke polling kalau EventSource gagal
   useEffect(() => {
     if (!jobId) return;
 
     let timer = null;
     let stopped = false;
+    let source = null;
+
+    const isDone = (data) =>
+      data?.status === "finished" || data?.status === "failed";
 
     async function poll() {
       try {
         const res = await api.get(`/youtube/jobs/${jobId}`);
         setJob(res.data.data);
 
-        if (
-          res.data.data?.status === "finished" ||
-          res.data.data?.status === "failed"
-        ) {
+        if (isDone(res.data.data)) {
           stopped = true;
           return;
         }
@@ -105,9 +106,29 @@ export default function App() {
       if (!stopped) timer = setTimeout(poll, 1000);
     }
 
-    poll();
+    if (typeof EventSource === "undefined") {
+      poll();
+    } else {
+      source = new EventSource(`${API_BASE}/api/youtube/jobs/${jobId}/events`);
+
+      source.onmessage = (e) => {
+        const data = JSON.parse(e.data);
+        setJob(data);
+        if (isDone(data)) {
+          stopped = true;
+          source.close();
+        }
+      };
+
+      source.onerror = () => {
+        source.close();
+        if (!stopped) poll();
+      };
+    }
 
     return () => {
+      stopped = true;
+      if (source) source.close();
       if (timer) clearTimeout(timer);
     };
   }, [jobId]);
@@ -116,7 +137,6 @@ export default function App() {
   const stage = job?.stage ?? "-";
   const status = job?.status ?? "-";
 
-  const API_BASE = import.meta.env.VITE_API_BASE_URL || "http://127.0.0.1:8000";
   const downloadUrl =
     job?.status === "finished" ? `${API_BASE}${job.downloadUrl}` : null;
 
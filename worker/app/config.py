@@ -1,7 +0,0 @@
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
-QUEUE_NAME = os.getenv("QUEUE_NAME", "default")
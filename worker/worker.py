@@ -1,14 +1,22 @@
 import os
-from redis import Redis
-from rq import Worker, Queue, Connection
-from rq.worker import SimpleWorker
+import sys
 
-listen = ['default']
-redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
-conn = Redis.from_url(redis_url)
+def main():
+    """
+    Jalankan supervisor worker (app.jobs.supervisor) dari tree backend: job di antrian
+    API hanya ada di sana, dan cwd disamakan dengan API (.env, STORAGE_DIR relatif).
+    """
+    backend_dir = os.path.abspath(
+        os.getenv("WORKER_APP_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+    )
+    os.chdir(backend_dir)
+    sys.path.insert(0, backend_dir)
+
+    from app.jobs.supervisor import main as run_supervisor
+
+    run_supervisor()
+
 
 if __name__ == '__main__':
-    with Connection(conn):
-        worker = SimpleWorker(map(Queue, listen))
-        worker.work()
+    main()